@@ -1,33 +1,376 @@
 # Standard lib dependencies
 import os                                                              # Path verification & modification
-import time                                                            # Allows for pauses
+import math                                                            # Used to round element regions outwards
+import hashlib                                                         # Used to detect identical screenshots
 import logging                                                         # Enables logging
 import webbrowser
-from typing import Union, List
+from dataclasses import dataclass, field                               # Used for capture results
+from typing import Dict, Union, List, Tuple
 
 # Third Party Dependencies
-## Image comparison
-from ez_img_diff.api import compare_images
+import numpy as np                                                     # Used to hold images in memory
 
 ## Browser automation
 from selenium import webdriver                                         # Instantiates a browser
 from selenium.webdriver.common.by import By                            # Specify find_element type
-from selenium.webdriver.chrome.options import Options                  # Allows webdriver config
 from selenium.webdriver.remote.webdriver import WebDriver              # Used for type hinting
+from selenium.webdriver.remote.webelement import WebElement            # Used for type hinting
 from selenium.common.exceptions import NoSuchElementException          # Allows for error catching
 
-### Used to manage driver installation
-from webdriver_manager.chrome import ChromeDriverManager
-from webdriver_manager.firefox import GeckoDriverManager
-from webdriver_manager.microsoft import EdgeChromiumDriverManager
-
 ### Services needed for instantiating browsers
 from selenium.webdriver.chrome.service import Service as ChromeService # Helps instantiate browser
 from selenium.webdriver.edge.service import Service as EdgeService     # Helps instantiate browser
 from selenium.webdriver.firefox.service import Service as FirefoxService
 
+# Internal Dependencies
+from ez_visual_regression.stability import prepare_page_load, wait_for_stability, DEFAULT_WAIT_TIMEOUT
+from ez_visual_regression.cache import local_page_path, hash_local_page, hash_loaded_page, browser_identity, compute_cache_key, get_cached_result, store_cached_result
+from ez_visual_regression.drivers import resolve_driver, browser_options, LaunchProfile
+from ez_visual_regression.baselines import read_baseline_metadata, write_baseline_metadata, index_baseline, baseline_index_entry, baseline_exists, load_baseline, read_baseline, write_baseline, BASELINE_STORES
+from ez_visual_regression.timing import phase, record_image, instrument_driver
+from ez_visual_regression.fullpage import capture_full_page
+from ez_visual_regression.comparison import decode_image, load_image, image_digest, write_bytes, write_image, mask_regions, structural_difference, save_difference_images, pixel_difference, save_pixel_difference_images, bounded_difference, tiled_difference, save_tiled_difference_images, known_difference, remember_difference, COMPARISON_METHODS
+
+
+# Gets every element matching a selector along with their position, and the ratio of screenshot pixels to CSS pixels
+ELEMENT_RECTS_SCRIPT = """var elements = document.querySelectorAll(arguments[0]);
+var found = [];
+for (var i = 0; i < elements.length; i++) {
+    var rect = elements[i].getBoundingClientRect();
+    found.push([elements[i], rect.left, rect.top, rect.width, rect.height]);
+}
+return {elements: found, scale: window.devicePixelRatio || 1};"""
+
+# Gets the position of every element matching any of the ignored selectors, and of the elements they should be relative to
+IGNORED_RECTS_SCRIPT = """var origins = arguments[1].map(function(element){
+    var rect = element.getBoundingClientRect();
+    return [rect.left, rect.top];
+});
+if (!origins.length) { origins = [[0, 0]]; }
+var rects = [];
+arguments[0].forEach(function(selector){
+    document.querySelectorAll(selector).forEach(function(element){
+        var rect = element.getBoundingClientRect();
+        if (rect.width && rect.height) { rects.push([rect.left, rect.top, rect.width, rect.height]); }
+    });
+});
+return {origins: origins, rects: rects, scale: window.devicePixelRatio || 1};"""
+
+ARTIFACT_POLICIES = ["all", "failure", "none"]
+"""When the current, diff and thresh images are written; always, only if the error threshold is crossed, or never"""
+
+
+def _normalize_url(url:str) -> str:
+    """Adds a protocol to URL's that don't have one (file:/// for .html and .pdf files, otherwise http://)
+
+    Raises
+    ------
+    FileNotFoundError
+        If the URL is a file path and it does not exist
+    """
+    if not url.startswith("http"):
+        if (url.endswith(".html") or url.endswith(".pdf")) and not url.startswith("file:///"): # Assume file path
+            logging.debug("URL provided does not have protocol, defaulting to file")
+            abs_fp = os.path.abspath(url).replace("\\","/")
+            if not os.path.exists(abs_fp):
+                raise FileNotFoundError(f"File path {abs_fp} does not exist")
+            url = f"file:///{abs_fp}"
+        else:
+            url = "http://" + url
+    return url
+
+def load_page(driver:WebDriver, url:str, wait: Union[List[str], None]=None, wait_timeout: float=DEFAULT_WAIT_TIMEOUT) -> str:
+    """Navigates to a URL (or file path) and waits for the page to be stable
+
+    Parameters
+    ----------
+    driver : WebDriver
+        The browser to load the page in
+
+    url : str
+        The URl you want to load (or filepath)
+
+    wait: Union[List[str], None], optional
+        The stability strategies to wait on (see stability.WAIT_STRATEGIES), by default None (all but "sleep")
+
+    wait_timeout: float, optional
+        The maximum amount of seconds to wait for the page to be stable, by default 10
+
+    Raises
+    ------
+    FileNotFoundError
+        If the URL is a file path and it does not exist
+
+    Returns
+    -------
+    str
+        The URL that was loaded (with protocol)
+    """
+    url = _normalize_url(url)
+    with phase("navigate"):
+        prepare_page_load(driver, wait)
+        driver.get(url)
+
+    # Wait for page to load and run all animations
+    with phase("wait"):
+        wait_for_stability(driver, wait, wait_timeout)
+    driver._ezvr_loaded_url = url # Lets callers that capture many times from one load know the page is ready
+    return url
+
+def _reuse_page(driver:WebDriver):
+    """Prepares the currently loaded page to be captured again (earlier element screenshots may have scrolled it)"""
+    driver.execute_script("window.scrollTo(0, 0)")
+
+def _ignored_regions(driver:WebDriver, ignored_elements: Union[List[str], None], origins: Union[List[WebElement], None]=None) -> List[List[List[int]]]:
+    """Finds every element matching the ignored query selectors in one script call, returning their [x, y, width, height] pixel
+    regions relative to each origin element (or the viewport if there are no origins)"""
+    if not ignored_elements:
+        return [[] for _ in (origins or [None])]
+    if isinstance(ignored_elements, str):
+        ignored_elements = [ignored_elements]
+    with phase("ignored"):
+        found = driver.execute_script(IGNORED_RECTS_SCRIPT, list(ignored_elements), list(origins or []))
+    scale = found["scale"]
+    regions = []
+    for origin_x, origin_y in found["origins"]:
+        regions.append([])
+        for left, top, width, height in found["rects"]:
+            x, y = math.floor((left - origin_x) * scale), math.floor((top - origin_y) * scale)
+            right, bottom = math.ceil((left - origin_x + width) * scale), math.ceil((top - origin_y + height) * scale)
+            regions[-1].append([x, y, right - x, bottom - y])
+    return regions
+
+def _capture(driver:WebDriver, locator:Union[str, None]=None, ignored_elements: Union[List[str], None]=None, full_page:bool=False) -> Tuple[Union[bytes, np.ndarray], List[List[int]]]:
+    """Screenshots the first element matching locator (or the viewport, or whole page if full_page is True, if there is no locator) on the currently loaded page,
+    returning the PNG bytes (or stitched image) and the regions of the ignored elements in the screenshot"""
+    if locator: # Screenshot element
+        try:
+            with phase("screenshot"):
+                element = driver.find_elements(By.CSS_SELECTOR, locator)[0]
+                png = element.screenshot_as_png
+        except (NoSuchElementException, IndexError):
+            logging.error(f"\033[0;m Element does not exist when looking for css selector: {locator} confirm spelling and capitalization\033[1;37m")
+            exit(1)
+        return png, _ignored_regions(driver, ignored_elements, [element])[0] # Element screenshots scroll, so find the regions afterwards
+    else: # Screenshot page
+        with phase("screenshot"):
+            png = capture_full_page(driver) if full_page else driver.get_screenshot_as_png()
+        return png, _ignored_regions(driver, ignored_elements)[0] # Full page captures scroll back to the top, so the viewport is at the start of the page
 
-def get_screenshot(driver:WebDriver, url:str, filename:str, locator:Union[str, None]=None, ignored_elements: List[str]= None):
+def _compare_to_baseline(capture:Union[bytes, np.ndarray], folder:str, suffix:str="", artifacts:str="all", error_threshold:Union[float, None]=None, method:str="ssim", tolerance:int=0, fast:bool=False, warning_threshold:Union[float, None]=None, ignored_regions:Union[List[List[int]], None]=None, tiled:bool=False, store:str="files", store_folder:Union[str, None]=None) -> float:
+    """Compares a capture (PNG bytes or an image) to <folder>/baseline<suffix>.png in memory (creating the baseline in the store if needed), and writes the current, diff and thresh images based on the artifact policy
+
+    The ignored regions of the capture, and the ones recorded when the baseline was created, are blanked out in both images before comparing.
+    Unless every artifact is needed, captures with the same bytes or pixels as the baseline (see baselines.index_baseline()) return 0 without decoding the baseline,
+    and comparisons that were already done in this process (i.e. a header shared by many tests) return the known difference.
+    Tiled comparisons never decode the whole capture or baseline (see comparison.tiled_difference()), so they only use the byte shortcut and always compare every tile
+    """
+    png = capture if isinstance(capture, bytes) else None
+    name = f"baseline{suffix}.png"
+    baseline_path = os.path.join(folder, name)
+    ignored_regions = ignored_regions or []
+    if not baseline_exists(folder, name):
+        print(f"No baseline image found in {baseline_path}, creating...")
+        with phase("write"):
+            write_baseline(folder, name, capture, store, store_folder)
+            write_baseline_metadata(folder, name, ignored=ignored_regions)
+            index_baseline(folder, name, None if png else capture)
+
+    def identical() -> float:
+        """Returns 0 for a capture that is the same as the baseline, writing current.png if artifacts are written"""
+        if artifacts == "all":
+            with phase("write"):
+                _write_capture(os.path.join(folder, f"current{suffix}.png"), capture)
+        return 0.0
+
+    shortcut = fast or artifacts != "all" # An identical capture passes, so it only needs a diff image if every artifact is written
+    if shortcut:
+        with phase("read"):
+            entry = baseline_index_entry(folder, name)
+            same_bytes = png is not None and hashlib.sha256(png).hexdigest() == entry["sha256"]
+        if same_bytes:
+            return identical()
+
+    with phase("read"):
+        baseline_regions = read_baseline_metadata(folder, name).get("ignored", [])
+        regions = ignored_regions + baseline_regions
+        if tiled: # Decoded (and masked) a row of tiles at a time by tiled_difference()
+            current = capture
+            current_digest = (hashlib.sha256(png).hexdigest() if png else image_digest(capture)) if shortcut else None
+        else:
+            current = mask_regions(decode_image(png) if png else capture, regions)
+            current_digest = image_digest(current) if shortcut else None
+        same_pixels = shortcut and not tiled and sorted(ignored_regions) == sorted(baseline_regions) and current_digest == entry["pixels_sha256"]
+    if same_pixels: # i.e. only ignored elements changed, or the capture was re-encoded
+        return identical()
+    thresholds = [threshold for threshold in (warning_threshold, error_threshold) if threshold is not None]
+    known_key = (entry["sha256"], current_digest, str(sorted(regions)), method, tolerance, tuple(thresholds) if fast else None) if shortcut else None
+    if known_key:
+        diff = known_difference(known_key)
+        if diff is not None and not (artifacts == "failure" and error_threshold is not None and diff > error_threshold):
+            return diff
+    with phase("read"):
+        baseline = read_baseline(folder, name) if tiled else mask_regions(load_baseline(folder, name), regions)
+    if fast and not tiled:
+        with phase("compare"):
+            diff, _ = bounded_difference(baseline, current, thresholds, method, tolerance)
+        failed = error_threshold is not None and diff > error_threshold
+        if not (artifacts == "all" or (artifacts == "failure" and failed)):
+            remember_difference(known_key, diff)
+            return diff
+        # Artifacts need the full comparison
+
+    with phase("compare"):
+        if tiled:
+            result = tiled_difference(baseline, current, method, tolerance, regions=regions)
+            diff = result.difference
+        elif method == "pixel":
+            result = pixel_difference(baseline, current, tolerance)
+            diff = result.difference
+        else:
+            diff, ssim_map = structural_difference(baseline, current)
+    if tiled and result.changed_tiles:
+        print(f"{len(result.changed_tiles)} of {result.tiles} tiles changed in {os.path.join(folder, f'current{suffix}.png')}")
+    if artifacts == "all" or (artifacts == "failure" and error_threshold is not None and diff > error_threshold):
+        with phase("write"):
+            _write_capture(os.path.join(folder, f"current{suffix}.png"), capture)
+            if tiled:
+                save_tiled_difference_images(result, None, os.path.join(folder, f"diff{suffix}.png"), os.path.join(folder, f"thresh{suffix}.png"), os.path.join(folder, f"tiles{suffix}.json"))
+            elif method == "pixel":
+                save_pixel_difference_images(result, current, os.path.join(folder, f"diff{suffix}.png"), os.path.join(folder, f"thresh{suffix}.png"))
+            else:
+                save_difference_images(ssim_map, os.path.join(folder, f"diff{suffix}.png"), os.path.join(folder, f"thresh{suffix}.png"))
+    if known_key:
+        remember_difference(known_key, diff)
+    return diff
+
+def _write_capture(path:str, capture:Union[bytes, np.ndarray]):
+    """Writes a capture to disk, PNG bytes are written as-is and images are encoded"""
+    if isinstance(capture, bytes):
+        write_bytes(path, capture)
+    else:
+        write_image(path, capture)
+
+def _capture_elements(driver:WebDriver, locator:str, ignored_elements: Union[List[str], None]=None) -> Tuple[List[np.ndarray], List[List[List[int]]]]:
+    """Captures every element matching locator from a single screenshot of the currently loaded page (elements outside the viewport are screenshotted individually),
+    returning the captures and the regions of the ignored elements in each of them"""
+    with phase("screenshot"):
+        found = driver.execute_script(ELEMENT_RECTS_SCRIPT, locator)
+        png = driver.get_screenshot_as_png()
+    record_image(png)
+    with phase("read"):
+        page = decode_image(png)
+    elements = [element for element, *_ in found["elements"]]
+    regions = _ignored_regions(driver, ignored_elements, elements) if elements else []
+    scale = found["scale"]
+    captures = []
+    for index, (element, left, top, width, height) in enumerate(found["elements"]):
+        x, y = round(left * scale), round(top * scale)
+        right, bottom = round((left + width) * scale), round((top + height) * scale)
+        if x >= 0 and y >= 0 and right <= page.shape[1] and bottom <= page.shape[0] and right > x and bottom > y:
+            captures.append(page[y:bottom, x:right])
+        else: # Not fully visible, let the browser scroll to it
+            with phase("screenshot"):
+                png = element.screenshot_as_png
+            with phase("read"):
+                captures.append(decode_image(png))
+            regions[index] = _ignored_regions(driver, ignored_elements, [element])[0]
+    return captures, regions
+
+def _capture_all_elements(driver:WebDriver, locator:str, ignored_elements: Union[List[str], None]=None, single_capture:bool=False) -> Tuple[List[Union[bytes, np.ndarray]], List[List[List[int]]]]:
+    """Screenshots every element matching locator on the currently loaded page, returning the captures and the regions of the ignored elements in each of them"""
+    try:
+        if single_capture:
+            return _capture_elements(driver, locator, ignored_elements)
+        captures, regions = [], []
+        with phase("screenshot"):
+            elements = driver.find_elements(By.CSS_SELECTOR, locator)
+        for element in elements:
+            with phase("screenshot"):
+                captures.append(element.screenshot_as_png)
+            record_image(captures[-1])
+            regions.append(_ignored_regions(driver, ignored_elements, [element])[0])
+        return captures, regions
+    except NoSuchElementException:
+        logging.error(f"\033[0;m Element does not exist when looking for css selector: {locator} confirm spelling and capitalization\033[1;37m")
+        exit(1)
+
+def _compare_elements(captures:List[Union[bytes, np.ndarray]], regions:List[List[List[int]]], folder:str, artifacts:str="all", error_threshold:Union[float, None]=None, method:str="ssim", tolerance:int=0, fast:bool=False, warning_threshold:Union[float, None]=None, tiled:bool=False, store:str="files", store_folder:Union[str, None]=None) -> List[float]:
+    """Compares element captures to their baselines (<folder>/baseline-<index>.png)"""
+    return [_compare_to_baseline(capture, folder, f"-{index}", artifacts, error_threshold, method, tolerance, fast, warning_threshold, regions[index], tiled, store, store_folder) for index, capture in enumerate(captures)]
+
+def _validate_options(artifacts:str, method:str, store:str="files"):
+    """Raises a ValueError if the artifact policy, comparison method or baseline store does not exist"""
+    if artifacts not in ARTIFACT_POLICIES:
+        raise ValueError(f"Artifact policy not supported {artifacts}, must be one of {ARTIFACT_POLICIES}")
+    if method not in COMPARISON_METHODS:
+        raise ValueError(f"Comparison method not supported {method}, must be one of {COMPARISON_METHODS}")
+    if store not in BASELINE_STORES:
+        raise ValueError(f"Baseline store not supported {store}, must be one of {BASELINE_STORES}")
+
+def _check_thresholds(diff:float, warning_threshold:float, error_threshold:float):
+    """Logs a warning if diff is over the warning threshold
+
+    Raises
+    ------
+    AssertionError
+        If diff > error_threshold
+    """
+    if diff > error_threshold:
+        logging.error(f"Difference {diff} is over error threshold {error_threshold}")
+        raise AssertionError(f"Difference {diff} is over error threshold {error_threshold}")
+    if error_threshold > diff > warning_threshold:
+        logging.warning(f"Difference {diff} is over warning threshold {error_threshold}")
+
+def capture_screenshot(driver:WebDriver, url:str, locator:Union[str, None]=None, ignored_elements: List[str]= None, wait: Union[List[str], None]=None, wait_timeout: float=DEFAULT_WAIT_TIMEOUT, navigate:bool=True, full_page:bool=False) -> Tuple[Union[bytes, np.ndarray], List[List[int]]]:
+    """Does the browser half of get_screenshot(); loads the page and captures it without writing anything (see write_screenshot())
+
+    Parameters
+    ----------
+    driver, url, locator, ignored_elements, wait, wait_timeout, navigate, full_page
+        The same as get_screenshot()
+
+    Raises
+    ------
+    FileNotFoundError
+        If the URL is a file path and it does not exist
+
+    Returns
+    -------
+    Tuple[Union[bytes, np.ndarray], List[List[int]]]
+        The PNG bytes (or stitched full page image), and the [x, y, width, height] regions of the ignored elements in it
+    """
+    if navigate:
+        load_page(driver, url, wait, wait_timeout)
+    else:
+        _reuse_page(driver)
+    png, regions = _capture(driver, locator, ignored_elements, full_page)
+    record_image(png)
+    return png, regions
+
+def write_screenshot(filename:str, png:Union[bytes, np.ndarray], regions:Union[List[List[int]], None]=None):
+    """Does the rest of get_screenshot(); writes a capture with the ignored regions blanked out
+
+    Parameters
+    ----------
+    filename : str
+        The file to export the screenshot to, it's folder is created if needed
+
+    png : Union[bytes, np.ndarray]
+        The capture from capture_screenshot()
+
+    regions : Union[List[List[int]], None], optional
+        The [x, y, width, height] regions to blank out, by default None
+    """
+    if os.path.dirname(filename):
+        os.makedirs(os.path.dirname(filename), exist_ok=True) # Other workers may create it at the same time
+    with phase("write"):
+        if regions:
+            write_image(filename, mask_regions(decode_image(png) if isinstance(png, bytes) else png, regions))
+        else:
+            _write_capture(filename, png)
+
+def get_screenshot(driver:WebDriver, url:str, filename:str, locator:Union[str, None]=None, ignored_elements: List[str]= None, wait: Union[List[str], None]=None, wait_timeout: float=DEFAULT_WAIT_TIMEOUT, navigate:bool=True, full_page:bool=False):
     """Takes a screenshot of a page or element
 
     Parameters
@@ -45,11 +388,24 @@ def get_screenshot(driver:WebDriver, url:str, filename:str, locator:Union[str, N
         The CSS selector to search the element with (i.e. #myChart, .rows etc.)
         
     ignored_elements: List[str], option
-        Use a query selector to specify elements to ignore
+        Use a query selector to specify elements to ignore, the areas they cover are blanked out of the screenshots instead of the page being restyled
+
+    wait: Union[List[str], None], optional
+        The stability strategies to wait on before the screenshot (see stability.WAIT_STRATEGIES), by default None (all but "sleep")
+
+    wait_timeout: float, optional
+        The maximum amount of seconds to wait for the page to be stable, by default 10
+
+    navigate: bool, optional
+        Whether to load the url first, set to False if the page is already loaded in the driver (i.e. to capture many
+        locators from a single load), by default True
+
+    full_page: bool, optional
+        Whether to capture the whole page instead of just the viewport when there is no locator (see fullpage.capture_full_page()), by default False
 
     Notes
     -----
-    - If locator is not specified a full page screenshot is used
+    - If locator is not specified the viewport is captured (or the whole page if full_page is True)
     
     
     References
@@ -107,36 +463,64 @@ def get_screenshot(driver:WebDriver, url:str, filename:str, locator:Union[str, N
     get_screenshot(driver, URL, filename=filename, ignored_elements=ignored_elements)
     ```
     """
-    if not url.startswith("http"):
-        if (url.endswith(".html") or url.endswith(".pdf")) and not url.startswith("file:///"): # Assume file path
-            logging.debug("URL provided does not have protocol, defaulting to file")
-            abs_fp = os.path.abspath(url).replace("\\","/")
-            if not os.path.exists(abs_fp):
-                raise FileNotFoundError(f"File path {abs_fp} does not exist")
-            url = f"file:///{abs_fp}"
-        else:
-            url = "http://" + url
-    if not os.path.exists(os.path.dirname(filename)):
-        os.mkdir(os.path.dirname(filename))
-    print(f"{filename=} {locator=}")
-    driver.get(url)
+    logging.debug(f"Taking screenshot {filename} of {locator or 'the page'}")
+    png, regions = capture_screenshot(driver, url, locator, ignored_elements, wait, wait_timeout, navigate, full_page)
+    write_screenshot(filename, png, regions)
 
-    
-    # Wait for page to load and run all animations
-    time.sleep(3) # TODO: Be better
-    if ignored_elements:
-        for selector in ignored_elements:
-            driver.execute_script(f'document.querySelectorAll("{selector}").forEach((el)=>{{el.style.opacity=0}})')
-    if locator: # Screenshot element
-        try:
-            driver.find_elements(By.CSS_SELECTOR, locator)[0].screenshot(filename)
-        except NoSuchElementException:
-            logging.error(f"\033[0;m Element does not exist when looking for css selector: {locator} confirm spelling and capitalization\033[1;37m")
-            exit(1)
-    else: # Screenshot page
-        driver.save_screenshot(filename)
+def get_screenshot_array(driver:WebDriver, url:str, locator:Union[str, None]=None, ignored_elements: List[str]= None, wait: Union[List[str], None]=None, wait_timeout: float=DEFAULT_WAIT_TIMEOUT, full_page:bool=False) -> np.ndarray:
+    """Takes a screenshot of a page or element without writing it to disk
+
+    Parameters
+    ----------
+    driver : WebDriver
+        The browser to use for capturing screenshots
 
-def compare_multiple_elements(driver:WebDriver, url:str, folder:str, locator:str, ignored_elements: List[str]= None) -> List[float]:
+    url : str
+        The URl you want to get a screenshot from (or filepath)
+
+    locator : Union[str, None], optional
+        The CSS selector to search the element with (i.e. #myChart, .rows etc.)
+        
+    ignored_elements: List[str], option
+        Use a query selector to specify elements to ignore, the areas they cover are blanked out of the screenshots instead of the page being restyled
+
+    wait: Union[List[str], None], optional
+        The stability strategies to wait on before the screenshot (see stability.WAIT_STRATEGIES), by default None (all but "sleep")
+
+    wait_timeout: float, optional
+        The maximum amount of seconds to wait for the page to be stable, by default 10
+
+    full_page: bool, optional
+        Whether to capture the whole page instead of just the viewport when there is no locator, by default False
+
+    Raises
+    ------
+    FileNotFoundError
+        If the URL is a file path and it does not exist
+
+    Returns
+    -------
+    np.ndarray
+        The screenshot as a (height, width, 3) BGR array
+
+    Examples
+    --------
+    ### Compare a page to a baseline in memory
+    ```
+    from ez_visual_regression.api import get_screenshot_array, instantiate_driver
+    from ez_visual_regression.comparison import load_image, compare_image_arrays
+
+    driver = instantiate_driver("chrome")
+
+    current = get_screenshot_array(driver, "https://canadiancoding.ca")
+    compare_image_arrays(load_image("baseline.png"), current) # 14.03
+    ```
+    """
+    load_page(driver, url, wait, wait_timeout)
+    png, regions = _capture(driver, locator, ignored_elements, full_page)
+    return mask_regions(decode_image(png) if isinstance(png, bytes) else png, regions)
+
+def compare_multiple_elements(driver:WebDriver, url:str, folder:str, locator:str, ignored_elements: List[str]= None, wait: Union[List[str], None]=None, wait_timeout: float=DEFAULT_WAIT_TIMEOUT, artifacts:str="all", method:str="ssim", tolerance:int=0, fast:bool=False, single_capture:bool=False, tiled:bool=False, store:str="files", store_folder:Union[str, None]=None) -> List[float]:
     """Regression test multiple elements
 
     Parameters
@@ -154,7 +538,44 @@ def compare_multiple_elements(driver:WebDriver, url:str, folder:str, locator:str
         The CSS selector to search the element with (i.e. #myChart, .rows etc.)
         
     ignored_elements: List[str], option
-        Use a query selector to specify elements to ignore
+        Use a query selector to specify elements to ignore, the areas they cover are blanked out of the screenshots instead of the page being restyled
+
+    wait: Union[List[str], None], optional
+        The stability strategies to wait on before the screenshots (see stability.WAIT_STRATEGIES), by default None (all but "sleep")
+
+    wait_timeout: float, optional
+        The maximum amount of seconds to wait for the page to be stable, by default 10
+
+    artifacts: str, optional
+        Whether to write the current-<n>, diff-<n> and thresh-<n> images for every element ("all") or not at all ("failure" or "none"), by default "all"
+
+    method: str, optional
+        How to compare images, either "ssim" (structural similarity) or "pixel" (percentage of changed pixels), by default "ssim"
+
+    tolerance: int, optional
+        How much (0-255) a pixel's channels can change before it counts as changed when method is "pixel", by default 0
+
+    fast: bool, optional
+        Whether to stop comparing as soon as it's certain which side of the thresholds the difference is on (byte identical
+        captures are not compared at all), by default False. Returned differences may then be a lower bound, and with
+        artifacts="all" identical captures only write the current image
+
+    single_capture: bool, optional
+        Whether to crop every element (in multielement mode) out of one screenshot of the page instead of screenshotting
+        each element separately (elements that aren't fully in the viewport are still screenshotted separately), by default False
+
+    tiled: bool, optional
+        Whether to compare the images in parallel tiles (see comparison.tiled_difference()), which gives the same difference while
+        only decoding a few rows of tiles at a time, and writes which tiles changed to tiles.json with the changed tiles outlined
+        in diff.png (scaled down for long pages), by default False. Tiled comparisons always compare every tile, even when fast is True
+
+    store: str, optional
+        Where new baselines are written; "files" (baseline.png etc. in the folder), "pack" (one deduplicated baselines.ezvrpack
+        file in the folder, see pack.add_to_pack()) or "shared" (a content-addressed store shared by every test, that the folder's
+        .ezvr-manifest.json points to, see store.store_baseline()), by default "files". Baselines are read from any of them
+
+    store_folder: Union[str, None], optional
+        The folder of the shared store when store is "shared", by default None (the EZVR_STORE environment variable, or .ezvr-store)
 
     Notes
     -----
@@ -169,6 +590,9 @@ def compare_multiple_elements(driver:WebDriver, url:str, folder:str, locator:str
     ------
     FileNotFoundError
         If the URL is a file path and it does not exist
+
+    ValueError
+        If the artifact policy, comparison method or baseline store does not exist
     
     Returns
     -------
@@ -207,47 +631,158 @@ def compare_multiple_elements(driver:WebDriver, url:str, folder:str, locator:str
     ```
     """
     
-    if not url.startswith("http"):
-        if (url.endswith(".html") or url.endswith(".pdf")) and not url.startswith("file:///"): # Assume file path
-            logging.debug("URL provided does not have protocol, defaulting to file")
-            abs_fp = os.path.abspath(url).replace("\\","/")
-            if not os.path.exists(abs_fp):
-                raise FileNotFoundError(f"File path {abs_fp} does not exist")
-            url = f"file:///{abs_fp}"
-        else:
-            url = "http://" + url
+    _validate_options(artifacts, method, store)
     if not os.path.isdir(folder):
-        os.mkdir(folder)
-    
-    driver.get(url)
+        os.makedirs(folder, exist_ok=True)
     
-    # Wait for page to load and run all animations
-    time.sleep(3) # TODO: Be better
-    if ignored_elements:
-        for selector in ignored_elements:
-            driver.execute_script(f'document.querySelectorAll("{selector}").forEach((el)=>{{el.style.opacity=0}})')
+    load_page(driver, url, wait, wait_timeout)
+    captures, regions = _capture_all_elements(driver, locator, ignored_elements, single_capture)
+    return _compare_elements(captures, regions, folder, artifacts, None, method, tolerance, fast, None, tiled, store, store_folder)
 
-    try:
-        elements = driver.find_elements(By.CSS_SELECTOR, locator)
-        baseline_images = [(os.path.join(folder,f"baseline-{index}.png"), element) for index, element in enumerate(elements)]
-        current_images = [element for element in elements]
+@dataclass
+class CaptureResult:
+    """The screenshots taken for a test, ready to be compared (see capture_test() and compare_capture())
 
-        diffs = []
-        
-        for path, element in baseline_images:
-            if not os.path.exists(path):
-                element.screenshot(path)
-                
-        for index,element in enumerate(current_images):
-            element.screenshot(os.path.join(folder,f"current-{index}.png"))
-            diffs.append(compare_images(os.path.join(folder,f"current-{index}.png"), os.path.join(folder,f"baseline-{index}.png"), os.path.join(folder,f"diff-{index}.png"),os.path.join(folder,f"thresh-{index}.png")))
-            
-    except NoSuchElementException:
-        logging.error(f"\033[0;m Element does not exist when looking for css selector: {locator} confirm spelling and capitalization\033[1;37m")
-        exit(1)
-    return diffs
+    Attributes
+    ----------
+    url : str
+        The page that was captured
+
+    folder : str
+        The folder with the baseline(s)
+
+    multielements : bool
+        Whether the test is in multielement mode (every capture is compared to baseline-<index>.png)
+
+    captures : List[Union[bytes, np.ndarray]]
+        The PNG bytes or images that were captured
+
+    regions : List[List[List[int]]]
+        The [x, y, width, height] regions of the ignored elements in each capture
+
+    cached : Union[float, List[float], None]
+        The cached result if the inputs are unchanged since the last passing run (nothing is captured), else None
+
+    cache_key : Union[Dict, None]
+        What's needed to store the result in the cache once it's compared, None if caching is off
+    """
+    url: str
+    folder: str
+    multielements: bool = False
+    captures: List[Union[bytes, np.ndarray]] = field(default_factory=list)
+    regions: List[List[List[int]]] = field(default_factory=list)
+    cached: Union[float, List[float], None] = None
+    cache_key: Union[Dict, None] = None
+
+def capture_test(driver:WebDriver, url:str, folder:str, locator:Union[str, None]=None, ignored_elements: List[str]= None, multielements:bool=False, wait: Union[List[str], None]=None, wait_timeout: float=DEFAULT_WAIT_TIMEOUT, cache:bool=False, cache_options:Union[Dict, None]=None, single_capture:bool=False, navigate:bool=True, full_page:bool=False) -> CaptureResult:
+    """Does the browser half of assert_image_similarity_to_baseline(); loads the page and takes the screenshots without comparing them
+
+    The browser isn't needed by compare_capture(), so it can load the next page while the comparison runs
+
+    Parameters
+    ----------
+    driver : WebDriver
+        The browser to use for capturing screenshots
+
+    url : str
+        The URl you want to get a screenshot from (or filepath)
 
-def assert_image_similarity_to_baseline(driver:WebDriver, url:str, folder:str, locator:Union[str, None]=None, warning_threshold:float=10, error_threshold:float=30, ignored_elements: List[str]= None, multielements:bool=False) -> Union[float, List[float]]:
+    folder : str
+        The folder with the baseline(s)
+
+    locator, ignored_elements, multielements, wait, wait_timeout, cache, single_capture, navigate, full_page
+        The same as assert_image_similarity_to_baseline()
+
+    cache_options: Union[Dict, None], optional
+        The other settings that affect the result (i.e. the comparison method), used in the cache key, by default None
+
+    Raises
+    ------
+    FileNotFoundError
+        If the URL is a file path and it does not exist
+
+    Returns
+    -------
+    CaptureResult
+        The captures, or the cached result if the inputs are unchanged
+
+    Examples
+    --------
+    ### Capture with one browser, compare on another thread
+    ```
+    from concurrent.futures import ThreadPoolExecutor
+    from ez_visual_regression.api import instantiate_driver, capture_test, compare_capture
+
+    driver = instantiate_driver("chrome")
+    with ThreadPoolExecutor() as pool:
+        comparisons = [pool.submit(compare_capture, capture_test(driver, url, folder)) for url, folder in [("a.html", "a"), ("b.html", "b")]]
+        print([comparison.result() for comparison in comparisons])
+    ```
+    """
+    capture = CaptureResult(url, folder, multielements)
+    page_loaded = not navigate
+    if cache: # Skip everything if the inputs are the same as the last passing run
+        page_path = local_page_path(_normalize_url(url))
+        if not page_path and not page_loaded: # Remote pages have to be loaded to know if they changed
+            load_page(driver, url, wait, wait_timeout)
+            page_loaded = True
+        with phase("cache"):
+            page_digest = hash_local_page(page_path) if page_path else hash_loaded_page(driver)
+            capture.cache_key = {"driver": browser_identity(driver), "page_digest": page_digest, "folder": folder, "locator": locator, "ignored_elements": ignored_elements, "multielements": multielements, "options": cache_options}
+            capture.cached = get_cached_result(folder, compute_cache_key(**capture.cache_key))
+        if capture.cached is not None:
+            print(f"Inputs for {folder} are unchanged since the last passing run, using cached difference: {capture.cached}")
+            return capture
+    if not page_loaded:
+        load_page(driver, url, wait, wait_timeout)
+    elif not navigate:
+        _reuse_page(driver)
+
+    if multielements:
+        capture.captures, capture.regions = _capture_all_elements(driver, locator, ignored_elements, single_capture)
+    else:
+        png, regions = _capture(driver, locator, ignored_elements, full_page)
+        record_image(png)
+        capture.captures, capture.regions = [png], [regions]
+    return capture
+
+def compare_capture(capture:CaptureResult, warning_threshold:float=10, error_threshold:float=30, artifacts:str="all", method:str="ssim", tolerance:int=0, fast:bool=False, tiled:bool=False, store:str="files", store_folder:Union[str, None]=None) -> Union[float, List[float]]:
+    """Does the comparison half of assert_image_similarity_to_baseline() on the screenshots from capture_test() (no browser is needed)
+
+    Parameters
+    ----------
+    capture : CaptureResult
+        The screenshots to compare
+
+    warning_threshold, error_threshold, artifacts, method, tolerance, fast, tiled, store, store_folder
+        The same as assert_image_similarity_to_baseline()
+
+    Raises
+    ------
+    AssertionError
+        If diff > error_threshold (not in multielement mode)
+
+    Returns
+    -------
+    Union[float, List[float]]:
+        The difference between the two images as a whole number percent, or list of floats if the capture is in multielement mode
+    """
+    if capture.cached is not None:
+        if not capture.multielements: # Thresholds may have changed since the result was cached
+            _check_thresholds(capture.cached, warning_threshold, error_threshold)
+        return capture.cached
+
+    if capture.multielements:
+        result = _compare_elements(capture.captures, capture.regions, capture.folder, artifacts, error_threshold, method, tolerance, fast, warning_threshold, tiled, store, store_folder)
+    else:
+        result = _compare_to_baseline(capture.captures[0], capture.folder, "", artifacts, error_threshold, method, tolerance, fast, warning_threshold, capture.regions[0], tiled, store, store_folder)
+        _check_thresholds(result, warning_threshold, error_threshold)
+    if capture.cache_key:
+        with phase("cache"):
+            store_cached_result(capture.folder, compute_cache_key(**capture.cache_key), result) # Baselines may have just been created
+    return result
+
+def assert_image_similarity_to_baseline(driver:WebDriver, url:str, folder:str, locator:Union[str, None]=None, warning_threshold:float=10, error_threshold:float=30, ignored_elements: List[str]= None, multielements:bool=False, wait: Union[List[str], None]=None, wait_timeout: float=DEFAULT_WAIT_TIMEOUT, cache:bool=False, artifacts:str="all", method:str="ssim", tolerance:int=0, fast:bool=False, single_capture:bool=False, navigate:bool=True, tiled:bool=False, full_page:bool=False, store:str="files", store_folder:Union[str, None]=None) -> Union[float, List[float]]:
     """Asserts the current screenshot of a page is similar to `<folder>/baseline.png` within: 0 < diff < error_threshold
 
     Parameters
@@ -271,15 +806,67 @@ def assert_image_similarity_to_baseline(driver:WebDriver, url:str, folder:str, l
         The threshold at which an explicit error will be thrown, by default 30
     
     ignored_elements: List[str], option
-        Use a query selector to specify elements to ignore
+        Use a query selector to specify elements to ignore, the areas they cover are blanked out of the screenshots instead of the page being restyled
         
     multielements: bool, option
         Whether to screenshot all occurances of a css selector (True), or just the firs occurance (False), default False
 
+    wait: Union[List[str], None], optional
+        The stability strategies to wait on before screenshots (see stability.WAIT_STRATEGIES), by default None (all but "sleep")
+
+    wait_timeout: float, optional
+        The maximum amount of seconds to wait for the page to be stable, by default 10
+
+    cache: bool, optional
+        Whether to skip capturing and comparing if the page, locator, ignored elements, browser and baseline(s)
+        are the same as the last passing run (the cached difference is returned instead), by default False
+
+    artifacts: str, optional
+        When to write the current, diff and thresh images to the folder, either always ("all"), only when the
+        difference is over the error threshold ("failure") or never ("none"), by default "all". Comparisons are always done in memory
+
+    method: str, optional
+        How to compare images, either "ssim" (structural similarity) or "pixel" (percentage of changed pixels), by default "ssim"
+
+    tolerance: int, optional
+        How much (0-255) a pixel's channels can change before it counts as changed when method is "pixel", by default 0
+
+    fast: bool, optional
+        Whether to stop comparing as soon as it's certain which side of the thresholds the difference is on (byte identical
+        captures are not compared at all), by default False. Returned differences may then be a lower bound, and with
+        artifacts="all" identical captures only write the current image
+
+    single_capture: bool, optional
+        Whether to crop every element (in multielement mode) out of one screenshot of the page instead of screenshotting
+        each element separately (elements that aren't fully in the viewport are still screenshotted separately), by default False
+
+    navigate: bool, optional
+        Whether to load the url first, set to False if the page is already loaded in the driver (i.e. to capture many
+        locators from a single load), by default True
+
+    tiled: bool, optional
+        Whether to compare the images in parallel tiles (see comparison.tiled_difference()), which gives the same difference while
+        only decoding a few rows of tiles at a time, and writes which tiles changed to tiles.json with the changed tiles outlined
+        in diff.png (scaled down for long pages), by default False. Tiled comparisons always compare every tile, even when fast is True
+
+    full_page: bool, optional
+        Whether to capture the whole page instead of just the viewport when there is no locator (see fullpage.capture_full_page()), by default False
+
+    store: str, optional
+        Where new baselines are written; "files" (baseline.png etc. in the folder), "pack" (one deduplicated baselines.ezvrpack
+        file in the folder, see pack.add_to_pack()) or "shared" (a content-addressed store shared by every test, that the folder's
+        .ezvr-manifest.json points to, see store.store_baseline()), by default "files". Baselines are read from any of them
+
+    store_folder: Union[str, None], optional
+        The folder of the shared store when store is "shared", by default None (the EZVR_STORE environment variable, or .ezvr-store)
+
     Raises
     ------
     AssertionError
         If diff > error_threshold
+
+    ValueError
+        If the artifact policy, comparison method or baseline store does not exist
         
     Returns
     -------
@@ -361,30 +948,16 @@ def assert_image_similarity_to_baseline(driver:WebDriver, url:str, folder:str, l
     assert_image_similarity_to_baseline(driver, URL, folder, locator, ignored_elements=ignored_elements, multielements=True) # Returns (assuming 3 total elements): [0.1, 0.0, 0.4]
     ```
     """
+    _validate_options(artifacts, method, store)
     if not os.path.isdir(folder):
         print(f"No directory was found called {folder}, creating...")
-        os.mkdir(folder)
-    if not os.path.exists(os.path.join(folder, "baseline.png")) and not multielements:
-        print(f"No baseline image(s) found in {os.path.join(folder, 'baseline.png')}, creating...")
-        get_screenshot(driver, url, os.path.join(folder, "baseline.png"), locator, ignored_elements)
+        os.makedirs(folder, exist_ok=True)
 
-    if multielements:
-        diffs = compare_multiple_elements(driver, url, folder, locator, ignored_elements)
-        return diffs
-    else:
-        get_screenshot(driver, url, os.path.join(folder, "current.png"), locator, ignored_elements)
-
-        diff = compare_images(os.path.join(folder, "baseline.png"), os.path.join(folder, "current.png"), os.path.join(folder, "diff.png"), os.path.join(folder, "thresh.png"))
+    cache_options = {"method": method, "tolerance": tolerance, "fast": fast, "single_capture": single_capture, "full_page": full_page} # Other settings that affect the result
+    capture = capture_test(driver, url, folder, locator, ignored_elements, multielements, wait, wait_timeout, cache, cache_options, single_capture, navigate, full_page)
+    return compare_capture(capture, warning_threshold, error_threshold, artifacts, method, tolerance, fast, tiled, store, store_folder)
 
-        if diff > error_threshold:
-            logging.error(f"Difference {diff} is over error threshold {error_threshold}")
-            raise AssertionError(f"Difference {diff} is over error threshold {error_threshold}")
-        if error_threshold > diff > warning_threshold:
-            logging.warning(f"Difference {diff} is over warning threshold {error_threshold}")
-            
-        return diff
-    
-def instantiate_driver(driver:str) -> WebDriver:
+def instantiate_driver(driver:str, driver_path:Union[str, None]=None, profile:Union[LaunchProfile, None]=None) -> WebDriver:
     """Creates a webdriver based on a driver name
 
     Parameters
@@ -392,6 +965,12 @@ def instantiate_driver(driver:str) -> WebDriver:
     driver : str
         The name of the driver to use (can be "edge", "chrome" or "firefox")
 
+    driver_path : Union[str, None], optional
+        The path to the driver executable (i.e. chromedriver), by default None (see drivers.resolve_driver() for how it's found)
+
+    profile : Union[LaunchProfile, None], optional
+        How to launch the browser (headless, window size, scale factor etc.), by default None (LaunchProfile(), which is headless)
+
     Returns
     -------
     WebDriver
@@ -401,6 +980,9 @@ def instantiate_driver(driver:str) -> WebDriver:
     ------
     ValueError
         If the driver does not exist
+
+    FileNotFoundError
+        If driver_path does not exist
     
     Examples
     --------
@@ -420,15 +1002,12 @@ def instantiate_driver(driver:str) -> WebDriver:
     instantiate_driver(driver_name) # Returns a Chrome.WebDriver
     ```
     """
+    options = browser_options(driver, profile)
     if driver == "chrome":
-        chrome_options = Options()
-        chrome_options.add_argument("--disable-gpu")
-        chrome_options.add_argument("--no-sandbox")
-        return webdriver.Chrome(options=chrome_options, service=ChromeService(ChromeDriverManager().install()))
+        browser = webdriver.Chrome(options=options, service=ChromeService(resolve_driver(driver, driver_path)))
     elif driver == "edge":
-        edge_options = Options()
-        return webdriver.Edge(options=edge_options, service=EdgeService(EdgeChromiumDriverManager().install()))
-    elif driver == "firefox":
-        return webdriver.Firefox(service=FirefoxService(GeckoDriverManager().install()))
+        browser = webdriver.Edge(options=options, service=EdgeService(resolve_driver(driver, driver_path)))
     else:
-        raise ValueError(f"Driver not supported {driver}")
+        browser = webdriver.Firefox(options=options, service=FirefoxService(resolve_driver(driver, driver_path)))
+        browser.set_window_size(*(profile or LaunchProfile()).window_size) # --width/--height are ignored by some versions
+    return instrument_driver(browser) # Counts browser round trips for timing reports
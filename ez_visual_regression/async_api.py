@@ -0,0 +1,236 @@
+# Standard lib dependencies
+import os                                                              # Path verification & modification
+import asyncio                                                         # Used to run checks concurrently
+import logging                                                         # Enables logging
+import functools                                                       # Used to pass keyword arguments to executors
+from concurrent.futures import ThreadPoolExecutor                      # Used to run browsers & comparisons off the event loop
+from typing import Any, Callable, List, Tuple, Union
+
+# Third Party Dependencies
+from selenium.webdriver.remote.webdriver import WebDriver              # Used for type hinting
+
+# Internal Dependencies
+from ez_visual_regression.stability import DEFAULT_WAIT_TIMEOUT
+from ez_visual_regression.drivers import LaunchProfile
+from ez_visual_regression.api import instantiate_driver, capture_screenshot, write_screenshot, capture_test, compare_capture, _validate_options
+
+
+class BrowserPool:
+    """A set of browsers that async checks share, each browser is only ever used by one check at a time
+
+    Every browser has it's own thread (WebDriver calls block), and comparisons run on a separate pool of threads,
+    so a browser is handed to the next check as soon as it's screenshots are taken
+
+    Parameters
+    ----------
+    driver : str, optional
+        The name of the browser to use ("chrome", "edge" or "firefox"), by default "chrome"
+
+    size : int, optional
+        The maximum number of browsers to run at once (they're started when first needed), by default 1
+
+    driver_path : Union[str, None], optional
+        The path to the driver executable, by default None (see drivers.resolve_driver())
+
+    profile : Union[LaunchProfile, None], optional
+        How to launch the browsers, by default None (LaunchProfile())
+
+    compare_workers : Union[int, None], optional
+        How many comparisons can run at once, by default None (the number of CPU's)
+
+    Examples
+    --------
+    ### Run 100 checks on 4 browsers
+    ```
+    import asyncio
+    from ez_visual_regression.async_api import BrowserPool, async_assert_image_similarity_to_baseline
+
+    async def main():
+        async with BrowserPool("chrome", size=4) as pool:
+            return await asyncio.gather(*[async_assert_image_similarity_to_baseline(pool, f"https://canadiancoding.ca/page/{index}", f"results/{index}") for index in range(100)])
+
+    asyncio.run(main())
+    ```
+    """
+    def __init__(self, driver: str = "chrome", size: int = 1, driver_path: Union[str, None] = None, profile: Union[LaunchProfile, None] = None, compare_workers: Union[int, None] = None):
+        self.driver = driver
+        self.size = max(1, int(size))
+        self.driver_path = driver_path
+        self.profile = profile
+        self._browsers: List[Tuple[WebDriver, ThreadPoolExecutor]] = []
+        self._starting = 0
+        self._idle: Union[asyncio.Queue, None] = None
+        self._compare_executor = ThreadPoolExecutor(max_workers=compare_workers or os.cpu_count(), thread_name_prefix="ezvr-compare")
+
+    async def __aenter__(self) -> "BrowserPool":
+        return self
+
+    async def __aexit__(self, *exception):
+        await self.close()
+
+    async def _acquire(self) -> Tuple[WebDriver, ThreadPoolExecutor]:
+        """Waits for an idle browser, starting a new one if there are less than size"""
+        if self._idle is None:
+            self._idle = asyncio.Queue()
+        if self._idle.empty() and len(self._browsers) + self._starting < self.size:
+            self._starting += 1
+            executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="ezvr-browser")
+            try:
+                driver = await asyncio.get_running_loop().run_in_executor(executor, instantiate_driver, self.driver, self.driver_path, self.profile)
+            except BaseException:
+                executor.shutdown(wait=False)
+                raise
+            finally:
+                self._starting -= 1
+            self._browsers.append((driver, executor))
+            return driver, executor
+        return await self._idle.get()
+
+    async def run(self, function: Callable[..., Any], *args, **kwargs) -> Any:
+        """Runs function(driver, *args, **kwargs) on the next idle browser's thread
+
+        Parameters
+        ----------
+        function : Callable[..., Any]
+            The function to run, it's first argument is the browser
+
+        Returns
+        -------
+        Any
+            What the function returned
+        """
+        browser = await self._acquire()
+        try:
+            return await asyncio.get_running_loop().run_in_executor(browser[1], functools.partial(function, browser[0], *args, **kwargs))
+        finally:
+            self._idle.put_nowait(browser)
+
+    async def compare(self, function: Callable[..., Any], *args, **kwargs) -> Any:
+        """Runs function(*args, **kwargs) on the comparison threads (for decoding, diffing and writing images)
+
+        Parameters
+        ----------
+        function : Callable[..., Any]
+            The function to run
+
+        Returns
+        -------
+        Any
+            What the function returned
+        """
+        return await asyncio.get_running_loop().run_in_executor(self._compare_executor, functools.partial(function, *args, **kwargs))
+
+    async def close(self):
+        """Quits every browser and stops the threads"""
+        loop = asyncio.get_running_loop()
+        for driver, executor in self._browsers:
+            try:
+                await loop.run_in_executor(executor, driver.quit)
+            except Exception:
+                logging.debug("Unable to quit driver")
+            executor.shutdown(wait=False)
+        self._browsers = []
+        self._idle = None
+        self._compare_executor.shutdown(wait=False)
+
+
+async def async_get_screenshot(pool: BrowserPool, url: str, filename: str, locator: Union[str, None] = None, ignored_elements: List[str] = None, wait: Union[List[str], None] = None, wait_timeout: float = DEFAULT_WAIT_TIMEOUT, full_page: bool = False):
+    """Takes a screenshot of a page or element without blocking the event loop (see api.get_screenshot())
+
+    Parameters
+    ----------
+    pool : BrowserPool
+        The browsers to use for capturing screenshots
+
+    url : str
+        The URl you want to get a screenshot from (or filepath)
+
+    filename : str
+        The file to export the screenshot to
+
+    locator : Union[str, None], optional
+        The CSS selector to search the element with (i.e. #myChart, .rows etc.), by default None (the page)
+
+    ignored_elements: List[str], option
+        Use a query selector to specify elements to ignore, the areas they cover are blanked out of the screenshot
+
+    wait: Union[List[str], None], optional
+        The stability strategies to wait on before the screenshot (see stability.WAIT_STRATEGIES), by default None (all but "sleep")
+
+    wait_timeout: float, optional
+        The maximum amount of seconds to wait for the page to be stable, by default 10
+
+    full_page: bool, optional
+        Whether to capture the whole page instead of just the viewport when there is no locator, by default False
+
+    Raises
+    ------
+    FileNotFoundError
+        If the URL is a file path and it does not exist
+
+    Examples
+    --------
+    ### Screenshot 2 pages at once
+    ```
+    import asyncio
+    from ez_visual_regression.async_api import BrowserPool, async_get_screenshot
+
+    async def main():
+        async with BrowserPool("chrome", size=2) as pool:
+            await asyncio.gather(async_get_screenshot(pool, "https://canadiancoding.ca", "home.png"), async_get_screenshot(pool, "https://kieranwood.ca", "blog.png"))
+
+    asyncio.run(main())
+    ```
+    """
+    png, regions = await pool.run(capture_screenshot, url, locator, ignored_elements, wait, wait_timeout, True, full_page)
+    await pool.compare(write_screenshot, filename, png, regions)
+
+
+async def async_assert_image_similarity_to_baseline(pool: BrowserPool, url: str, folder: str, locator: Union[str, None] = None, warning_threshold: float = 10, error_threshold: float = 30, ignored_elements: List[str] = None, multielements: bool = False, wait: Union[List[str], None] = None, wait_timeout: float = DEFAULT_WAIT_TIMEOUT, cache: bool = False, artifacts: str = "all", method: str = "ssim", tolerance: int = 0, fast: bool = False, single_capture: bool = False, tiled: bool = False, full_page: bool = False, store: str = "files", store_folder: Union[str, None] = None) -> Union[float, List[float]]:
+    """Asserts the current screenshot of a page is similar to `<folder>/baseline.png` without blocking the event loop (see api.assert_image_similarity_to_baseline())
+
+    The browser is released as soon as the screenshots are taken, and the comparison runs on the pool's comparison threads
+
+    Parameters
+    ----------
+    pool : BrowserPool
+        The browsers to use for capturing screenshots
+
+    url, folder, locator, warning_threshold, error_threshold, ignored_elements, multielements, wait, wait_timeout, cache, artifacts, method, tolerance, fast, single_capture, tiled, full_page, store, store_folder
+        The same as api.assert_image_similarity_to_baseline()
+
+    Raises
+    ------
+    AssertionError
+        If diff > error_threshold
+
+    ValueError
+        If the artifact policy, comparison method or baseline store does not exist
+
+    Returns
+    -------
+    Union[float, List[float]]:
+        The difference between the two images as a whole number percent, or list of floats if multielement is True
+
+    Examples
+    --------
+    ### Test 2 pages at once
+    ```
+    import asyncio
+    from ez_visual_regression.async_api import BrowserPool, async_assert_image_similarity_to_baseline
+
+    async def main():
+        async with BrowserPool("chrome", size=2) as pool:
+            return await asyncio.gather(
+                async_assert_image_similarity_to_baseline(pool, "tests/example_sites/no_difference/index.html", "tests/example_sites/no_difference", "#myChart"),
+                async_assert_image_similarity_to_baseline(pool, "tests/example_sites/small_difference/index.html", "tests/example_sites/small_difference", "#myChart"),
+            )
+
+    asyncio.run(main()) # About 0 for no_difference, and between 10 and 30 for small_difference
+    ```
+    """
+    _validate_options(artifacts, method, store)
+    os.makedirs(folder, exist_ok=True)
+    cache_options = {"method": method, "tolerance": tolerance, "fast": fast, "single_capture": single_capture, "full_page": full_page} # Other settings that affect the result
+    capture = await pool.run(capture_test, url, folder, locator, ignored_elements, multielements, wait, wait_timeout, cache, cache_options, single_capture, True, full_page)
+    return await pool.compare(compare_capture, capture, warning_threshold, error_threshold, artifacts, method, tolerance, fast, tiled, store, store_folder)
@@ -0,0 +1,331 @@
+# Standard lib dependencies
+import os                                                              # Path verification & modification
+import json                                                            # Used to read/write the metadata file
+import logging                                                         # Enables logging
+import hashlib                                                         # Used to hash baselines
+import threading                                                       # Used to guard metadata writes
+from typing import Dict, List, Tuple, Union
+
+# Third Party Dependencies
+import numpy as np                                                     # Used to hold images in memory
+
+# Internal Dependencies
+from ez_visual_regression.comparison import decode_image, load_image, write_bytes, write_image, mask_regions, image_digest, perceptual_hash, hash_distance
+from ez_visual_regression.pack import packed_baselines, read_packed, add_to_pack
+from ez_visual_regression.store import read_manifest, read_object, store_baseline
+
+
+METADATA_FILENAME = ".ezvr-baselines.json"
+"""The name of the file stored next to the baselines with information about each of them"""
+
+NEAR_DISTANCE = 10
+"""The most bits (out of 64) a capture's perceptual hash can differ from the baseline's for them to be classified as near"""
+
+INDEX_FIELDS = ["sha256", "pixels_sha256", "phash", "size", "signature"]
+"""The fields of a baseline's metadata that make up the index (see index_baseline())"""
+
+BASELINE_STORES = ["files", "pack", "shared"]
+"""Where new baselines are written; as images in the test's folder, in the folder's pack (see pack.add_to_pack()),
+or in a store shared by every test that the folder's manifest points to (see store.store_baseline())"""
+
+_metadata_lock = threading.Lock()
+
+
+def read_baseline_metadata(folder: str, name: Union[str, None] = None) -> Dict:
+    """Reads the stored information about the baselines in a folder
+
+    Parameters
+    ----------
+    folder : str
+        The folder with the baselines
+
+    name : Union[str, None], optional
+        The filename of a baseline (i.e. baseline.png) to get the information for, by default None (all baselines)
+
+    Returns
+    -------
+    Dict
+        The information for the baseline (or a dictionary of filename to information), empty if there is none
+    """
+    path = os.path.join(folder, METADATA_FILENAME)
+    metadata = {}
+    if os.path.exists(path):
+        try:
+            with open(path, "r") as f:
+                metadata = json.load(f)
+        except (OSError, ValueError):
+            logging.warning(f"Baseline metadata {path} could not be read, ignoring it")
+    if name is None:
+        return metadata
+    return metadata.get(name, {})
+
+
+def write_baseline_metadata(folder: str, name: str, **fields):
+    """Updates the stored information about a baseline
+
+    Parameters
+    ----------
+    folder : str
+        The folder with the baselines
+
+    name : str
+        The filename of the baseline (i.e. baseline.png)
+
+    **fields
+        The (JSON serializable) information to store, replaces any existing values with the same keys
+
+    Examples
+    --------
+    ### Record where ignored elements were when a baseline was created
+    ```
+    from ez_visual_regression.baselines import write_baseline_metadata, read_baseline_metadata
+
+    write_baseline_metadata("results", "baseline.png", ignored=[[0, 0, 100, 20]])
+    read_baseline_metadata("results", "baseline.png") # {"ignored": [[0, 0, 100, 20]]}
+    ```
+    """
+    with _metadata_lock:
+        metadata = read_baseline_metadata(folder)
+        metadata.setdefault(name, {}).update(fields)
+        with open(os.path.join(folder, METADATA_FILENAME), "w") as f:
+            json.dump(metadata, f)
+
+
+def baseline_exists(folder: str, name: str) -> bool:
+    """Checks if a baseline exists, either as an image in the folder, in the folder's pack, or in the folder's manifest
+
+    Parameters
+    ----------
+    folder : str
+        The folder with the baselines
+
+    name : str
+        The filename of the baseline (i.e. baseline.png)
+
+    Returns
+    -------
+    bool
+        True if the baseline exists
+    """
+    return os.path.exists(os.path.join(folder, name)) or name in packed_baselines(folder) or name in read_manifest(folder)["baselines"]
+
+
+def read_baseline(folder: str, name: str) -> bytes:
+    """Reads a baseline's PNG bytes, images in the folder are used before ones in the folder's pack, then the shared store
+
+    Parameters
+    ----------
+    folder : str
+        The folder with the baselines
+
+    name : str
+        The filename of the baseline (i.e. baseline.png)
+
+    Raises
+    ------
+    FileNotFoundError
+        If the baseline does not exist
+
+    Returns
+    -------
+    bytes
+        The baseline's PNG bytes
+    """
+    path = os.path.join(folder, name)
+    if os.path.exists(path):
+        with open(path, "rb") as f:
+            return f.read()
+    manifest = read_manifest(folder)
+    if name in manifest["baselines"] and name not in packed_baselines(folder):
+        return read_object(manifest["store"], manifest["baselines"][name])
+    return read_packed(folder, name)
+
+
+def load_baseline(folder: str, name: str) -> np.ndarray:
+    """Decodes a baseline (see read_baseline()), images in the folder are kept in memory by comparison.load_image()
+
+    Parameters
+    ----------
+    folder : str
+        The folder with the baselines
+
+    name : str
+        The filename of the baseline (i.e. baseline.png)
+
+    Raises
+    ------
+    FileNotFoundError
+        If the baseline does not exist
+
+    Returns
+    -------
+    np.ndarray
+        The baseline as a (height, width, 3) BGR array, this may be shared so it should not be modified
+    """
+    path = os.path.join(folder, name)
+    if os.path.exists(path):
+        return load_image(path)
+    return decode_image(read_baseline(folder, name))
+
+
+def write_baseline(folder: str, name: str, capture: Union[bytes, np.ndarray], store: str = "files", store_folder: Union[str, None] = None):
+    """Writes a baseline, PNG bytes are written as-is and images are encoded
+
+    Parameters
+    ----------
+    folder : str
+        The folder with the baselines
+
+    name : str
+        The filename of the baseline (i.e. baseline.png)
+
+    capture : Union[bytes, np.ndarray]
+        The PNG bytes or image to use as the baseline
+
+    store : str, optional
+        Where to write it (see BASELINE_STORES), by default "files"
+
+    store_folder : Union[str, None], optional
+        The folder of the shared store when store is "shared", by default None (see store.store_path())
+    """
+    if store == "shared":
+        store_baseline(folder, name, capture, store_folder)
+    elif store == "pack":
+        add_to_pack(folder, name, capture)
+    elif isinstance(capture, bytes):
+        write_bytes(os.path.join(folder, name), capture)
+    else:
+        write_image(os.path.join(folder, name), capture)
+
+
+def _signature(folder: str, name: str) -> List[Union[int, str]]:
+    """Gets the modification time and size of a baseline image (they change whenever the file is replaced), or the SHA-256 of a packed or stored baseline"""
+    path = os.path.join(folder, name)
+    if os.path.exists(path):
+        stat = os.stat(path)
+        return [stat.st_mtime_ns, stat.st_size]
+    packed = packed_baselines(folder)
+    if name in packed:
+        return ["pack", packed[name]]
+    return ["shared", read_manifest(folder)["baselines"].get(name)]
+
+
+def index_baseline(folder: str, name: str, image: Union[np.ndarray, None] = None) -> Dict:
+    """Hashes a baseline and stores the hashes in the folder's metadata, called whenever a baseline is written
+
+    The index has the SHA-256 of the file (sha256), the SHA-256 of it's pixels with the ignored regions blanked out (pixels_sha256),
+    a perceptual hash of the same (phash), it's [width, height] (size), and the file's modification time and size, or the SHA-256 of a packed or stored baseline (signature)
+
+    Parameters
+    ----------
+    folder : str
+        The folder with the baselines
+
+    name : str
+        The filename of the baseline (i.e. baseline.png)
+
+    image : Union[np.ndarray, None], optional
+        The baseline's pixels if they're already in memory, by default None (decoded from the file)
+
+    Returns
+    -------
+    Dict
+        The baseline's metadata (including the index)
+    """
+    data = read_baseline(folder, name)
+    if image is None:
+        image = decode_image(data)
+    masked = mask_regions(image, read_baseline_metadata(folder, name).get("ignored", []))
+    fields = {"sha256": hashlib.sha256(data).hexdigest(), "pixels_sha256": image_digest(masked), "phash": perceptual_hash(masked),
+              "size": [int(image.shape[1]), int(image.shape[0])], "signature": _signature(folder, name)}
+    write_baseline_metadata(folder, name, **fields)
+    return read_baseline_metadata(folder, name)
+
+
+def baseline_index_entry(folder: str, name: str) -> Dict:
+    """Gets a baseline's metadata with an up to date index, re-indexing baselines that were replaced or created before the index existed
+
+    Parameters
+    ----------
+    folder : str
+        The folder with the baselines
+
+    name : str
+        The filename of the baseline (i.e. baseline.png)
+
+    Raises
+    ------
+    FileNotFoundError
+        If the baseline does not exist
+
+    Returns
+    -------
+    Dict
+        The baseline's metadata (see index_baseline() for the index fields)
+    """
+    if not baseline_exists(folder, name):
+        raise FileNotFoundError(f"Baseline {os.path.join(folder, name)} does not exist")
+    entry = read_baseline_metadata(folder, name)
+    if all(field in entry for field in INDEX_FIELDS) and entry["signature"] == _signature(folder, name):
+        return entry
+    logging.debug(f"Indexing baseline {os.path.join(folder, name)}")
+    return index_baseline(folder, name)
+
+
+def classify_capture(folder: str, name: str, capture: Union[bytes, np.ndarray], ignored_regions: Union[List[List[int]], None] = None) -> Tuple[str, int]:
+    """Classifies a capture against it's baseline using only the index, without decoding the baseline
+
+    Parameters
+    ----------
+    folder : str
+        The folder with the baselines
+
+    name : str
+        The filename of the baseline (i.e. baseline.png)
+
+    capture : Union[bytes, np.ndarray]
+        The PNG bytes or image that was captured
+
+    ignored_regions : Union[List[List[int]], None], optional
+        The [x, y, width, height] regions of the ignored elements in the capture, by default None
+
+    Notes
+    -----
+    - A perceptual hash can't tell how many pixels changed, so "near" and "different" are only a triage (i.e. to find which baselines
+      to look at first), the comparison methods are still needed to get the difference
+
+    Raises
+    ------
+    FileNotFoundError
+        If the baseline does not exist
+
+    Returns
+    -------
+    Tuple[str, int]
+        "identical" (the same pixels), "near" (at most NEAR_DISTANCE bits of the perceptual hash differ) or "different",
+        and how many bits of the perceptual hash differ
+
+    Examples
+    --------
+    ### Find the tests that changed the most
+    ```
+    from ez_visual_regression.api import instantiate_driver, capture_test
+    from ez_visual_regression.baselines import classify_capture
+
+    driver = instantiate_driver("chrome")
+    capture = capture_test(driver, "https://canadiancoding.ca", "home")
+    classify_capture("home", "baseline.png", capture.captures[0], capture.regions[0]) # ("near", 3)
+    ```
+    """
+    entry = baseline_index_entry(folder, name)
+    if isinstance(capture, bytes):
+        if hashlib.sha256(capture).hexdigest() == entry["sha256"]:
+            return "identical", 0
+        capture = decode_image(capture)
+    baseline_regions = entry.get("ignored", [])
+    regions = list(ignored_regions or [])
+    masked = mask_regions(capture, regions + baseline_regions)
+    if sorted(regions) == sorted(baseline_regions) and image_digest(masked) == entry["pixels_sha256"]:
+        return "identical", 0
+    distance = hash_distance(perceptual_hash(masked), entry["phash"])
+    return ("near" if distance <= NEAR_DISTANCE else "different"), distance
@@ -0,0 +1,308 @@
+# Standard lib dependencies
+import os                                                              # Path verification & modification
+import re                                                              # Used to find references in CSS
+import glob                                                            # Used to find baseline images
+import fnmatch                                                         # Used to find packed baselines
+import json                                                            # Used to read/write the cache index
+import hashlib                                                         # Used to hash page inputs
+import logging                                                         # Enables logging
+import threading                                                       # Used to name temporary files per thread
+from html.parser import HTMLParser                                     # Used to find references in HTML
+from urllib.parse import urlparse, unquote                             # Used to convert file URL's to paths
+from typing import Union, List, Set, Dict
+
+# Third Party Dependencies
+from selenium.webdriver.remote.webdriver import WebDriver              # Used for type hinting
+
+# Internal Dependencies
+from ez_visual_regression.pack import packed_baselines
+from ez_visual_regression.store import read_manifest
+
+
+CACHE_FILENAME = ".ezvr-cache.json"
+"""The name of the index file stored next to the baselines"""
+
+# Serializes the DOM, and digests every element's computed style (FNV-1a so large pages don't send megabytes back)
+PAGE_DIGEST_SCRIPT = """var hash = 0x811c9dc5;
+function update(text){
+    for (var i = 0; i < text.length; i++) {
+        hash ^= text.charCodeAt(i);
+        hash = Math.imul(hash, 0x01000193) >>> 0;
+    }
+}
+var elements = document.querySelectorAll("*");
+for (var i = 0; i < elements.length; i++) {
+    var style = window.getComputedStyle(elements[i]);
+    for (var j = 0; j < style.length; j++) {
+        update(style[j] + ":" + style.getPropertyValue(style[j]) + ";");
+    }
+}
+return [document.documentElement.outerHTML, hash.toString(16)];"""
+
+CSS_REFERENCE_PATTERN = re.compile(r"""url\(\s*['"]?([^'")]+)['"]?\s*\)|@import\s+['"]([^'"]+)['"]""")
+"""Finds url(...) and @import references in stylesheets"""
+
+
+class _ReferenceParser(HTMLParser):
+    """Collects the paths of all the stylesheets, scripts, images etc. an HTML file references"""
+    def __init__(self):
+        super().__init__()
+        self.references = []
+        self.inline_styles = []
+        self._in_style = False
+
+    def handle_starttag(self, tag, attrs):
+        attrs = dict(attrs)
+        for attribute in ("src", "href", "poster", "data"):
+            if attrs.get(attribute) and not (tag == "a" and attribute == "href"):
+                self.references.append(attrs[attribute])
+        if attrs.get("srcset"):
+            self.references += [candidate.strip().split(" ")[0] for candidate in attrs["srcset"].split(",") if candidate.strip()]
+        if attrs.get("style"):
+            self.inline_styles.append(attrs["style"])
+        self._in_style = tag == "style"
+
+    def handle_endtag(self, tag):
+        self._in_style = False
+
+    def handle_data(self, data):
+        if self._in_style:
+            self.inline_styles.append(data)
+
+
+def local_page_path(url: str) -> Union[str, None]:
+    """Gets the file path for a file:/// URL
+
+    Parameters
+    ----------
+    url : str
+        The URL (with protocol)
+
+    Returns
+    -------
+    Union[str, None]
+        The path to the file, or None if it is not a local file
+    """
+    if not url.startswith("file://"):
+        return None
+    path = unquote(urlparse(url).path)
+    if re.match(r"^/[A-Za-z]:/", path): # Windows drive paths (file:///C:/...)
+        path = path[1:]
+    return path
+
+
+def _local_reference(reference: str, directory: str) -> Union[str, None]:
+    """Resolves a reference from a page or stylesheet to a local file path, None if it's remote or inline"""
+    reference = reference.split("#")[0].split("?")[0].strip()
+    if not reference or (re.match(r"^([a-zA-Z][a-zA-Z0-9+.-]*:|//)", reference) and not reference.startswith("file:")):
+        return None
+    if reference.startswith("file:"):
+        return local_page_path(reference)
+    return os.path.normpath(os.path.join(directory, unquote(reference)))
+
+
+def _collect_css_references(path: str, text: str, found: Set[str]):
+    """Recursively adds all local files referenced by a stylesheet (imports, images, fonts) to found"""
+    for match in CSS_REFERENCE_PATTERN.finditer(text):
+        reference = _local_reference(match.group(1) or match.group(2), os.path.dirname(path))
+        if reference and reference not in found and os.path.isfile(reference):
+            found.add(reference)
+            if reference.endswith(".css"):
+                with open(reference, "r", errors="ignore") as f:
+                    _collect_css_references(reference, f.read(), found)
+
+
+def local_page_dependencies(path: str) -> List[str]:
+    """Finds every local file an HTML file depends on (stylesheets, scripts, images, fonts etc.)
+
+    Parameters
+    ----------
+    path : str
+        The path to the HTML file
+
+    Returns
+    -------
+    List[str]
+        The sorted paths of every file referenced by the page (including the page), remote references are ignored
+    """
+    found = {os.path.normpath(path)}
+    if not path.endswith((".html", ".htm")):
+        return sorted(found)
+    parser = _ReferenceParser()
+    with open(path, "r", errors="ignore") as f:
+        parser.feed(f.read())
+    for reference in parser.references:
+        reference = _local_reference(reference, os.path.dirname(path))
+        if reference and reference not in found and os.path.isfile(reference):
+            found.add(reference)
+            if reference.endswith(".css"):
+                with open(reference, "r", errors="ignore") as f:
+                    _collect_css_references(reference, f.read(), found)
+    for style in parser.inline_styles:
+        _collect_css_references(path, style, found)
+    return sorted(found)
+
+
+def _hash_files(paths: List[str]) -> str:
+    """Hashes the names and contents of a list of files"""
+    digest = hashlib.sha256()
+    for path in paths:
+        digest.update(path.encode())
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(1 << 20), b""):
+                digest.update(chunk)
+    return digest.hexdigest()
+
+
+def hash_local_page(path: str) -> str:
+    """Hashes an HTML file along with every local file it references (see local_page_dependencies())
+
+    Parameters
+    ----------
+    path : str
+        The path to the HTML file
+
+    Returns
+    -------
+    str
+        The hex digest of the page's inputs
+    """
+    return _hash_files(local_page_dependencies(path))
+
+
+def hash_loaded_page(driver: WebDriver) -> str:
+    """Hashes the serialized DOM and the computed styles of the page currently loaded in a browser
+
+    Parameters
+    ----------
+    driver : WebDriver
+        The browser with the page loaded
+
+    Returns
+    -------
+    str
+        The hex digest of the page
+    """
+    html, style_digest = driver.execute_script(PAGE_DIGEST_SCRIPT)
+    return hashlib.sha256(f"{html}{style_digest}".encode()).hexdigest()
+
+
+def browser_identity(driver: WebDriver) -> Dict:
+    """Gets the details of a browser that affect it's screenshots (used in cache keys)
+
+    Parameters
+    ----------
+    driver : WebDriver
+        The browser
+
+    Returns
+    -------
+    Dict
+        The browser's name and viewport size
+    """
+    window = driver.get_window_size()
+    return {"browser": driver.name, "viewport": [window["width"], window["height"]]}
+
+
+def compute_cache_key(driver: Union[WebDriver, Dict], page_digest: str, folder: str, locator: Union[str, None], ignored_elements: Union[List[str], None], multielements: bool, options: Union[Dict, None] = None) -> str:
+    """Creates the key that identifies a test's inputs
+
+    Parameters
+    ----------
+    driver : Union[WebDriver, Dict]
+        The browser being used, or it's browser_identity() (it's name and window size are part of the key)
+
+    page_digest : str
+        The hash of the page (see hash_local_page() and hash_loaded_page())
+
+    folder : str
+        The folder with the baseline(s), their contents are part of the key
+
+    locator : Union[str, None]
+        The CSS selector of the element(s) being tested
+
+    ignored_elements : Union[List[str], None]
+        The query selectors of the elements being ignored
+
+    multielements : bool
+        Whether the test is in multielement mode
+
+    options : Union[Dict, None], optional
+        Any other (JSON serializable) settings that affect the result, by default None
+
+    Returns
+    -------
+    str
+        The hex digest of all the inputs
+    """
+    baselines = sorted(glob.glob(os.path.join(folder, "baseline-*.png" if multielements else "baseline.png")))
+    identity = driver if isinstance(driver, dict) else browser_identity(driver)
+    inputs = {
+        "page": page_digest,
+        "baselines": _hash_files(baselines) if baselines else None,
+        "locator": locator or None,
+        "ignored_elements": list(ignored_elements or []),
+        "multielements": bool(multielements),
+        "browser": identity["browser"],
+        "viewport": identity["viewport"],
+        "options": options or {},
+    }
+    pattern = "baseline-*.png" if multielements else "baseline.png"
+    packed = {name: digest for name, digest in packed_baselines(folder).items() if fnmatch.fnmatch(name, pattern)}
+    if packed:
+        inputs["packed_baselines"] = packed
+    stored = {name: digest for name, digest in read_manifest(folder)["baselines"].items() if fnmatch.fnmatch(name, pattern)}
+    if stored:
+        inputs["stored_baselines"] = stored
+    return hashlib.sha256(json.dumps(inputs, sort_keys=True).encode()).hexdigest()
+
+
+def get_cached_result(folder: str, key: str) -> Union[float, List[float], None]:
+    """Gets the result of the last passing run if it had the same key
+
+    Parameters
+    ----------
+    folder : str
+        The folder with the baseline(s) and cache index
+
+    key : str
+        The key for the current inputs (see compute_cache_key())
+
+    Returns
+    -------
+    Union[float, List[float], None]
+        The cached difference(s), or None if there is no result for the key
+    """
+    path = os.path.join(folder, CACHE_FILENAME)
+    if not os.path.exists(path):
+        return None
+    try:
+        with open(path, "r") as f:
+            index = json.load(f)
+    except (OSError, ValueError):
+        logging.warning(f"Cache index {path} could not be read, ignoring it")
+        return None
+    if index.get("key") != key:
+        return None
+    return index.get("result")
+
+
+def store_cached_result(folder: str, key: str, result: Union[float, List[float]]):
+    """Records the result of a passing run
+
+    Parameters
+    ----------
+    folder : str
+        The folder with the baseline(s) and cache index
+
+    key : str
+        The key for the inputs of the run (see compute_cache_key())
+
+    result : Union[float, List[float]]
+        The difference(s) from the run
+    """
+    path = os.path.join(folder, CACHE_FILENAME)
+    temporary = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(temporary, "w") as f:
+        json.dump({"key": key, "result": result}, f)
+    os.replace(temporary, path) # A crash or another worker never leaves a partial index
@@ -1,8 +1,13 @@
 import os
+import time
 
 from ez_visual_regression import __version__
 from ez_visual_regression.api import *
-from ez_visual_regression.configuration import parse_config, execute_config
+from ez_visual_regression.configuration import JSON_LINES_EXTENSIONS, parse_config, stream_config, execute_config
+from ez_visual_regression.session import browser_session, start_daemon, stop_daemon, attach_to_daemon
+from ez_visual_regression.drivers import LaunchProfile, parse_launch_profile
+from ez_visual_regression.timing import PhaseTimings, track, write_report
+from ez_visual_regression.sharding import SHARD_REPORT_FILENAME, parse_shard, load_durations, shard_config, merge_reports
 
 from docopt import docopt                                              # Handles CLI parsing
 
@@ -10,14 +15,43 @@ from docopt import docopt                                              # Handles
 usage = """ez visual regression
 
 Usage:
-ezvr [<config_file>] [-h] [-v]
-ezvr screenshot <url> [-l locator] [-i ignored_elements] [-f folder] [-m]
-ezvr test <url> [-l locator] [-i ignored_elements] [-f folder] [-w warning_threshold] [-e error_threshold] [-m]
+ezvr [<config_file>] [-h] [-v] [--workers N] [--compare-workers N] [--cache] [--artifacts policy] [--method method] [--tolerance tolerance] [--fast] [--tiled] [--store store] [--store-folder folder] [--single-capture] [--full-page] [--headed] [--window-size size] [--scale-factor factor] [--report file] [--changed-only] [--since ref] [--shard shard] [--durations file] [--stream]
+ezvr screenshot <url> [-l locator] [-i ignored_elements] [-f folder] [-m] [--driver driver] [--wait strategies] [--wait-timeout seconds] [--full-page] [--headed] [--window-size size] [--scale-factor factor]
+ezvr test <url> [-l locator] [-i ignored_elements] [-f folder] [-w warning_threshold] [-e error_threshold] [-m] [--driver driver] [--wait strategies] [--wait-timeout seconds] [--cache] [--artifacts policy] [--method method] [--tolerance tolerance] [--fast] [--tiled] [--store store] [--store-folder folder] [--single-capture] [--full-page] [--headed] [--window-size size] [--scale-factor factor] [--report file]
+ezvr merge <reports>... [-o file]
+ezvr daemon (start|stop|status) [--driver driver] [--headed] [--window-size size] [--scale-factor factor]
 
 Options:
     -h, --help            show this help message and exit
     -v, --version         show program's version number and exit
     -m, --multielement    Whether the test should be in multielement mode
+    --workers N           How many browsers to run config tests on at the same time (overrides workers in config)
+    --compare-workers N   How many comparisons to run at the same time (overrides compare_workers in config)
+    --cache               Skip tests whose page, settings and baseline are unchanged since their last passing run
+    --artifacts policy    When to write current/diff/thresh images, "all", "failure" or "none" (overrides artifacts in config)
+    --method method       How to compare images, "ssim" or "pixel" (overrides method in config)
+    --tolerance tolerance
+                        How much (0-255) a pixel can change before it counts as changed with the pixel method
+    --fast                Stop comparing as soon as the result is certain (identical screenshots aren't compared)
+    --tiled               Compare screenshots in parallel tiles, and report which tiles changed (decodes a few rows of tiles at a time)
+    --store store         Where new baselines are written, "files", "pack" (one deduplicated file per folder) or "shared" (one store for every test)
+    --store-folder folder
+                        The folder of the shared store when --store is "shared" (default: EZVR_STORE or .ezvr-store)
+    --single-capture      Crop multiple elements out of one page screenshot instead of screenshotting each one
+    --full-page           Capture the whole page instead of just the viewport (when there's no locator)
+    --driver driver       The browser for screenshot, test and daemon commands, "chrome", "edge" or "firefox" [default: chrome]
+    --headed              Show the browser window instead of running headless
+    --window-size size    The browser's window size in CSS pixels as WIDTHxHEIGHT (i.e. 1280x800)
+    --scale-factor factor
+                        The device scale factor to render at (i.e. 2 for retina screenshots)
+    --changed-only        Only run the tests whose page, stylesheets, scripts, images, fonts or baselines changed since they last passed
+    --since ref           With --changed-only, select tests whose files changed since a git ref (i.e. main) instead
+    --report file         Write how long each phase of each test took (and browser round trips, image sizes) to a JSON file
+    --shard shard         Only run one shard of the config's tests as INDEX/COUNT (i.e. 2/4), the report defaults to ezvr-report-INDEX-of-COUNT.json
+    --durations file      A report from a previous run (i.e. a merged report) used to give each shard the same amount of work
+    --stream              Run tests while the config is still being read (YAML with one document per test, always used for .jsonl configs)
+    -o file, --output file
+                        The file to write the merged report to
     -i ignored_elements, --ignore ignored_elements 
                         a list of ignored elements
     -l locator, --locator locator 
@@ -28,28 +62,110 @@ Options:
                         The threshold as a float before a warning is logged
     -e error_threshold, --error error_threshold
                         The threshold as a float before an error is raised
+    --wait strategies     Comma separated stability checks to wait on before screenshots (i.e. ready_state,fonts)
+    --wait-timeout seconds
+                        The maximum amount of seconds to wait for the page to be stable [default: 10]
 """
 
+def apply_launch_arguments(args: dict, profile: LaunchProfile) -> LaunchProfile:
+    """Overrides the settings of a launch profile with the ones passed on the command line"""
+    settings = {}
+    if args["--headed"]:
+        settings["headless"] = False
+    if args["--window-size"]:
+        settings["window_size"] = args["--window-size"]
+    if args["--scale-factor"]:
+        settings["scale_factor"] = args["--scale-factor"]
+    return parse_launch_profile({**vars(profile), **settings})
+
 def main():
     args = docopt(usage, version=__version__)
     
-    if args["<config_file>"] or (not args["screenshot"] and not args["test"]):
+    if args["<config_file>"] or (not args["screenshot"] and not args["test"] and not args["daemon"] and not args["merge"]):
         if not args["<config_file>"]:
             args["<config_file>"] = "config.yml"
-        config = parse_config(args["<config_file>"])
-        execute_config(config)
+        if args["--stream"] or args["<config_file>"].lower().endswith(JSON_LINES_EXTENSIONS):
+            config = stream_config(args["<config_file>"])
+        else:
+            config = parse_config(args["<config_file>"])
+        if args["--compare-workers"]:
+            config["compare_workers"] = int(args["--compare-workers"])
+        if args["--cache"]:
+            config["cache"] = True
+        if args["--artifacts"]:
+            config["artifacts"] = args["--artifacts"]
+        if args["--method"]:
+            config["method"] = args["--method"]
+        if args["--tolerance"]:
+            config["tolerance"] = int(args["--tolerance"])
+        if args["--fast"]:
+            config["fast"] = True
+        if args["--tiled"]:
+            config["tiled"] = True
+        if args["--store"]:
+            config["store"] = args["--store"]
+        if args["--store-folder"]:
+            config["store_folder"] = args["--store-folder"]
+        if args["--single-capture"]:
+            config["single_capture"] = True
+        if args["--full-page"]:
+            config["full_page"] = True
+        config["profile"] = apply_launch_arguments(args, config["profile"])
+        if args["--report"]:
+            config["report"] = args["--report"]
+        if args["--changed-only"] or args["--since"]:
+            config["changed_only"] = True
+        if args["--since"]:
+            config["since"] = args["--since"]
+        if args["--shard"]:
+            index, count = parse_shard(args["--shard"])
+            config = shard_config(config, index, count, load_durations(args["--durations"]))
+            if not config["report"]:
+                config["report"] = SHARD_REPORT_FILENAME.format(index=index, count=count)
+        try:
+            execute_config(config, int(args["--workers"]) if args["--workers"] else None)
+        except AssertionError as e:
+            print(e)
+            exit(1)
+
+    elif args["merge"]:
+        try:
+            report = merge_reports(args["<reports>"], args["--output"])
+        except ValueError as e:
+            print(e)
+            exit(1)
+        for failure in report["failures"]:
+            print(f"{failure['output']} failed: {failure['error']}")
+        print(f"{len(report['results']) - len(report['failures'])} passed, {len(report['failures'])} failed across {report['shards']} shard(s) in {report['elapsed']:.2f}s")
+        if args["--output"]:
+            print(f"Merged report saved to {args['--output']}")
+        if report["failures"]:
+            exit(1)
+
+    elif args["daemon"]:
+        driver_name = args["--driver"].lower()
+        if args["start"]:
+            try:
+                session = start_daemon(driver_name, apply_launch_arguments(args, LaunchProfile()))
+            except RuntimeError as e:
+                print(e)
+                exit(1)
+            print(f"Daemon running {driver_name} (pid {session['pid']}), screenshot and test commands with the same launch settings will use it")
+        elif args["stop"]:
+            print("Daemon stopped" if stop_daemon(driver_name) else "No daemon was running")
+        else:
+            print(f"Daemon is running {driver_name}" if attach_to_daemon(driver_name) else "No daemon is running")
 
     elif args["screenshot"]:
-        driver_name = "chrome"
-        driver = instantiate_driver(driver_name)
+        driver_name = args["--driver"].lower()
         # Preprocess arguments
         if not args["--folder"]:
             args["--folder"] = "."
-        get_screenshot(driver, args["<url>"],os.path.join(args["--folder"], "screenshot.png"), args["--locator"], args["--ignore"])
+        with browser_session(driver_name, profile=apply_launch_arguments(args, LaunchProfile())) as driver:
+            get_screenshot(driver, args["<url>"],os.path.join(args["--folder"], "screenshot.png"), args["--locator"], args["--ignore"], args["--wait"], float(args["--wait-timeout"]), full_page=args["--full-page"])
         print(f"Screenshot saved to {os.path.join(args['--folder'], 'screenshot.png')}")
     elif args["test"]:
-        driver_name = "chrome"
-        driver = instantiate_driver(driver_name)
+        driver_name = args["--driver"].lower()
         # Preprocess arguments
         if not args["--folder"]:
             args["--folder"] = "."
@@ -62,6 +178,12 @@ def main():
         else:
             args["--error"] = float(args["--error"])
 
-        diff = assert_image_similarity_to_baseline(driver, args["<url>"], args["--folder"], args["--locator"], args["--warning"], args["--error"], args["--ignore"], args["--multielement"])
+        timings = PhaseTimings(args["--folder"])
+        start = time.perf_counter()
+        try:
+            with browser_session(driver_name, profile=apply_launch_arguments(args, LaunchProfile())) as driver, track(timings):
+                diff = assert_image_similarity_to_baseline(driver, args["<url>"], args["--folder"], args["--locator"], args["--warning"], args["--error"], args["--ignore"], args["--multielement"], args["--wait"], float(args["--wait-timeout"]), args["--cache"], args["--artifacts"] or "all", args["--method"] or "ssim", int(args["--tolerance"] or 0), args["--fast"], args["--single-capture"], tiled=args["--tiled"], full_page=args["--full-page"], store=args["--store"] or "files", store_folder=args["--store-folder"])
+        finally:
+            if args["--report"]:
+                write_report(args["--report"], [timings], time.perf_counter() - start)
         print(f"Difference was: {diff}")
-
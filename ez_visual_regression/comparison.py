@@ -0,0 +1,944 @@
+# Standard lib dependencies
+import os                                                              # Path verification & modification
+import zlib                                                            # Used to decode PNG's a strip at a time
+import json                                                            # Used to write changed tiles
+import struct                                                          # Used to read and write PNG chunks
+import hashlib                                                         # Used to detect identical images
+import threading                                                       # Used to guard the baseline cache
+from concurrent.futures import ThreadPoolExecutor                      # Used to compare tiles in parallel
+from dataclasses import dataclass, field                               # Used for comparison results
+from collections import OrderedDict                                    # Used as an LRU cache
+from typing import Dict, Iterator, List, Tuple, Union
+
+# Third Party Dependencies
+import cv2                                                             # Used to decode/encode images
+import numpy as np                                                     # Used to hold images in memory
+from skimage.metrics import structural_similarity                      # Used to compare images
+
+
+BASELINE_CACHE_SIZE = 64
+"""The maximum number of decoded baselines kept in memory"""
+
+COMPARISON_METHODS = ["ssim", "pixel"]
+"""The available ways to compare images; structural similarity (ez_img_diff compatible), or percentage of changed pixels"""
+
+BOX_MERGE_DISTANCE = 8
+"""Changed regions closer than this many pixels are reported as a single bounding box"""
+
+DENSE_ANTIALIASING_RATIO = 16
+"""If more than 1/DENSE_ANTIALIASING_RATIO of pixels changed the anti-aliasing check is done on the whole image instead of per changed pixel"""
+
+FAST_BAND_HEIGHT = 256
+"""How many rows are compared at a time by bounded_difference() before checking if the result is certain"""
+
+SSIM_WINDOW = 7
+"""The window size used by skimage's structural_similarity() (the default)"""
+
+TILE_SIZE = 512
+"""The width and height of the tiles compared by tiled_difference()"""
+
+TILE_OVERVIEW_PIXELS = 4_000_000
+"""The maximum size (in pixels) of the scaled down current image kept by tiled_difference() for its diff and thresh images"""
+
+KNOWN_DIFFERENCES_SIZE = 4096
+"""The maximum number of comparison results kept in memory by remember_difference()"""
+
+PNG_COMPRESSION = 1
+"""The zlib level (0-9) images are encoded to PNG with by encode_image(), 1 is the fastest level that still compresses"""
+
+PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+"""The first 8 bytes of every PNG"""
+
+_digest_cache: "Dict[str, Tuple[Tuple[int, int], str]]" = {}
+
+_baseline_cache: "OrderedDict[str, Tuple[Tuple[int, int], np.ndarray]]" = OrderedDict()
+_baseline_cache_lock = threading.Lock()
+
+_known_differences: "OrderedDict[tuple, float]" = OrderedDict()
+_known_differences_lock = threading.Lock()
+
+
+def decode_image(data: bytes) -> np.ndarray:
+    """Decodes an encoded image (i.e. the PNG bytes from driver.get_screenshot_as_png()) into a BGR array
+
+    Parameters
+    ----------
+    data : bytes
+        The encoded image
+
+    Raises
+    ------
+    ValueError
+        If the data could not be decoded
+
+    Returns
+    -------
+    np.ndarray
+        The image as a (height, width, 3) BGR array (the same as cv2.imread())
+    """
+    image = cv2.imdecode(np.frombuffer(data, np.uint8), cv2.IMREAD_COLOR)
+    if image is None:
+        raise ValueError("Image data could not be decoded")
+    return image
+
+
+def _png_chunk(kind: bytes, body: bytes) -> bytes:
+    """Encodes a PNG chunk (length, type, body and CRC)"""
+    return b"".join((struct.pack(">I", len(body)), kind, body, struct.pack(">I", zlib.crc32(body, zlib.crc32(kind)))))
+
+
+def _image_size(source: Union[bytes, np.ndarray]) -> Tuple[int, int]:
+    """Gets the (height, width) of an image, PNG bytes are read from their header instead of being decoded"""
+    if isinstance(source, np.ndarray):
+        return source.shape[0], source.shape[1]
+    if source[:8] == PNG_SIGNATURE and source[12:16] == b"IHDR":
+        width, height = struct.unpack(">II", source[16:24])
+        return height, width
+    return decode_image(source).shape[:2]
+
+
+def _image_strips(source: Union[bytes, np.ndarray], strip_height: int) -> Iterator[np.ndarray]:
+    """Yields an image (BGR) strip_height rows at a time, PNG bytes are decoded one strip at a time so the whole image is never in memory
+
+    Each strip's filtered rows are inflated and re-wrapped as a small PNG (after the previous strip's last row, which later rows can be filtered against)
+    for OpenCV to decode. Only non-interlaced 8 bit RGB and RGBA PNG's (what browsers and encode_image() write) are decoded this way, others are decoded whole
+    """
+    if isinstance(source, np.ndarray):
+        for top in range(0, source.shape[0], strip_height):
+            yield source[top:top + strip_height]
+        return
+    view, header, data = memoryview(source), None, []
+    position = len(PNG_SIGNATURE) if source[:8] == PNG_SIGNATURE else len(source)
+    while position + 8 <= len(source):
+        length, kind = struct.unpack(">I4s", view[position:position + 8])
+        if kind == b"IHDR":
+            header = struct.unpack(">IIBBBBB", view[position + 8:position + 21])
+        elif kind == b"IDAT":
+            data.append(view[position + 8:position + 8 + length])
+        position += length + 12
+    if header is None or header[2] != 8 or header[3] not in (2, 6) or header[6] != 0:
+        yield from _image_strips(decode_image(source), strip_height)
+        return
+
+    width, height, _, color_type = header[:4]
+    channels = 3 if color_type == 2 else 4
+    stride = width * channels + 1          # Each row starts with the type of filter it uses
+    order = [2, 1, 0, 3][:channels]        # BGR(A) back to RGB(A)
+    inflater, chunks = zlib.decompressobj(), iter(data)
+    pending, previous = bytearray(), b""
+    for top in range(0, height, strip_height):
+        rows = min(strip_height, height - top)
+        while len(pending) < rows * stride:
+            chunk = inflater.unconsumed_tail or next(chunks, b"")
+            if not chunk:
+                raise ValueError("Image data could not be decoded")
+            pending += inflater.decompress(chunk, rows * stride - len(pending))
+        count = rows + (1 if previous else 0)
+        compressor = zlib.compressobj(0) # Stored, OpenCV only has to copy it
+        filtered = compressor.compress(b"\0" + previous) if previous else b""
+        with memoryview(pending) as view:
+            filtered += compressor.compress(view[:rows * stride]) + compressor.flush()
+        del pending[:rows * stride]
+        strip = b"".join((PNG_SIGNATURE, _png_chunk(b"IHDR", struct.pack(">IIBBBBB", width, count, 8, color_type, 0, 0, 0)),
+                          _png_chunk(b"IDAT", filtered), _png_chunk(b"IEND", b"")))
+        image = cv2.imdecode(np.frombuffer(strip, np.uint8), cv2.IMREAD_UNCHANGED)
+        if image is None:
+            raise ValueError("Image data could not be decoded")
+        image = image[count - rows:]
+        previous = image[-1][:, order].tobytes()
+        yield np.ascontiguousarray(image[:, :, :3])
+
+
+def encode_image(image: np.ndarray, compression: int = PNG_COMPRESSION) -> bytes:
+    """Encodes an image (BGR array) to PNG bytes
+
+    Parameters
+    ----------
+    image : np.ndarray
+        The image to encode
+
+    compression : int, optional
+        The zlib level (0-9) to compress with, higher is smaller but slower, by default 1
+
+    Raises
+    ------
+    ValueError
+        If the image could not be encoded
+
+    Returns
+    -------
+    bytes
+        The PNG bytes
+    """
+    encoded, data = cv2.imencode(".png", image, [cv2.IMWRITE_PNG_COMPRESSION, compression])
+    if not encoded:
+        raise ValueError("Image could not be encoded")
+    return data.tobytes()
+
+
+def load_image(path: str) -> np.ndarray:
+    """Reads an image from disk, keeping it in memory so later calls don't have to decode it again
+
+    Parameters
+    ----------
+    path : str
+        The path to the image
+
+    Raises
+    ------
+    FileNotFoundError
+        If the image does not exist
+
+    Returns
+    -------
+    np.ndarray
+        The image as a (height, width, 3) BGR array, this is shared so it should not be modified
+
+    Notes
+    -----
+    - Cached images are reloaded if the file's modification time or size changes
+    """
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"Image {path} does not exist")
+    path = os.path.abspath(path)
+    stat = os.stat(path)
+    signature = (stat.st_mtime_ns, stat.st_size)
+    with _baseline_cache_lock:
+        cached = _baseline_cache.get(path)
+        if cached and cached[0] == signature:
+            _baseline_cache.move_to_end(path)
+            return cached[1]
+    with open(path, "rb") as f:
+        image = decode_image(f.read())
+    image.flags.writeable = False
+    with _baseline_cache_lock:
+        _baseline_cache[path] = (signature, image)
+        _baseline_cache.move_to_end(path)
+        while len(_baseline_cache) > BASELINE_CACHE_SIZE:
+            _baseline_cache.popitem(last=False)
+    return image
+
+
+def known_difference(key: tuple) -> Union[float, None]:
+    """Gets the result of a comparison that was already done in this process (see remember_difference())
+
+    Parameters
+    ----------
+    key : tuple
+        What identifies the comparison (i.e. the hashes of both images and the comparison settings)
+
+    Returns
+    -------
+    Union[float, None]
+        The difference, or None if the comparison hasn't been done
+    """
+    with _known_differences_lock:
+        difference = _known_differences.get(key)
+        if difference is not None:
+            _known_differences.move_to_end(key)
+        return difference
+
+
+def remember_difference(key: tuple, difference: float):
+    """Keeps the result of a comparison in memory, so comparing the same images again (i.e. a header shared by many tests) is instant
+
+    Parameters
+    ----------
+    key : tuple
+        What identifies the comparison (i.e. the hashes of both images and the comparison settings)
+
+    difference : float
+        The result of the comparison
+    """
+    with _known_differences_lock:
+        _known_differences[key] = difference
+        _known_differences.move_to_end(key)
+        while len(_known_differences) > KNOWN_DIFFERENCES_SIZE:
+            _known_differences.popitem(last=False)
+
+
+def file_digest(path: str) -> str:
+    """Gets the SHA-256 of a file, keeping it in memory until the file's modification time or size changes
+
+    Parameters
+    ----------
+    path : str
+        The path to the file
+
+    Returns
+    -------
+    str
+        The hex digest of the file
+    """
+    path = os.path.abspath(path)
+    stat = os.stat(path)
+    signature = (stat.st_mtime_ns, stat.st_size)
+    cached = _digest_cache.get(path)
+    if cached and cached[0] == signature:
+        return cached[1]
+    with open(path, "rb") as f:
+        digest = hashlib.sha256(f.read()).hexdigest()
+    _digest_cache[path] = (signature, digest)
+    return digest
+
+
+def write_bytes(path: str, data: bytes):
+    """Writes already encoded image bytes to a file (avoids decoding and re-encoding screenshots)"""
+    with open(path, "wb") as f:
+        f.write(data)
+
+
+def write_image(path: str, image: np.ndarray):
+    """Encodes an image (BGR array) to a file, the format is based on the extension (i.e. .png)"""
+    if not cv2.imwrite(path, image):
+        raise ValueError(f"Image could not be written to {path}")
+
+
+def mask_regions(image: np.ndarray, regions: List[Tuple[int, int, int, int]]) -> np.ndarray:
+    """Blanks out (fills with black) regions of an image so they can't affect a comparison
+
+    Parameters
+    ----------
+    image : np.ndarray
+        The image (BGR), it is not modified
+
+    regions : List[Tuple[int, int, int, int]]
+        The (x, y, width, height) pixel regions to blank out, parts outside the image are ignored
+
+    Returns
+    -------
+    np.ndarray
+        A masked copy of the image, or the image itself if there are no regions
+
+    Examples
+    --------
+    ### Ignore a 100x20 banner in the top left of both images
+    ```
+    from ez_visual_regression.comparison import load_image, mask_regions, compare_image_arrays
+
+    regions = [(0, 0, 100, 20)]
+    compare_image_arrays(mask_regions(load_image("baseline.png"), regions), mask_regions(load_image("current.png"), regions))
+    ```
+    """
+    if not regions:
+        return image
+    masked = image.copy()
+    for x, y, width, height in regions:
+        masked[max(0, y):max(0, y + height), max(0, x):max(0, x + width)] = 0
+    return masked
+
+
+def image_digest(image: np.ndarray) -> str:
+    """Gets the SHA-256 of an image's pixels (and dimensions), identical pixels have the same digest no matter how they were encoded
+
+    Parameters
+    ----------
+    image : np.ndarray
+        The image
+
+    Returns
+    -------
+    str
+        The hex digest of the image
+    """
+    digest = hashlib.sha256(str(image.shape).encode())
+    digest.update(np.ascontiguousarray(image).data)
+    return digest.hexdigest()
+
+
+def perceptual_hash(image: np.ndarray) -> str:
+    """Gets a 64 bit perceptual hash (DCT based pHash) of an image, images that look alike have hashes that differ by only a few bits
+
+    Parameters
+    ----------
+    image : np.ndarray
+        The image (BGR or grayscale)
+
+    Returns
+    -------
+    str
+        The hash as 16 hex characters (see hash_distance() to compare them)
+
+    Examples
+    --------
+    ### Check if two screenshots look alike
+    ```
+    from ez_visual_regression.comparison import load_image, perceptual_hash, hash_distance
+
+    hash_distance(perceptual_hash(load_image("baseline.png")), perceptual_hash(load_image("current.png"))) # 2, out of 64 bits differ
+    ```
+    """
+    gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY) if image.ndim == 3 else image
+    frequencies = cv2.dct(cv2.resize(gray, (32, 32), interpolation=cv2.INTER_LINEAR).astype(np.float32))[:8, :8].flatten()
+    return np.packbits(frequencies > np.median(frequencies[1:])).tobytes().hex() # The first (DC) term is the average brightness
+
+
+def hash_distance(hash_1: str, hash_2: str) -> int:
+    """Gets how many bits differ between two perceptual hashes (0 to 64, see perceptual_hash())"""
+    return bin(int(hash_1, 16) ^ int(hash_2, 16)).count("1")
+
+
+def structural_difference(image_1: np.ndarray, image_2: np.ndarray) -> Tuple[float, np.ndarray]:
+    """Uses SSIM to compare two images (the same algorithm as ez_img_diff.api.compare_images)
+
+    Parameters
+    ----------
+    image_1 : np.ndarray
+        The first image (BGR)
+
+    image_2 : np.ndarray
+        The second image (BGR)
+
+    Raises
+    ------
+    ValueError
+        If the images are not the same size
+
+    Returns
+    -------
+    Tuple[float, np.ndarray]
+        The difference as a whole percentage to 3 decimal places (i.e. 0.33 or 13.54), and the SSIM map
+    """
+    gray_1 = cv2.cvtColor(image_1, cv2.COLOR_BGR2GRAY)
+    gray_2 = cv2.cvtColor(image_2, cv2.COLOR_BGR2GRAY)
+    score, ssim_map = structural_similarity(gray_1, gray_2, full=True)
+    return float(f"{((1-score)*100):.3f}"), ssim_map
+
+
+def save_difference_images(ssim_map: np.ndarray, diff_file_path: Union[str, None] = None, thresh_file_path: Union[str, None] = None):
+    """Writes the difference and threshold images for an SSIM map (see structural_difference())
+
+    Parameters
+    ----------
+    ssim_map : np.ndarray
+        The SSIM map of the comparison
+
+    diff_file_path : Union[str, None], optional
+        The path to store the difference image to, by default None
+
+    thresh_file_path : Union[str, None], optional
+        The path to store the threshold image to, by default None
+    """
+    diff = (ssim_map * 255).astype("uint8") # Convert resulting array to an unsigned integer
+    if diff_file_path:
+        cv2.imwrite(diff_file_path, diff)
+    if thresh_file_path:
+        thresh = cv2.threshold(diff, 0, 255, cv2.THRESH_BINARY_INV | cv2.THRESH_OTSU)[1]
+        cv2.imwrite(thresh_file_path, thresh)
+
+
+def compare_image_arrays(image_1: np.ndarray, image_2: np.ndarray, diff_file_path: Union[str, None] = None, thresh_file_path: Union[str, None] = None) -> float:
+    """Uses SSIM to compare two in-memory images, optionally writing the difference and threshold images
+
+    Parameters
+    ----------
+    image_1 : np.ndarray
+        The first image (BGR)
+
+    image_2 : np.ndarray
+        The second image (BGR)
+
+    diff_file_path : Union[str, None], optional
+        The path to store the difference image to, by default None
+
+    thresh_file_path : Union[str, None], optional
+        The path to store the threshold image to, by default None
+
+    Raises
+    ------
+    ValueError
+        If the images are not the same size
+
+    Returns
+    -------
+    float
+        The difference as a whole percentage to 3 decimal places (i.e. 0.33 or 13.54)
+
+    Examples
+    --------
+    ### Compare a screenshot to a baseline without writing any files
+    ```
+    from ez_visual_regression.api import instantiate_driver
+    from ez_visual_regression.comparison import decode_image, load_image, compare_image_arrays
+
+    driver = instantiate_driver("chrome")
+    driver.get("https://canadiancoding.ca")
+
+    current = decode_image(driver.get_screenshot_as_png())
+    compare_image_arrays(load_image("baseline.png"), current) # 14.03
+    ```
+    """
+    difference, ssim_map = structural_difference(image_1, image_2)
+    if diff_file_path or thresh_file_path:
+        save_difference_images(ssim_map, diff_file_path, thresh_file_path)
+    return difference
+
+
+@dataclass
+class DiffResult:
+    """The result of a pixel comparison (see pixel_difference())
+
+    Attributes
+    ----------
+    difference : float
+        The percentage of pixels that changed to 3 decimal places (i.e. 0.33 or 13.54)
+
+    changed_pixels : int
+        The number of pixels that changed
+
+    total_pixels : int
+        The number of pixels compared (the area of the larger of the two images)
+
+    boxes : List[Tuple[int, int, int, int]]
+        The (x, y, width, height) bounding boxes of the changed regions
+
+    mask : np.ndarray
+        A (height, width) boolean array that is True for changed pixels
+    """
+    difference: float
+    changed_pixels: int
+    total_pixels: int
+    boxes: List[Tuple[int, int, int, int]] = field(default_factory=list)
+    mask: Union[np.ndarray, None] = field(default=None, repr=False)
+
+
+def _pad_to(image: np.ndarray, height: int, width: int) -> np.ndarray:
+    """Pads an image with black to be height x width"""
+    if image.shape[0] == height and image.shape[1] == width:
+        return image
+    padded = np.zeros((height, width, image.shape[2]), dtype=image.dtype)
+    padded[:image.shape[0], :image.shape[1]] = image
+    return padded
+
+
+def _changed_boxes(mask: np.ndarray) -> List[Tuple[int, int, int, int]]:
+    """Finds the bounding boxes of groups of changed pixels in a mask"""
+    rows, columns = np.flatnonzero(mask.any(axis=1)), np.flatnonzero(mask.any(axis=0))
+    if not len(rows):
+        return []
+    # Only label the area that has changes
+    top, left = rows[0], columns[0]
+    region = mask[top:rows[-1]+1, left:columns[-1]+1]
+    grouped = cv2.dilate(region.view(np.uint8), np.ones((BOX_MERGE_DISTANCE, BOX_MERGE_DISTANCE), np.uint8))
+    count, _, stats, _ = cv2.connectedComponentsWithStats(grouped, connectivity=8)
+    boxes = []
+    for x, y, w, h, _ in stats[1:count]: # Remove the dilation from the edges of each box
+        group = region[y:y+h, x:x+w]
+        group_rows, group_columns = np.flatnonzero(group.any(axis=1)), np.flatnonzero(group.any(axis=0))
+        boxes.append((int(left + x + group_columns[0]), int(top + y + group_rows[0]), int(group_columns[-1] - group_columns[0] + 1), int(group_rows[-1] - group_rows[0] + 1)))
+    return boxes
+
+
+def _neighbourhood_range(image: np.ndarray, ys: np.ndarray, xs: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Gets the per channel minimum and maximum of the 3x3 pixels around each (ys[i], xs[i]) as int16 (len(ys), channels) arrays"""
+    minimum = maximum = image[ys, xs].astype(np.int16)
+    for dy in (-1, 0, 1):
+        yy = np.clip(ys + dy, 0, image.shape[0] - 1)
+        for dx in (-1, 0, 1):
+            if dy == dx == 0:
+                continue
+            neighbours = image[yy, np.clip(xs + dx, 0, image.shape[1] - 1)]
+            minimum, maximum = np.minimum(minimum, neighbours), np.maximum(maximum, neighbours)
+    return minimum, maximum
+
+
+def _changed_mask(image_1: np.ndarray, image_2: np.ndarray, tolerance: int = 0, antialiasing: bool = True) -> np.ndarray:
+    """Gets the mask of changed pixels for pixel_difference()"""
+    height, width = max(image_1.shape[0], image_2.shape[0]), max(image_1.shape[1], image_2.shape[1])
+    overlap_height, overlap_width = min(image_1.shape[0], image_2.shape[0]), min(image_1.shape[1], image_2.shape[1])
+    image_1, image_2 = _pad_to(image_1, height, width), _pad_to(image_2, height, width)
+
+    # uint8 safe absolute difference, then the largest change of any channel (elementwise on channel views is much faster than .max(axis=2))
+    difference = np.maximum(image_1, image_2)
+    difference -= np.minimum(image_1, image_2)
+    channels = [difference[..., channel] for channel in range(difference.shape[2])]
+    mask = np.maximum.reduce(channels) > tolerance if len(channels) > 1 else channels[0] > tolerance
+
+    if antialiasing:
+        changed = np.count_nonzero(mask)
+        if changed > mask.size // DENSE_ANTIALIASING_RATIO: # Cheaper to filter the whole image than gather each pixel's neighbours
+            kernel = np.ones((3, 3), np.uint8)
+            # Widened to int16 first, uint8 arithmetic with the tolerance would wrap around (older numpy keeps uint8 even for int16 scalars)
+            minimum_1, maximum_1 = cv2.erode(image_1, kernel).astype(np.int16) - tolerance, cv2.dilate(image_1, kernel).astype(np.int16) + tolerance
+            minimum_2, maximum_2 = cv2.erode(image_2, kernel).astype(np.int16) - tolerance, cv2.dilate(image_2, kernel).astype(np.int16) + tolerance
+            shifted = (image_2 >= minimum_1) & (image_2 <= maximum_1) & (image_1 >= minimum_2) & (image_1 <= maximum_2)
+            mask &= ~np.logical_and.reduce([shifted[..., channel] for channel in range(shifted.shape[2])])
+        elif changed:
+            ys, xs = np.nonzero(mask[:overlap_height, :overlap_width])
+            minimum_1, maximum_1 = _neighbourhood_range(image_1, ys, xs)
+            minimum_2, maximum_2 = _neighbourhood_range(image_2, ys, xs)
+            pixels_1, pixels_2 = image_1[ys, xs], image_2[ys, xs]
+            shifted = ((pixels_2 >= minimum_1 - tolerance) & (pixels_2 <= maximum_1 + tolerance) & (pixels_1 >= minimum_2 - tolerance) & (pixels_1 <= maximum_2 + tolerance)).all(axis=1)
+            mask[ys[shifted], xs[shifted]] = False
+
+    mask[overlap_height:, :] = True
+    mask[:, overlap_width:] = True
+    return mask
+
+
+def pixel_difference(image_1: np.ndarray, image_2: np.ndarray, tolerance: int = 0, antialiasing: bool = True) -> DiffResult:
+    """Compares two images pixel by pixel using vectorized numpy operations
+
+    Parameters
+    ----------
+    image_1 : np.ndarray
+        The first image (BGR)
+
+    image_2 : np.ndarray
+        The second image (BGR)
+
+    tolerance : int, optional
+        How much (0-255) any channel of a pixel can change before the pixel counts as changed, by default 0
+
+    antialiasing : bool, optional
+        Whether to ignore changed pixels that look like anti-aliasing (a pixel whose value is within the range
+        of the other image's surrounding 3x3 pixels, i.e. an edge that shifted slightly), by default True
+
+    Notes
+    -----
+    - If the images are different sizes, the area that is only in one image counts as changed
+
+    Returns
+    -------
+    DiffResult
+        The percentage of changed pixels, the changed regions and the changed pixel mask
+
+    Examples
+    --------
+    ### Find the regions that changed between two screenshots
+    ```
+    from ez_visual_regression.comparison import load_image, pixel_difference
+
+    result = pixel_difference(load_image("baseline.png"), load_image("current.png"), tolerance=8)
+    result.difference # 1.204
+    result.boxes      # [(10, 200, 300, 24)]
+    ```
+    """
+    mask = _changed_mask(image_1, image_2, tolerance, antialiasing)
+    height, width = mask.shape
+    changed = int(np.count_nonzero(mask))
+    total = height * width
+    return DiffResult(float(f"{(changed / total * 100):.3f}") if total else 0.0, changed, total, _changed_boxes(mask), mask)
+
+
+def save_pixel_difference_images(result: DiffResult, image: np.ndarray, diff_file_path: Union[str, None] = None, thresh_file_path: Union[str, None] = None):
+    """Writes the difference and threshold images for a pixel comparison (see pixel_difference())
+
+    Parameters
+    ----------
+    result : DiffResult
+        The result of the comparison
+
+    image : np.ndarray
+        The image to draw the changes on (usually the current screenshot)
+
+    diff_file_path : Union[str, None], optional
+        The path to store the difference image to (a faded copy of image with changed pixels in red and boxes around changed regions), by default None
+
+    thresh_file_path : Union[str, None], optional
+        The path to store the threshold image to (changed pixels in white), by default None
+    """
+    if diff_file_path:
+        diff = _pad_to(image, *result.mask.shape) // 3 + 170 # Fade the image towards white
+        diff[result.mask] = (0, 0, 255)
+        for x, y, w, h in result.boxes:
+            cv2.rectangle(diff, (x, y), (x + w - 1, y + h - 1), (0, 0, 255), 1)
+        cv2.imwrite(diff_file_path, diff)
+    if thresh_file_path:
+        cv2.imwrite(thresh_file_path, result.mask.view(np.uint8) * 255)
+
+
+def bounded_difference(image_1: np.ndarray, image_2: np.ndarray, thresholds: List[float], method: str = "ssim", tolerance: int = 0, band_height: int = FAST_BAND_HEIGHT) -> Tuple[float, bool]:
+    """Compares two images a band of rows at a time, stopping as soon as the difference is known to be on one side of every threshold
+
+    Parameters
+    ----------
+    image_1 : np.ndarray
+        The first image (BGR)
+
+    image_2 : np.ndarray
+        The second image (BGR)
+
+    thresholds : List[float]
+        The thresholds that matter (i.e. the warning and error thresholds)
+
+    method : str, optional
+        Either "ssim" (see structural_difference()) or "pixel" (see pixel_difference()), by default "ssim"
+
+    tolerance : int, optional
+        The per channel tolerance for the "pixel" method, by default 0
+
+    band_height : int, optional
+        How many rows to compare before checking if the result is certain, by default FAST_BAND_HEIGHT
+
+    Notes
+    -----
+    - Identical images return immediately
+    - Each pixel adds between 0 and 1 (pixel) or 0 and 2 (ssim) to the total, so after each band the difference is
+      known to be between what has been counted so far, and that plus the maximum the remaining pixels could add
+
+    Raises
+    ------
+    ValueError
+        If the images are not the same size when using "ssim"
+
+    Returns
+    -------
+    Tuple[float, bool]
+        The difference, and whether it is exact (if not, it's the lower bound that was reached when the comparison stopped)
+
+    Examples
+    --------
+    ### Find out if an image is over 30% different
+    ```
+    from ez_visual_regression.comparison import load_image, bounded_difference
+
+    difference, exact = bounded_difference(load_image("baseline.png"), load_image("current.png"), [30])
+    difference > 30 # True, difference is 31.4 and exact is False since it stopped early
+    ```
+    """
+    if image_1.shape == image_2.shape and np.array_equal(image_1, image_2):
+        return 0.0, True
+    if image_1.shape[:2] != image_2.shape[:2]:
+        if method == "pixel":
+            return pixel_difference(image_1, image_2, tolerance).difference, True
+        raise ValueError("Input images must have the same dimensions.")
+
+    height, width = image_1.shape[:2]
+    if method == "pixel":
+        halo, margin, maximum = 1, 0, 1 # anti-aliasing checks use the neighbouring row
+    else:
+        halo = margin = SSIM_WINDOW // 2 # skimage excludes this many pixels around the edges from the mean
+        maximum = 2                      # SSIM is between -1 and 1
+        image_1, image_2 = cv2.cvtColor(image_1, cv2.COLOR_BGR2GRAY), cv2.cvtColor(image_2, cv2.COLOR_BGR2GRAY)
+    columns = width - 2 * margin
+    total = (height - 2 * margin) * columns
+    if total <= 0 or height < SSIM_WINDOW and method != "pixel":
+        return structural_difference(cv2.cvtColor(image_1, cv2.COLOR_GRAY2BGR), cv2.cvtColor(image_2, cv2.COLOR_GRAY2BGR))[0], True
+
+    counted = 0.0
+    remaining = total
+    for start in range(margin, height - margin, band_height):
+        end = min(start + band_height, height - margin)
+        top, bottom = max(0, start - halo), min(height, end + halo)
+        if method == "pixel":
+            counted += np.count_nonzero(_changed_mask(image_1[top:bottom], image_2[top:bottom], tolerance)[start-top:end-top])
+        else:
+            ssim_map = structural_similarity(image_1[top:bottom], image_2[top:bottom], full=True)[1]
+            counted += float((1 - ssim_map[start-top:end-top, margin:width-margin]).sum())
+        remaining -= (end - start) * columns
+        lower, upper = counted / total * 100, (counted + remaining * maximum) / total * 100
+        if remaining and thresholds and all(lower > threshold or upper <= threshold for threshold in thresholds):
+            return float(f"{lower:.3f}"), False
+    return float(f"{(counted / total * 100):.3f}"), True
+
+
+@dataclass
+class TiledDiffResult:
+    """The result of a tiled comparison (see tiled_difference())
+
+    Attributes
+    ----------
+    difference : float
+        The difference as a whole percentage to 3 decimal places, the same as the method's untiled comparison
+
+    tile_size : int
+        The width and height of the tiles
+
+    tiles : int
+        How many tiles the images were split into
+
+    changed_tiles : List[Tuple[int, int, int, int, float]]
+        The (x, y, width, height, difference) of each tile with changed pixels, the difference is the percentage for just that tile
+
+    size : Tuple[int, int]
+        The (height, width) that was compared
+
+    overview : Union[np.ndarray, None]
+        The second image scaled down to at most TILE_OVERVIEW_PIXELS (BGR), used by save_tiled_difference_images()
+    """
+    difference: float
+    tile_size: int
+    tiles: int
+    changed_tiles: List[Tuple[int, int, int, int, float]] = field(default_factory=list)
+    size: Tuple[int, int] = (0, 0)
+    overview: Union[np.ndarray, None] = None
+
+
+def _tile_rows(source: Union[bytes, np.ndarray], tile_size: int, halo: int, regions: List[Tuple[int, int, int, int]]) -> Iterator[np.ndarray]:
+    """Yields each row of tiles of an image with the halo rows above and below it, and the regions blanked out,
+    so only three rows of tiles are ever decoded at once (see _image_strips())"""
+    def masked() -> Iterator[np.ndarray]:
+        for index, strip in enumerate(_image_strips(source, tile_size)):
+            top = index * tile_size
+            yield mask_regions(strip, [(x, y - top, width, height) for x, y, width, height in regions])
+
+    strips = masked()
+    previous, current = None, next(strips, None)
+    while current is not None:
+        following = next(strips, None)
+        above = [previous[-halo:]] if previous is not None else []
+        below = [following[:halo]] if following is not None else []
+        yield np.concatenate(above + [current] + below) if above or below else current
+        previous, current = current, following
+
+
+def _compare_tile(image_1: np.ndarray, image_2: np.ndarray, x: int, y: int, width: int, height: int, method: str, tolerance: int, size: Tuple[int, int], offset: int = 0) -> Tuple[float, int, bool]:
+    """Compares one tile (with enough of the surrounding pixels that the result matches the untiled comparison), returning the
+    tile's total dissimilarity (changed pixels, or the sum of 1 - SSIM), the number of pixels it was counted over, and whether the tile's pixels changed
+
+    The images can be bands of rows starting at row offset, of images that are size (height, width) when combined"""
+    image_height, image_width = size
+    if method == "pixel":
+        halo, margin = 1, 0 # anti-aliasing checks use the neighbouring pixels
+    else:
+        halo = margin = SSIM_WINDOW // 2 # skimage excludes this many pixels around the edges from the mean
+    # The part of the tile that counts towards the total
+    left, top = max(x, margin), max(y, margin)
+    right, bottom = min(x + width, image_width - margin), min(y + height, image_height - margin)
+    if right <= left or bottom <= top:
+        return 0.0, 0, False
+    # The part that's compared
+    outer_left, outer_top = max(0, left - halo), max(0, top - halo)
+    outer_right, outer_bottom = min(image_width, right + halo), min(image_height, bottom + halo)
+    rows, columns = slice(outer_top - offset, outer_bottom - offset), slice(outer_left, outer_right)
+    crop_1, crop_2 = image_1[rows, columns], image_2[rows, columns]
+    inner = (slice(top - outer_top, bottom - outer_top), slice(left - outer_left, right - outer_left))
+    pixels = (bottom - top) * (right - left)
+    if crop_1.shape == crop_2.shape and np.array_equal(crop_1, crop_2):
+        return 0.0, pixels, False
+    changed = crop_1.shape != crop_2.shape or not np.array_equal(crop_1[inner], crop_2[inner])
+    if method == "pixel":
+        return float(np.count_nonzero(_changed_mask(crop_1, crop_2, tolerance)[inner])), pixels, changed
+    ssim_map = structural_similarity(cv2.cvtColor(crop_1, cv2.COLOR_BGR2GRAY), cv2.cvtColor(crop_2, cv2.COLOR_BGR2GRAY), full=True)[1]
+    return float((1 - ssim_map[inner]).sum()), pixels, changed
+
+
+def tiled_difference(image_1: Union[bytes, np.ndarray], image_2: Union[bytes, np.ndarray], method: str = "ssim", tolerance: int = 0, tile_size: int = TILE_SIZE, workers: Union[int, None] = None, regions: Union[List[Tuple[int, int, int, int]], None] = None) -> TiledDiffResult:
+    """Compares two images a row of tiles at a time, comparing the tiles in each row in parallel, and reports which tiles changed
+
+    PNG bytes are decoded a row of tiles at a time (see _image_strips()), so only a few rows of tiles of each image are in memory at once
+
+    Parameters
+    ----------
+    image_1 : Union[bytes, np.ndarray]
+        The first image (BGR), or it's PNG bytes
+
+    image_2 : Union[bytes, np.ndarray]
+        The second image (BGR), or it's PNG bytes
+
+    method : str, optional
+        Either "ssim" (see structural_difference()) or "pixel" (see pixel_difference()), by default "ssim"
+
+    tolerance : int, optional
+        The per channel tolerance for the "pixel" method, by default 0
+
+    tile_size : int, optional
+        The width and height of the tiles, by default TILE_SIZE
+
+    workers : Union[int, None], optional
+        How many tiles to compare at once, by default None (the number of CPU's)
+
+    regions : Union[List[Tuple[int, int, int, int]], None], optional
+        The (x, y, width, height) regions to blank out in both images (see mask_regions()), by default None
+
+    Notes
+    -----
+    - Each tile is compared with the few pixels around it that the method looks at, so the difference is the same as the untiled comparison
+    - Tiles that are identical (including the pixels around them) aren't compared at all
+    - The second image is also kept scaled down to at most TILE_OVERVIEW_PIXELS, for the diff and thresh images (see save_tiled_difference_images())
+
+    Raises
+    ------
+    ValueError
+        If the images are not the same size when using "ssim", or can't be decoded
+
+    Returns
+    -------
+    TiledDiffResult
+        The difference, and the tiles that changed
+
+    Examples
+    --------
+    ### Find which parts of a long page changed
+    ```
+    from ez_visual_regression.comparison import tiled_difference
+
+    with open("baseline.png", "rb") as baseline, open("current.png", "rb") as current:
+        result = tiled_difference(baseline.read(), current.read())
+    result.difference    # 0.21
+    result.changed_tiles # [(0, 8192, 512, 512, 3.94), (512, 8192, 512, 512, 1.12)]
+    ```
+    """
+    size_1, size_2 = _image_size(image_1), _image_size(image_2)
+    if size_1 != size_2 and method != "pixel":
+        raise ValueError("Input images must have the same dimensions.")
+    height, width = max(size_1[0], size_2[0]), max(size_1[1], size_2[1])
+    regions = regions or []
+    tiles = [(x, y, min(tile_size, width - x), min(tile_size, height - y)) for y in range(0, height, tile_size) for x in range(0, width, tile_size)]
+    if method != "pixel" and (height < SSIM_WINDOW or width < SSIM_WINDOW): # Too small to tile
+        image_1, image_2 = (mask_regions(image if isinstance(image, np.ndarray) else decode_image(image), regions) for image in (image_1, image_2))
+        difference = structural_difference(image_1, image_2)[0]
+        return TiledDiffResult(difference, tile_size, len(tiles), [(0, 0, width, height, difference)] if difference else [], (height, width), image_2)
+
+    halo = 1 if method == "pixel" else SSIM_WINDOW // 2
+    scale = min(1.0, (TILE_OVERVIEW_PIXELS / (height * width)) ** 0.5)
+    overview = np.zeros((max(1, round(height * scale)), max(1, round(width * scale)), 3), np.uint8)
+    rows_1, rows_2 = _tile_rows(image_1, tile_size, halo, regions), _tile_rows(image_2, tile_size, halo, regions)
+    results = []
+    with ThreadPoolExecutor(max_workers=workers or os.cpu_count()) as executor: # numpy, OpenCV and skimage release the GIL
+        for y in range(0, height, tile_size):
+            # An image that is shorter than the other has no rows left, so it's tiles are empty
+            band_1, band_2 = next(rows_1, np.zeros((0, size_1[1], 3), np.uint8)), next(rows_2, np.zeros((0, size_2[1], 3), np.uint8))
+            offset = max(0, y - halo)
+            results += executor.map(lambda tile: _compare_tile(band_1, band_2, *tile, method, tolerance, (height, width), offset), [tile for tile in tiles if tile[1] == y])
+            strip = band_2[y - offset:y - offset + tile_size]
+            top, bottom = round(y * scale), round((y + len(strip)) * scale)
+            if len(strip) and bottom > top:
+                overview[top:bottom, :round(size_2[1] * scale)] = strip if scale == 1 else cv2.resize(strip, (round(size_2[1] * scale), bottom - top), interpolation=cv2.INTER_LINEAR)
+    counted = sum(dissimilarity for dissimilarity, _, _ in results)
+    total = sum(pixels for _, pixels, _ in results)
+    changed_tiles = [(*tile, float(f"{(dissimilarity / pixels * 100 if pixels else 100):.3f}")) for tile, (dissimilarity, pixels, changed) in zip(tiles, results) if changed]
+    return TiledDiffResult(float(f"{(counted / total * 100):.3f}") if total else 0.0, tile_size, len(tiles), changed_tiles, (height, width), overview)
+
+
+def save_tiled_difference_images(result: TiledDiffResult, image: Union[np.ndarray, None] = None, diff_file_path: Union[str, None] = None, thresh_file_path: Union[str, None] = None, tiles_file_path: Union[str, None] = None):
+    """Writes the difference and threshold images for a tiled comparison (see tiled_difference())
+
+    The images are the size of result.overview (the current image scaled down to at most TILE_OVERVIEW_PIXELS), so long pages don't need full size buffers
+
+    Parameters
+    ----------
+    result : TiledDiffResult
+        The result of the comparison
+
+    image : Union[np.ndarray, None], optional
+        The image to draw the changed tiles on, by default None (result.overview)
+
+    diff_file_path : Union[str, None], optional
+        The path to store the difference image to (image with the changed tiles outlined in red), by default None
+
+    thresh_file_path : Union[str, None], optional
+        The path to store the threshold image to (changed tiles in white), by default None
+
+    tiles_file_path : Union[str, None], optional
+        The path to store the changed tiles to as JSON, by default None
+    """
+    image = result.overview if image is None else image
+    # The changed tiles in the image's coordinates
+    scale_y, scale_x = image.shape[0] / result.size[0], image.shape[1] / result.size[1]
+    boxes = [(int(x * scale_x), int(y * scale_y), max(int(x * scale_x) + 1, round((x + w) * scale_x)), max(int(y * scale_y) + 1, round((y + h) * scale_y))) for x, y, w, h, _ in result.changed_tiles]
+    if diff_file_path:
+        diff = image.copy()
+        for left, top, right, bottom in boxes:
+            cv2.rectangle(diff, (left, top), (right - 1, bottom - 1), (0, 0, 255), 3 if min(scale_x, scale_y) == 1 else 2)
+        cv2.imwrite(diff_file_path, diff)
+    if thresh_file_path:
+        thresh = np.zeros(image.shape[:2], np.uint8)
+        for left, top, right, bottom in boxes:
+            thresh[top:bottom, left:right] = 255
+        cv2.imwrite(thresh_file_path, thresh)
+    if tiles_file_path:
+        with open(tiles_file_path, "w") as f:
+            json.dump({"difference": result.difference, "tile_size": result.tile_size, "tiles": result.tiles,
+                       "changed_tiles": [{"x": x, "y": y, "width": w, "height": h, "difference": difference} for x, y, w, h, difference in result.changed_tiles]}, f, indent=2)
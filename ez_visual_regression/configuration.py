@@ -1,15 +1,161 @@
 # Standard library dependencies
 import os 
-from typing import Union, List, Dict
+import json
+import logging
+import time
+import queue
+import itertools
+import threading
+from dataclasses import dataclass, field, replace
+from concurrent.futures import ThreadPoolExecutor
+from typing import Union, List, Dict, Tuple, Iterator, NamedTuple
 
 
 # Third party dependencies
 import yaml
 from selenium.webdriver.remote.webdriver import WebDriver              # Used for type hinting
+from selenium.common.exceptions import WebDriverException              # Allows for error catching
 
 from ez_visual_regression.api import *
+from ez_visual_regression.api import _normalize_url, _validate_options
+from ez_visual_regression.stability import DEFAULT_WAIT_TIMEOUT
+from ez_visual_regression.session import reset_browser
+from ez_visual_regression.drivers import LaunchProfile, parse_launch_profile
+from ez_visual_regression.matrix import Combination, parse_matrix, expand_entry, expand_matrix, resize_viewport
+from ez_visual_regression.timing import PhaseTimings, track, summarize_timings, write_report
+from ez_visual_regression.selection import loaded_dependencies, record_dependencies, settings_digest, git_changed_files, has_changed, select_changed_tests
 
-def parse_config(config_path: str) -> Dict[str, Union[str, List[List[Union[bool,None,int,str]]]]]:
+
+PIPELINE_QUEUE_SIZE = 2
+"""How many captures (per comparison worker) can wait to be compared before browsers stop capturing"""
+
+STREAM_CHUNK_SIZE = 100
+"""How many tests and screenshots of a streamed config are read at a time, pages are only loaded once within a chunk"""
+
+STREAM_BACKLOG = 2
+"""How many pages (per worker) can wait for a browser before a streamed config stops being read"""
+
+JSON_LINES_EXTENSIONS = (".jsonl", ".ndjson")
+"""Config files with these extensions are read as JSON lines by stream_config()"""
+
+TEST_OPTIONS = {"cache": False, "artifacts": "all", "method": "ssim", "tolerance": 0, "fast": False, "single_capture": False, "tiled": False, "full_page": False, "store": "files", "store_folder": None}
+"""The config keys that apply to every test, and their defaults"""
+
+class ConfigTest(NamedTuple):
+    """A test from a config file, the arguments for an assert_image_similarity_to_baseline() call
+
+    Unpacks (and indexes) in the order of it's attributes, so it can be used like the list of arguments it replaces
+
+    Attributes
+    ----------
+    url : str
+        The page to test
+
+    folder : str
+        The folder for the test's baseline(s)
+
+    locator : Union[str, bool]
+        The locator of the element(s) to capture, False for the page
+
+    warning_threshold, error_threshold : float
+        The differences at which a warning is logged, and the test fails
+
+    ignored_elements : Union[List[str], None]
+        The locators of elements to blank out
+
+    multielements : bool
+        Whether every element the locator finds is captured
+
+    wait, wait_timeout : Union[List[str], str, None], float
+        The stability strategies to wait on and the maximum seconds to wait
+    """
+    url: str
+    folder: str
+    locator: Union[str, bool] = False
+    warning_threshold: float = 10
+    error_threshold: float = 30
+    ignored_elements: Union[List[str], None] = None
+    multielements: bool = False
+    wait: Union[List[str], str, None] = None
+    wait_timeout: float = DEFAULT_WAIT_TIMEOUT
+
+
+class ConfigScreenshot(NamedTuple):
+    """A screenshot from a config file, the arguments for a get_screenshot() call
+
+    Unpacks (and indexes) in the order of it's attributes, so it can be used like the list of arguments it replaces
+
+    Attributes
+    ----------
+    url : str
+        The page to screenshot
+
+    filename : str
+        Where the screenshot is written (screenshot.png in the screenshot's folder)
+
+    locator : Union[str, bool]
+        The locator of the element to capture, False for the page
+
+    ignored_elements : Union[List[str], None]
+        The locators of elements to blank out
+
+    wait, wait_timeout : Union[List[str], str, None], float
+        The stability strategies to wait on and the maximum seconds to wait
+    """
+    url: str
+    filename: str
+    locator: Union[str, bool] = False
+    ignored_elements: Union[List[str], None] = None
+    wait: Union[List[str], str, None] = None
+    wait_timeout: float = DEFAULT_WAIT_TIMEOUT
+
+
+def _parse_settings(config: Dict) -> Dict:
+    """Parses everything but the tests and screenshots of a config file (see parse_config())"""
+    driver = config.get("driver", "chrome")
+    driver_path = config.get("driver_path", None)
+    profile = parse_launch_profile(None)
+    if isinstance(driver, dict): # Driver section with launch settings
+        settings = dict(driver)
+        driver_path = settings.pop("path", driver_path)
+        driver = settings.pop("name", "chrome")
+        profile = parse_launch_profile(settings)
+    driver = driver.lower()
+    workers = int(config.get("workers", 1))
+    compare_workers = config.get("compare_workers", None)
+    cache = bool(config.get("cache", False))
+    artifacts = config.get("artifacts", "all")
+    method = config.get("method", "ssim")
+    tolerance = int(config.get("tolerance", 0))
+    fast = bool(config.get("fast", False))
+    tiled = bool(config.get("tiled", False))
+    single_capture = bool(config.get("single_capture", False))
+    full_page = bool(config.get("full_page", False))
+    store = config.get("store", "files")
+    store_folder = config.get("store_folder", None)
+    report = config.get("report", None)
+    changed_only = bool(config.get("changed_only", False))
+    since = config.get("since", None)
+    matrix = parse_matrix(config.get("matrix", None), driver, profile.window_size, profile.scale_factor)
+    return {"driver":driver, "driver_path": driver_path, "profile": profile, "workers": workers, "compare_workers": compare_workers, "cache": cache, "artifacts": artifacts, "method": method, "tolerance": tolerance, "fast": fast, "tiled": tiled, "store": store, "store_folder": store_folder, "single_capture": single_capture, "full_page": full_page, "report": report, "changed_only": changed_only, "since": since, "matrix": matrix}
+
+def _parse_test(name: Union[str, None], test: Dict) -> ConfigTest:
+    """Parses a test from a config file, it's folder defaults to it's name"""
+    folder = test.get("folder", name)
+    if folder is None:
+        raise ValueError(f"Test of {test.get('url')} needs a folder or name")
+    return ConfigTest(test["url"], folder, test.get("locator", False), test.get("warning_threshold", 10), test.get("error_threshold", 30),
+                      test.get("ignored_elements", None), test.get("multielements", False), test.get("wait", None), test.get("wait_timeout", DEFAULT_WAIT_TIMEOUT))
+
+def _parse_screenshot(name: Union[str, None], screenshot: Dict) -> ConfigScreenshot:
+    """Parses a screenshot from a config file, it's folder defaults to it's name"""
+    folder = screenshot.get("folder", name)
+    if folder is None:
+        raise ValueError(f"Screenshot of {screenshot.get('url')} needs a folder or name")
+    return ConfigScreenshot(screenshot["url"], os.path.join(folder, "screenshot.png"), screenshot.get("locator", False), screenshot.get("ignored_elements", None),
+                            screenshot.get("wait", None), screenshot.get("wait_timeout", DEFAULT_WAIT_TIMEOUT))
+
+def parse_config(config_path: str) -> Dict[str, Union[str, List[Union[ConfigTest, ConfigScreenshot]]]]:
     """Takes in a path to a config file and parses it for use with execute_config()
 
     Parameters
@@ -19,50 +165,440 @@ def parse_config(config_path: str) -> Dict[str, Union[str, List[List[Union[bool,
 
     Returns
     -------
-    Dict[str, Union[str, List[List[Union[bool,None,int,str]]]]]
-        A dictionary with 3 keys, driver (a WebDriver object), tests (all arguments for for assert_image_similarity_to_baseline() calls), screenshots (all arguments for get_screenshot() calls)
+    Dict[str, Union[str, List[Union[ConfigTest, ConfigScreenshot]]]]
+        A dictionary with 21 keys, driver (the name of the browser to use), driver_path (the driver executable to use, None to find one),
+        profile (the drivers.LaunchProfile to launch browsers with), workers (how many browsers to run at once), compare_workers (how many comparisons to run at once, None for the number of CPU's),
+        cache (whether to skip tests with unchanged inputs), artifacts (when to write current/diff/thresh images),
+        method, tolerance, fast and tiled (how to compare images), store and store_folder (where new baselines are written), single_capture and full_page (how to capture multiple elements and pages), report (the file to write a timing report to, None for no report), changed_only and since (whether to only run tests whose dependencies changed, and the git ref to compare them to), matrix (the matrix.Combination's to run every test and screenshot in, None to only use driver), tests (a ConfigTest for each assert_image_similarity_to_baseline() call), screenshots (a ConfigScreenshot for each get_screenshot() call)
 
     Raises
     ------
     FileNotFoundError
         If a config path does not exist
+
+    ValueError
+        If the driver or matrix section has a setting that does not exist
     """
     if not os.path.exists(config_path):
         raise FileNotFoundError(f"Config path {config_path} does not exist")
     with open(config_path, "r") as f:
         config = yaml.safe_load(f)
 
-    driver = config.get("driver", "chrome").lower()
-    tests = []
-    screenshots = []
-
-    if config.get("tests", False):
-        for test in config["tests"]:
-            url = config["tests"][test]["url"]
-            locator = config["tests"][test].get("locator", False)
-            warning_threshold = config["tests"][test].get("warning_threshold", 10)
-            error_threshold = config["tests"][test].get("error_threshold", 30)
-            ignored_elements = config["tests"][test].get("ignored_elements", None)
-            folder = config["tests"][test].get("folder", test)
-            multielements = config["tests"][test].get("multielements", False)
-            tests.append([url, folder, locator, warning_threshold, error_threshold, ignored_elements, multielements])
-    if config.get("screenshots", False):
-        for screenshot in config["screenshots"]:
-            url = config["screenshots"][screenshot]["url"]
-            locator = config["screenshots"][screenshot].get("locator", False)
-            ignored_elements = config["screenshots"][screenshot].get("ignored_elements", None)
-            folder = config["screenshots"][screenshot].get("folder", screenshot)
-            filename = os.path.join(folder, "screenshot.png")
-            screenshots.append([url,filename,locator,ignored_elements])
-    return {"driver":driver, "tests":tests, "screenshots": screenshots}
-
-def execute_config(config: Dict[str, Union[str, List[List[Union[bool,None,int,str]]]]]):
-    config["driver"] = instantiate_driver(config["driver"])
-    print("Executing tests")
-    for test in config["tests"]:
-        assert_image_similarity_to_baseline(config["driver"], *test)
-
-    print("Executing screenshots")
-    for screenshot in config["screenshots"]:
-        get_screenshot(config["driver"], *screenshot)
-    
\ No newline at end of file
+    tests = [_parse_test(test, config["tests"][test]) for test in config.get("tests") or {}]
+    screenshots = [_parse_screenshot(screenshot, config["screenshots"][screenshot]) for screenshot in config.get("screenshots") or {}]
+    return {**_parse_settings(config), "tests": tests, "screenshots": screenshots}
+
+def _read_documents(config_path: str) -> Iterator[Dict]:
+    """Reads the documents of a YAML file, or the lines of a JSON lines file, one at a time"""
+    with open(config_path, "r") as f:
+        if config_path.lower().endswith(JSON_LINES_EXTENSIONS):
+            for number, line in enumerate(f, 1):
+                if not line.strip():
+                    continue
+                try:
+                    yield json.loads(line)
+                except ValueError as e:
+                    raise ValueError(f"Line {number} of {config_path} is not valid JSON: {e}")
+        else:
+            for document in yaml.safe_load_all(f):
+                if document:
+                    yield document
+
+def _stream_records(documents: Iterator[Dict]) -> Iterator[Tuple[str, Union[ConfigTest, ConfigScreenshot]]]:
+    """Parses the tests and screenshots in each document as it's read (see stream_config())"""
+    for document in documents:
+        if "url" in document: # A single test or screenshot
+            kind = document.get("type", "test")
+            if kind not in ("test", "screenshot"):
+                raise ValueError(f"Type of {document['url']} must be test or screenshot, got {kind}")
+            yield kind, (_parse_test if kind == "test" else _parse_screenshot)(document.get("name"), document)
+            continue
+        for test in document.get("tests") or {}:
+            yield "test", _parse_test(test, document["tests"][test])
+        for screenshot in document.get("screenshots") or {}:
+            yield "screenshot", _parse_screenshot(screenshot, document["screenshots"][screenshot])
+
+def stream_config(config_path: str) -> Dict[str, Union[str, List, Iterator[Tuple[str, Union[ConfigTest, ConfigScreenshot]]]]]:
+    """Reads a config file's settings, leaving it's tests and screenshots to be read while they're executed (see execute_config())
+
+    The file can be YAML with multiple documents (separated by ---), or JSON lines (.jsonl or .ndjson). The first document (or line) can have the
+    settings from parse_config(), every other one is either a test or screenshot (it's settings, with name (or folder) and type ("test" by default,
+    or "screenshot")) or a tests and/or screenshots section like in parse_config()
+
+    Parameters
+    ----------
+    config_path : str
+        The path to a file
+
+    Raises
+    ------
+    FileNotFoundError
+        If a config path does not exist
+
+    ValueError
+        If the driver or matrix section has a setting that does not exist (tests and screenshots that can't be parsed raise when they're read)
+
+    Returns
+    -------
+    Dict[str, Union[str, List, Iterator[Tuple[str, Union[ConfigTest, ConfigScreenshot]]]]]
+        The same keys as parse_config() with tests and screenshots empty, and stream (the type ("test" or "screenshot") and record of each in the file, parsed as it's read)
+
+    Examples
+    --------
+    ### Run a generated JSON lines config
+    ```
+    # urls.jsonl
+    # {"driver": "chrome", "workers": 4}
+    # {"url": "https://canadiancoding.ca", "name": "home"}
+    # {"url": "https://canadiancoding.ca", "name": "nav", "locator": ".nav-item p"}
+    # {"url": "https://kieranwood.ca", "name": "blog", "type": "screenshot"}
+    from ez_visual_regression.configuration import stream_config, execute_config
+
+    execute_config(stream_config("urls.jsonl")) # The first test starts before the rest of the file is read
+    ```
+    """
+    if not os.path.exists(config_path):
+        raise FileNotFoundError(f"Config path {config_path} does not exist")
+    documents = _read_documents(config_path)
+    header = next(documents, None) or {}
+    records = _stream_records(itertools.chain([header], documents))
+    return {**_parse_settings(header if "url" not in header else {}), "tests": [], "screenshots": [], "stream": records}
+
+def _as_record(kind: str, arguments: list) -> Union[ConfigTest, ConfigScreenshot]:
+    """Gets a test's or screenshot's arguments as a ConfigTest or ConfigScreenshot (configs built by hand can still use lists)"""
+    if isinstance(arguments, (ConfigTest, ConfigScreenshot)):
+        return arguments
+    return ConfigTest(*arguments) if kind == "test" else ConfigScreenshot(*arguments)
+
+def _page_key(kind: str, arguments: list) -> tuple:
+    """Gets what identifies the page load a test or screenshot needs (the URL, and the stability strategies/timeout used when loading it)"""
+    record = _as_record(kind, arguments)
+    url, wait, wait_timeout = record.url, record.wait, record.wait_timeout
+    try:
+        url = _normalize_url(url)
+    except FileNotFoundError: # Left to be reported by the test itself
+        pass
+    if isinstance(wait, list):
+        wait = tuple(wait)
+    return (url, wait, wait_timeout)
+
+def group_by_page(config: Dict[str, Union[str, List[Union[ConfigTest, ConfigScreenshot]]]]) -> List[List[Tuple[int, str, list]]]:
+    """Plans a config run so every page only has to be loaded once, no matter how many locators are tested on it
+
+    Parameters
+    ----------
+    config : Dict[str, Union[str, List[Union[ConfigTest, ConfigScreenshot]]]]
+        The parsed config (see parse_config())
+
+    Returns
+    -------
+    List[List[Tuple[int, str, list]]]
+        Groups of entries that use the same page load (in the order each page first appears), each entry is
+        the position of the result (tests then screenshots), the type ("test" or "screenshot") and its arguments
+
+    Notes
+    -----
+    - Ignored elements are masked out of captures rather than hidden on the page, so they don't need a separate load
+    - With a matrix (see matrix.expand_matrix()) combinations that only differ by viewport share a page load, since the window can
+      be resized instead, their entries are ordered by viewport so each group only resizes once per viewport
+
+    Examples
+    --------
+    ### See which pages a config will load
+    ```
+    from ez_visual_regression.configuration import parse_config, group_by_page
+
+    config = parse_config("config.yml")
+    for group in group_by_page(config):
+        print(group[0][2][0], len(group)) # The URL and how many tests/screenshots will use it
+    ```
+    """
+    entries = [("test", arguments) for arguments in config["tests"]] + [("screenshot", arguments) for arguments in config["screenshots"]]
+    combinations: List[Union[Combination, None]] = config.get("combinations") or [None] * len(entries)
+    return _group_entries([(index, kind, arguments, combinations[index]) for index, (kind, arguments) in enumerate(entries)])
+
+def _group_entries(entries: List[Tuple[int, str, list, Union[Combination, None]]]) -> List[List[Tuple[int, str, list]]]:
+    """Groups entries (the position of the result, type, arguments and combination) by page load, see group_by_page()"""
+    groups: Dict[tuple, List[Tuple[int, str, list, Union[Combination, None]]]] = {}
+    for index, kind, arguments, combination in entries:
+        launch = combination.launch if combination else None
+        groups.setdefault((_page_key(kind, arguments), launch), []).append((index, kind, arguments, combination))
+    ordered = []
+    for group in groups.values():
+        viewports = list(dict.fromkeys(combination.viewport if combination else None for *_, combination in group))
+        group.sort(key=lambda entry: viewports.index(entry[3].viewport if entry[3] else None)) # Stable, so config order is kept per viewport
+        ordered.append([(index, kind, arguments) for index, kind, arguments, _ in group])
+    return ordered
+
+@dataclass
+class _ConfigRun:
+    """The state shared by the capture and compare stages of an execute_config() run
+
+    Attributes
+    ----------
+    config : Dict
+        The parsed config being run
+
+    options : Dict[str, Union[bool, int, str, None]]
+        The options that apply to every test (see TEST_OPTIONS)
+
+    cache_options, selection_options : Dict[str, Union[bool, int, str, None]]
+        The options that affect a test's result, for it's cache key and dependency map (see selection.settings_digest())
+
+    captured : queue.Queue
+        The captures waiting to be compared/written, None tells a comparison worker to stop
+
+    drivers : List[WebDriver]
+        Every browser started for the run
+
+    local : threading.local
+        The browsers of each worker thread, by the matrix.Combination's launch (None without a matrix)
+
+    lock : threading.Lock
+        Guards drivers
+
+    results, timings, dependencies, combinations : Dict[int, ...]
+        The result, timings, loaded files and combination of each test/screenshot by it's position
+    """
+    config: Dict
+    options: Dict[str, Union[bool, int, str, None]]
+    cache_options: Dict[str, Union[bool, int, str, None]]
+    selection_options: Dict[str, Union[bool, int, str, None]]
+    captured: queue.Queue
+    drivers: List[WebDriver] = field(default_factory=list)
+    local: threading.local = field(default_factory=threading.local)
+    lock: threading.Lock = field(default_factory=threading.Lock)
+    results: Dict[int, Dict[str, Union[str, float, List[float], None]]] = field(default_factory=dict)
+    timings: Dict[int, PhaseTimings] = field(default_factory=dict)
+    dependencies: Dict[int, Union[List[str], None]] = field(default_factory=dict)
+    combinations: Dict[int, Union[Combination, None]] = field(default_factory=dict)
+
+def _worker_driver(run: _ConfigRun, combination: Union[Combination, None]) -> Union[WebDriver, None]:
+    """Gets the current worker thread's browser for a combination, None if it hasn't been created yet"""
+    return getattr(run.local, "drivers", {}).get(combination.launch if combination else None)
+
+def _get_driver(run: _ConfigRun, combination: Union[Combination, None] = None) -> WebDriver:
+    """Gets the browser for the current worker thread (and combination's browser and scale factor), creating one on first use"""
+    if not _worker_driver(run, combination):
+        config = run.config
+        if combination:
+            profile = replace(config.get("profile") or LaunchProfile(), window_size=combination.viewport, scale_factor=combination.scale_factor)
+            driver_path = config.get("driver_path") if combination.browser == config["driver"] else None
+            driver = instantiate_driver(combination.browser, driver_path, profile)
+            driver._ezvr_viewport = tuple(combination.viewport)
+        else:
+            driver = instantiate_driver(config["driver"], config.get("driver_path"), config.get("profile"))
+        if not hasattr(run.local, "drivers"):
+            run.local.drivers = {}
+        run.local.drivers[combination.launch if combination else None] = driver
+        with run.lock:
+            run.drivers.append(driver)
+    return _worker_driver(run, combination)
+
+def _fail(run: _ConfigRun, index: int, result: Dict[str, Union[str, float, List[float], None]], error: BaseException):
+    """Records a test or screenshot as failed instead of raising the error"""
+    logging.error(f"{result['type'].capitalize()} {result['output']} failed: {error}")
+    result["error"] = str(error) or type(error).__name__
+    run.results[index] = result
+
+def _capture_entry(run: _ConfigRun, index: int, kind: str, arguments: Union[ConfigTest, ConfigScreenshot], navigate: bool):
+    """Does the browser half of a test or screenshot, and queues the capture to be compared/written"""
+    combination = run.combinations[index]
+    output = arguments.folder if kind == "test" else arguments.filename
+    result = {"type": kind, "url": arguments.url, "output": output, "combination": combination.name if combination else None, "result": None, "error": None, "timings": run.timings[index]}
+    options = run.options
+    try:
+        driver = _get_driver(run, combination)
+        with track(run.timings[index]):
+            if combination: # A loaded page is resized and restabilized instead of being reloaded
+                resize_viewport(driver, combination.viewport, arguments.wait, arguments.wait_timeout, restabilize=not navigate)
+            if kind == "test":
+                os.makedirs(arguments.folder, exist_ok=True)
+                capture = capture_test(driver, arguments.url, arguments.folder, arguments.locator, arguments.ignored_elements, arguments.multielements, arguments.wait,
+                                       arguments.wait_timeout, options["cache"], run.cache_options, options["single_capture"], navigate, options["full_page"])
+                if run.config.get("changed_only"): # Other runs don't pay for finding and hashing every file
+                    run.dependencies[index] = loaded_dependencies(driver, _normalize_url(arguments.url))
+            else:
+                logging.debug(f"Taking screenshot {arguments.filename} of {arguments.locator or 'the page'}")
+                capture = capture_screenshot(driver, arguments.url, arguments.locator, arguments.ignored_elements, arguments.wait, arguments.wait_timeout, navigate, options["full_page"])
+    except (Exception, SystemExit) as e:
+        _fail(run, index, result, e)
+        return
+    run.captured.put((index, result, arguments, capture))
+
+def _capture_group(run: _ConfigRun, group: List[Tuple[int, str, Union[ConfigTest, ConfigScreenshot]]]):
+    """Captures every test and screenshot for a page, loading it once (when the first one that isn't cached needs it)"""
+    combination = run.combinations[group[0][0]] # Every entry in a group uses the same browser and scale factor
+    driver = _worker_driver(run, combination)
+    if driver: # Don't let the worker's last page affect this one
+        try:
+            reset_browser(driver)
+        except WebDriverException:
+            logging.debug("Unable to reset driver")
+            driver._ezvr_loaded_url = None
+    for index, kind, arguments in group:
+        navigate = getattr(_worker_driver(run, combination), "_ezvr_loaded_url", None) is None
+        _capture_entry(run, index, kind, arguments, navigate)
+
+def _compare_captures(run: _ConfigRun):
+    """Compares/writes queued captures until it receives None"""
+    options = run.options
+    while True:
+        item = run.captured.get()
+        if item is None:
+            return
+        index, result, arguments, capture = item
+        try:
+            with track(run.timings[index]):
+                if result["type"] == "test":
+                    result["result"] = compare_capture(capture, arguments.warning_threshold, arguments.error_threshold, options["artifacts"], options["method"], options["tolerance"],
+                                                       options["fast"], options["tiled"], options["store"], options["store_folder"])
+                    if run.dependencies.get(index) is not None: # Only passing tests are recorded, so failures run again
+                        record_dependencies(arguments.folder, arguments.url, run.dependencies[index], settings_digest(arguments, run.selection_options))
+                else:
+                    write_screenshot(arguments.filename, *capture)
+        except (Exception, SystemExit) as e:
+            _fail(run, index, result, e)
+            continue
+        run.results[index] = result
+
+def _planned_groups(run: _ConfigRun, groups: Union[List[List[Tuple[int, str, list]]], None]) -> Iterator[List[Tuple[int, str, Union[ConfigTest, ConfigScreenshot]]]]:
+    """Yields the groups of entries to capture (see group_by_page()), streamed configs (groups is None) are read and planned a chunk at a time"""
+    config = run.config
+    if groups is not None:
+        arguments = config["tests"] + config["screenshots"]
+        for index, combination in enumerate(config.get("combinations") or [None] * len(arguments)):
+            run.timings[index], run.combinations[index] = PhaseTimings(arguments[index][1]), combination
+        yield from groups
+        return
+    changed_files = git_changed_files(config["since"]) if config.get("changed_only") and config.get("since") else None
+    records, position, selected, total = iter(config["stream"]), 0, 0, 0
+    while True:
+        chunk = list(itertools.islice(records, STREAM_CHUNK_SIZE))
+        if not chunk:
+            break
+        entries = []
+        for kind, record in chunk:
+            for arguments, combination in expand_entry(kind, record, config.get("matrix")):
+                if config.get("changed_only") and kind == "test":
+                    total += 1
+                    if not has_changed(arguments, changed_files, run.selection_options):
+                        continue
+                    selected += 1
+                run.timings[position], run.combinations[position] = PhaseTimings(arguments[1]), combination
+                entries.append((position, kind, arguments, combination))
+                position += 1
+        yield from _group_entries(entries)
+    if config.get("changed_only"):
+        print(f"Selected {selected} of {total} tests with changed dependencies" + (f" since {config['since']}" if config.get("since") else ""))
+
+def execute_config(config: Dict[str, Union[str, List[Union[ConfigTest, ConfigScreenshot]]]], workers: Union[int, None] = None) -> List[Dict[str, Union[str, float, List[float], None]]]:
+    """Runs all the tests and screenshots from a config (see parse_config() and stream_config()) across a pool of browsers
+
+    Parameters
+    ----------
+    config : Dict[str, Union[str, List[Union[ConfigTest, ConfigScreenshot]]]]
+        The parsed config to run
+
+    workers : Union[int, None], optional
+        How many browsers to run tests on at the same time, by default None (use config["workers"], or 1 if not set)
+
+    Notes
+    -----
+    - Runs as a pipeline; browsers capture screenshots into a bounded queue, and config["compare_workers"] threads
+      compare them, so browsers don't sit idle during comparisons (and comparisons don't wait on page loads)
+    - Each test's phases are timed (see timing.PHASES), a summary of the slowest is printed at the end,
+      and the full timings (and results) are written as JSON to config["report"] if it's set
+    - With config["changed_only"] only tests whose files changed since they last passed (or since the git ref config["since"]) are
+      run (see selection.select_changed_tests()), and the files each local test's page loaded are recorded when it passes
+    - With config["matrix"] every test and screenshot runs in each combination (see matrix.expand_matrix()), each worker keeps a
+      browser per browser and scale factor, and pages are resized and restabilized rather than reloaded for each viewport
+    - Streamed configs (see stream_config()) are read STREAM_CHUNK_SIZE tests/screenshots at a time while earlier ones run, and
+      reading waits when STREAM_BACKLOG pages per worker are waiting for a browser
+
+    Raises
+    ------
+    ValueError
+        If the config's artifacts, method or store does not exist, raised before any browser starts
+
+    AssertionError
+        If any test failed, raised after every test and screenshot has been run
+
+    Returns
+    -------
+    List[Dict[str, Union[str, float, List[float], None]]]
+        The result of each test then each screenshot (in config order, or file order for streamed configs), each has a type ("test" or "screenshot"),
+        url, output (the folder or filename), combination (the matrix.Combination's name, None without a matrix), result (the difference for tests),
+        error (None if it passed) and timings (a timing.PhaseTimings)
+
+    Examples
+    --------
+    ### Run a config file with 4 browsers
+    ```
+    from ez_visual_regression.configuration import parse_config, execute_config
+
+    config = parse_config("config.yml")
+    execute_config(config, workers=4)
+    ```
+    """
+    streamed = config.get("stream") is not None
+    if not streamed: # Configs built by hand can use lists of arguments
+        config = {**config, "tests": [_as_record("test", arguments) for arguments in config["tests"]], "screenshots": [_as_record("screenshot", arguments) for arguments in config["screenshots"]]}
+    if config.get("matrix") and not streamed:
+        config = expand_matrix(config)
+    options = {option: config.get(option, default) for option, default in TEST_OPTIONS.items()}
+    _validate_options(options["artifacts"], options["method"], options["store"]) # Before any browser starts
+    cache_options = {option: options[option] for option in ("method", "tolerance", "fast", "single_capture", "full_page")} # The same as assert_image_similarity_to_baseline()
+    selection_options = {**cache_options, "driver": config.get("driver")}
+    if config.get("changed_only") and not streamed:
+        config = select_changed_tests(config, config.get("since"), selection_options)
+    if workers is None:
+        workers = config.get("workers", 1)
+    workers = max(1, int(workers))
+
+    compare_workers = max(1, int(config.get("compare_workers") or os.cpu_count() or 1))
+    run = _ConfigRun(config, options, cache_options, selection_options, queue.Queue(maxsize=PIPELINE_QUEUE_SIZE * compare_workers)) # Capturing waits when comparisons fall behind
+
+    groups = None if streamed else group_by_page(config)
+    start = time.perf_counter()
+    if streamed:
+        print(f"Executing streamed tests and screenshots with {workers} worker(s) and {compare_workers} comparison worker(s)")
+    else:
+        print(f"Executing {len(config['tests'])} tests and {len(config['screenshots'])} screenshots on {len(groups)} page(s) with {workers} worker(s) and {compare_workers} comparison worker(s)")
+    backlog = threading.Semaphore(STREAM_BACKLOG * workers) # Planning waits when browsers fall behind
+    try:
+        with ThreadPoolExecutor(max_workers=compare_workers) as comparers:
+            comparisons = [comparers.submit(_compare_captures, run) for _ in range(compare_workers)]
+            try:
+                with ThreadPoolExecutor(max_workers=workers) as capturers:
+                    futures = []
+                    for group in _planned_groups(run, groups):
+                        backlog.acquire()
+                        futures.append(capturers.submit(_capture_group, run, group))
+                        futures[-1].add_done_callback(lambda _: backlog.release())
+                    for future in futures:
+                        future.result()
+            finally:
+                for _ in comparisons:
+                    run.captured.put(None)
+    finally:
+        for driver in run.drivers:
+            try:
+                driver.quit()
+            except Exception:
+                logging.debug("Unable to quit driver")
+
+    timings = [run.timings[index] for index in sorted(run.timings)]
+    results = [run.results[index] for index in sorted(run.results)]
+    elapsed = time.perf_counter() - start
+    print(summarize_timings(timings))
+    if config.get("report"):
+        details = {"shard": config["shard"]} if config.get("shard") else {} # Shard reports are combined with sharding.merge_reports()
+        outcomes = [{key: value for key, value in result.items() if key != "timings"} for result in results]
+        write_report(config["report"], timings, elapsed, workers=workers, compare_workers=compare_workers, **details, results=outcomes)
+        print(f"Timing report saved to {config['report']}")
+    failures = [result for result in results if result["error"]]
+    print(f"{len(results) - len(failures)} passed, {len(failures)} failed in {elapsed:.2f}s")
+    if failures:
+        raise AssertionError(f"{len(failures)} of {len(results)} failed: " + ", ".join(f"{result['output']} ({result['error']})" for result in failures))
+    return results
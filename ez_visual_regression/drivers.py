@@ -0,0 +1,322 @@
+# Standard lib dependencies
+import os                                                              # Path verification & modification
+import json                                                            # Used to read/write the manifest
+import shutil                                                          # Used to find drivers/browsers on PATH
+import functools                                                       # Used to only check browser versions once
+import logging                                                         # Enables logging
+import threading                                                       # Used to guard manifest writes
+from dataclasses import dataclass, field                               # Used for launch profiles
+from typing import Dict, List, Tuple, Union
+
+# Third Party Dependencies
+from selenium import webdriver                                         # Used to create browser options
+
+### Used to manage driver installation
+from webdriver_manager.chrome import ChromeDriverManager
+from webdriver_manager.firefox import GeckoDriverManager
+from webdriver_manager.microsoft import EdgeChromiumDriverManager
+from webdriver_manager.core.os_manager import ChromeType, OperationSystemManager
+
+
+MANIFEST_PATH = os.path.join(os.path.expanduser("~"), ".ezvr", "drivers.json")
+"""Where the resolved driver paths are cached"""
+
+DRIVER_PATH_VARIABLE = "EZVR_{browser}_DRIVER_PATH"
+"""The environment variable that can be set to the path of a browser's driver to use instead of resolving one (formatted with the browser's name in uppercase, i.e. EZVR_CHROME_DRIVER_PATH)"""
+
+DRIVER_BINARIES = {"chrome": "chromedriver", "edge": "msedgedriver", "firefox": "geckodriver"}
+"""The name of the driver executable for each browser"""
+
+BROWSER_BINARIES = {
+    "chrome": ["google-chrome", "google-chrome-stable", "chromium", "chromium-browser",
+               r"%PROGRAMFILES%\Google\Chrome\Application\chrome.exe", r"%PROGRAMFILES(X86)%\Google\Chrome\Application\chrome.exe",
+               r"%LOCALAPPDATA%\Google\Chrome\Application\chrome.exe", "/Applications/Google Chrome.app/Contents/MacOS/Google Chrome",
+               "/Applications/Chromium.app/Contents/MacOS/Chromium"],
+    "edge": ["microsoft-edge", "microsoft-edge-stable", r"%PROGRAMFILES(X86)%\Microsoft\Edge\Application\msedge.exe",
+             r"%PROGRAMFILES%\Microsoft\Edge\Application\msedge.exe", "/Applications/Microsoft Edge.app/Contents/MacOS/Microsoft Edge"],
+    "firefox": ["firefox", r"%PROGRAMFILES%\Mozilla Firefox\firefox.exe", r"%PROGRAMFILES(X86)%\Mozilla Firefox\firefox.exe",
+                "/Applications/Firefox.app/Contents/MacOS/firefox"],
+}
+"""The names on PATH, and standard install paths (with environment variables), of each browser's executable"""
+
+BROWSER_TYPES = {"chrome": [ChromeType.GOOGLE, ChromeType.CHROMIUM], "edge": [ChromeType.MSEDGE], "firefox": ["firefox"]}
+"""The webdriver_manager browser types whose installed version is checked for each browser, when it's executable changed"""
+
+DRIVER_MANAGERS = {"chrome": ChromeDriverManager, "edge": EdgeChromiumDriverManager, "firefox": GeckoDriverManager}
+"""The webdriver_manager class used to download each browser's driver"""
+
+_manifest_lock = threading.Lock()
+
+
+@dataclass
+class LaunchProfile:
+    """How a browser is launched
+
+    Attributes
+    ----------
+    headless : bool
+        Whether to run without a window (no display is needed), by default True
+
+    window_size : Tuple[int, int]
+        The (width, height) of the window in CSS pixels, by default (1200, 1200)
+
+    scale_factor : Union[float, None]
+        The device scale factor (devicePixelRatio) to force, by default 1 (None uses the display's)
+
+    disable_extensions : bool
+        Whether to disable browser extensions, by default True
+
+    disable_background_networking : bool
+        Whether to stop the browser making update/sync/safe browsing requests in the background, by default True
+
+    disable_animations : bool
+        Whether to tell pages the user prefers reduced motion, by default True
+
+    disable_shared_memory : bool
+        Whether to avoid /dev/shm (it's often too small in containers and crashes chromium), by default True
+
+    arguments : List[str]
+        Any other command line arguments to launch the browser with, by default []
+    """
+    headless: bool = True
+    window_size: Tuple[int, int] = (1200, 1200)
+    scale_factor: Union[float, None] = 1
+    disable_extensions: bool = True
+    disable_background_networking: bool = True
+    disable_animations: bool = True
+    disable_shared_memory: bool = True
+    arguments: List[str] = field(default_factory=list)
+
+
+def browser_options(driver: str, profile: Union[LaunchProfile, None] = None) -> Union[webdriver.ChromeOptions, webdriver.EdgeOptions, webdriver.FirefoxOptions]:
+    """Creates the selenium options for launching a browser with a profile
+
+    Parameters
+    ----------
+    driver : str
+        The name of the browser ("chrome", "edge" or "firefox")
+
+    profile : Union[LaunchProfile, None], optional
+        How to launch the browser, by default None (LaunchProfile())
+
+    Raises
+    ------
+    ValueError
+        If the browser is not supported
+
+    Returns
+    -------
+    Union[webdriver.ChromeOptions, webdriver.EdgeOptions, webdriver.FirefoxOptions]
+        The options to pass to the browser's WebDriver
+
+    Examples
+    --------
+    ### Launch chrome with a window, at 2x scale
+    ```
+    from selenium import webdriver
+    from ez_visual_regression.drivers import LaunchProfile, browser_options
+
+    options = browser_options("chrome", LaunchProfile(headless=False, scale_factor=2))
+    driver = webdriver.Chrome(options=options)
+    ```
+    """
+    profile = profile or LaunchProfile()
+    width, height = profile.window_size
+    if driver in ("chrome", "edge"):
+        options = webdriver.ChromeOptions() if driver == "chrome" else webdriver.EdgeOptions()
+        options.add_argument("--disable-gpu")
+        options.add_argument("--no-sandbox")
+        options.add_argument(f"--window-size={width},{height}")
+        if profile.headless:
+            options.add_argument("--headless=new")
+        if profile.scale_factor:
+            options.add_argument(f"--force-device-scale-factor={profile.scale_factor}")
+        if profile.disable_extensions:
+            options.add_argument("--disable-extensions")
+        if profile.disable_background_networking:
+            for argument in ["--disable-background-networking", "--disable-component-update", "--disable-default-apps", "--disable-sync", "--no-first-run"]:
+                options.add_argument(argument)
+        if profile.disable_animations:
+            options.add_argument("--force-prefers-reduced-motion")
+        if profile.disable_shared_memory:
+            options.add_argument("--disable-dev-shm-usage")
+    elif driver == "firefox":
+        options = webdriver.FirefoxOptions()
+        options.add_argument(f"--width={width}")
+        options.add_argument(f"--height={height}")
+        if profile.headless:
+            options.add_argument("-headless")
+        if profile.scale_factor:
+            options.set_preference("layout.css.devPixelsPerPx", str(profile.scale_factor))
+        if profile.disable_extensions:
+            options.set_preference("extensions.enabledScopes", 0)
+        if profile.disable_background_networking:
+            for preference in ["app.update.auto", "browser.safebrowsing.malware.enabled", "browser.safebrowsing.phishing.enabled", "network.prefetch-next", "datareporting.healthreport.uploadEnabled"]:
+                options.set_preference(preference, False)
+        if profile.disable_animations:
+            options.set_preference("ui.prefersReducedMotion", 1)
+    else:
+        raise ValueError(f"Driver not supported {driver}")
+    for argument in profile.arguments:
+        options.add_argument(argument)
+    return options
+
+
+def parse_launch_profile(settings: Union[Dict, None]) -> LaunchProfile:
+    """Creates a launch profile from the driver section of a config file
+
+    Parameters
+    ----------
+    settings : Union[Dict, None]
+        The settings (any of LaunchProfile's attributes), None for the defaults
+
+    Raises
+    ------
+    ValueError
+        If a setting does not exist
+
+    Returns
+    -------
+    LaunchProfile
+        The profile with the settings applied
+    """
+    settings = dict(settings or {})
+    unknown = set(settings) - set(LaunchProfile.__dataclass_fields__)
+    if unknown:
+        raise ValueError(f"Launch settings not supported {sorted(unknown)}, must be one of {list(LaunchProfile.__dataclass_fields__)}")
+    if "window_size" in settings:
+        window_size = settings["window_size"]
+        if isinstance(window_size, str): # i.e. 1280x800
+            window_size = window_size.lower().split("x")
+        settings["window_size"] = tuple(int(dimension) for dimension in window_size)
+    if settings.get("scale_factor") is not None:
+        settings["scale_factor"] = float(settings["scale_factor"])
+    return LaunchProfile(**settings)
+
+
+def _browser_stamp(driver: str) -> Union[Dict, None]:
+    """Gets the path, modification time and size of a browser's executable (they change when the browser updates), None if it can't be found"""
+    for name in BROWSER_BINARIES[driver]:
+        path = os.path.expandvars(name) if os.sep in name or "/" in name else shutil.which(name)
+        if path and os.path.isfile(path):
+            path = os.path.realpath(path)
+            stat = os.stat(path)
+            return {"path": path, "mtime": stat.st_mtime_ns, "size": stat.st_size}
+    return None
+
+
+@functools.lru_cache(maxsize=None)
+def _browser_version(driver: str) -> Union[str, None]:
+    """Gets the installed version of a browser with webdriver_manager, None if it can't be found
+
+    This doesn't use the network, but starts a process (the browser with --version, or powershell on windows), so it's only
+    used when the browser's executable changed (see _browser_stamp())
+    """
+    manager = OperationSystemManager()
+    for browser_type in BROWSER_TYPES[driver]:
+        version = manager.get_browser_version_from_os(browser_type)
+        if version:
+            return version
+    return None
+
+
+def read_manifest() -> Dict:
+    """Reads the cached driver resolutions
+
+    Returns
+    -------
+    Dict
+        The browser names mapped to their resolution (driver path, and the browser's executable stamp and version), empty if there is no manifest
+    """
+    if not os.path.exists(MANIFEST_PATH):
+        return {}
+    try:
+        with open(MANIFEST_PATH, "r") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        logging.warning(f"Driver manifest {MANIFEST_PATH} could not be read, ignoring it")
+        return {}
+
+
+def _write_manifest_entry(driver: str, entry: Dict):
+    """Records the resolution for a browser in the manifest"""
+    with _manifest_lock:
+        manifest = read_manifest()
+        manifest[driver] = entry
+        os.makedirs(os.path.dirname(MANIFEST_PATH), exist_ok=True)
+        temporary_path = f"{MANIFEST_PATH}.{os.getpid()}.tmp"
+        with open(temporary_path, "w") as f:
+            json.dump(manifest, f)
+        os.replace(temporary_path, MANIFEST_PATH)
+
+
+def resolve_driver(driver: str, driver_path: Union[str, None] = None) -> str:
+    """Finds the driver executable for a browser, only using webdriver_manager (which can use the network) as a last resort
+
+    The order checked is:
+
+    1. driver_path (or the browser's DRIVER_PATH_VARIABLE environment variable, i.e. EZVR_CHROME_DRIVER_PATH)
+    2. The driver on PATH (i.e. chromedriver)
+    3. The manifest at MANIFEST_PATH, as long as the driver still exists and the browser hasn't changed since (it's executable
+       is checked with a file stat, and only if that changed is the browser's version compared)
+    4. webdriver_manager, the result is then stored in the manifest
+
+    Parameters
+    ----------
+    driver : str
+        The name of the browser ("chrome", "edge" or "firefox")
+
+    driver_path : Union[str, None], optional
+        The path to a driver to use, by default None
+
+    Raises
+    ------
+    ValueError
+        If the browser is not supported
+
+    FileNotFoundError
+        If driver_path (or the browser's DRIVER_PATH_VARIABLE) does not exist
+
+    Returns
+    -------
+    str
+        The path to the driver executable
+
+    Examples
+    --------
+    ### Find chromedriver
+    ```
+    from ez_visual_regression.drivers import resolve_driver
+
+    resolve_driver("chrome") # i.e. "/usr/bin/chromedriver"
+    ```
+    """
+    if driver not in DRIVER_BINARIES:
+        raise ValueError(f"Driver not supported {driver}")
+
+    driver_path = driver_path or os.environ.get(DRIVER_PATH_VARIABLE.format(browser=driver.upper()))
+    if driver_path:
+        if not os.path.isfile(driver_path):
+            raise FileNotFoundError(f"Driver path {driver_path} does not exist")
+        return driver_path
+
+    on_path = shutil.which(DRIVER_BINARIES[driver])
+    if on_path:
+        return on_path
+
+    browser = _browser_stamp(driver)
+    cached = read_manifest().get(driver)
+    if cached and os.path.isfile(cached.get("driver_path", "")):
+        if browser and cached.get("browser") == browser:
+            return cached["driver_path"]
+        version = _browser_version(driver)
+        if cached.get("browser_version") == version: # Touched or moved, but not updated
+            _write_manifest_entry(driver, {**cached, "browser": browser})
+            return cached["driver_path"]
+    else:
+        version = _browser_version(driver)
+
+    logging.debug(f"No cached driver for {driver} {version or '(unknown version)'}, resolving with webdriver_manager")
+    path = DRIVER_MANAGERS[driver]().install()
+    _write_manifest_entry(driver, {"driver_path": path, "browser": browser, "browser_version": version})
+    return path
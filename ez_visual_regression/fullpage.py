@@ -0,0 +1,125 @@
+# Standard lib dependencies
+import base64                                                          # Used to decode CDP screenshots
+import logging                                                         # Enables logging
+from typing import Dict, Union
+
+# Third Party Dependencies
+import numpy as np                                                     # Used to hold stitched screenshots
+
+## Browser automation
+from selenium.webdriver.remote.webdriver import WebDriver              # Used for type hinting
+from selenium.common.exceptions import WebDriverException              # Allows for error catching
+
+# Internal Dependencies
+from ez_visual_regression.comparison import decode_image
+
+
+CDP_MAX_HEIGHT = 16384
+"""The tallest screenshot (in screenshot pixels) chromium can capture in one go, taller pages are stitched"""
+
+# Gets the size of the whole document and the viewport in CSS pixels, and the ratio of screenshot pixels to CSS pixels
+PAGE_SIZE_SCRIPT = """var root = document.documentElement, body = document.body || root;
+return {
+    width: Math.max(root.scrollWidth, body.scrollWidth, root.clientWidth),
+    height: Math.max(root.scrollHeight, body.scrollHeight, root.clientHeight),
+    viewport_height: window.innerHeight,
+    scale: window.devicePixelRatio || 1
+};"""
+
+# Scrolls the page vertically, returning where it actually scrolled to (the last strip is usually clamped)
+SCROLL_SCRIPT = """window.scrollTo(0, arguments[0]);
+return window.scrollY || window.pageYOffset || 0;"""
+
+
+def page_size(driver: WebDriver) -> Dict[str, float]:
+    """Gets the width and height of the loaded document and the height of the viewport (in CSS pixels), and the device pixel ratio"""
+    return driver.execute_script(PAGE_SIZE_SCRIPT)
+
+
+def stitch_full_page(driver: WebDriver, size: Union[Dict[str, float], None] = None) -> np.ndarray:
+    """Captures the whole page by scrolling one viewport at a time and copying each screenshot into a preallocated image
+
+    Parameters
+    ----------
+    driver : WebDriver
+        The browser with the page loaded
+
+    size : Union[Dict[str, float], None], optional
+        The result of page_size() if it's already known, by default None
+
+    Notes
+    -----
+    - Elements with position: fixed or sticky appear in every strip they're visible in
+    - The page is scrolled back to the top afterwards
+
+    Returns
+    -------
+    np.ndarray
+        The page as a (height, width, 3) BGR array
+    """
+    size = size or page_size(driver)
+    scale = size["scale"]
+    page = None
+    try:
+        offset = 0
+        while True:
+            scrolled = driver.execute_script(SCROLL_SCRIPT, offset)
+            strip = decode_image(driver.get_screenshot_as_png())
+            if page is None: # Strips are the size of the viewport in screenshot pixels, which can include scrollbars
+                page = np.zeros((max(strip.shape[0], round(size["height"] * scale)), strip.shape[1], 3), np.uint8)
+            top = round(scrolled * scale)
+            rows = min(strip.shape[0], page.shape[0] - top)
+            page[top:top + rows] = strip[:rows]
+            if top + strip.shape[0] >= page.shape[0] or scrolled < offset: # Reached the bottom
+                break
+            offset = scrolled + size["viewport_height"]
+    finally:
+        driver.execute_script(SCROLL_SCRIPT, 0)
+    return page
+
+
+def capture_full_page(driver: WebDriver) -> Union[bytes, np.ndarray]:
+    """Captures the whole page, not just the part in the viewport
+
+    Chromium browsers use the devtools protocol (Page.captureScreenshot with captureBeyondViewport), firefox uses it's own full
+    page screenshots, and anything else (or pages too tall to capture in one go) is scrolled through and stitched together
+
+    Parameters
+    ----------
+    driver : WebDriver
+        The browser with the page loaded
+
+    Returns
+    -------
+    Union[bytes, np.ndarray]
+        PNG bytes, or the stitched page as a (height, width, 3) BGR array (which can be compared without encoding it)
+
+    Examples
+    --------
+    ### Screenshot a whole page
+    ```
+    from ez_visual_regression.api import instantiate_driver, load_page
+    from ez_visual_regression.fullpage import capture_full_page
+    from ez_visual_regression.comparison import write_image, write_bytes
+
+    driver = instantiate_driver("chrome")
+    load_page(driver, "https://canadiancoding.ca")
+    capture = capture_full_page(driver)
+    write_bytes("page.png", capture) if isinstance(capture, bytes) else write_image("page.png", capture)
+    ```
+    """
+    size = page_size(driver)
+    if size["height"] * size["scale"] <= CDP_MAX_HEIGHT:
+        if hasattr(driver, "execute_cdp_cmd"): # Chrome and Edge
+            try:
+                clip = {"x": 0, "y": 0, "width": size["width"], "height": size["height"], "scale": 1}
+                result = driver.execute_cdp_cmd("Page.captureScreenshot", {"format": "png", "captureBeyondViewport": True, "clip": clip})
+                return base64.b64decode(result["data"])
+            except WebDriverException:
+                logging.debug("Unable to capture beyond the viewport with CDP, stitching instead")
+        if hasattr(driver, "get_full_page_screenshot_as_png"): # Firefox
+            try:
+                return driver.get_full_page_screenshot_as_png()
+            except WebDriverException:
+                logging.debug("Unable to take a full page screenshot, stitching instead")
+    return stitch_full_page(driver, size)
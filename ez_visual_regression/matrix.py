@@ -0,0 +1,205 @@
+# Standard lib dependencies
+import os                                                              # Path verification & modification
+import logging                                                         # Enables logging
+from dataclasses import dataclass                                      # Used for combinations
+from typing import Dict, List, Tuple, Union
+
+# Third Party Dependencies
+from selenium.webdriver.remote.webdriver import WebDriver              # Used for type hinting
+
+# Internal Dependencies
+from ez_visual_regression.stability import wait_for_stability, DEFAULT_WAIT_TIMEOUT
+from ez_visual_regression.timing import phase
+
+
+@dataclass(frozen=True)
+class Combination:
+    """One browser, viewport and device scale factor from a config's matrix
+
+    Attributes
+    ----------
+    browser : str
+        The name of the browser ("chrome", "edge" or "firefox")
+
+    viewport : Tuple[int, int]
+        The (width, height) of the window in CSS pixels
+
+    scale_factor : float
+        The device scale factor (devicePixelRatio)
+    """
+    browser: str
+    viewport: Tuple[int, int]
+    scale_factor: float
+
+    @property
+    def name(self) -> str:
+        """The name of the combination, used as the folder for it's baselines (i.e. chrome-1280x800@2x)"""
+        return f"{self.browser}-{self.viewport[0]}x{self.viewport[1]}@{self.scale_factor:g}x"
+
+    @property
+    def launch(self) -> Tuple[str, float]:
+        """What a browser has to be launched with for this combination, combinations with the same launch share browsers and page loads"""
+        return (self.browser, self.scale_factor)
+
+
+def parse_matrix(settings: Union[Dict, None], driver: str = "chrome", window_size: Tuple[int, int] = (1200, 1200), scale_factor: Union[float, None] = 1) -> Union[List[Combination], None]:
+    """Creates every combination from the matrix section of a config file
+
+    Parameters
+    ----------
+    settings : Union[Dict, None]
+        The matrix section, with any of browsers (i.e. [chrome, firefox]), viewports (i.e. [1280x800, 375x667]) and scale_factors (i.e. [1, 2])
+
+    driver, window_size, scale_factor : optional
+        What's used for a missing list; the config's driver, and it's launch profile's window size and scale factor
+
+    Raises
+    ------
+    ValueError
+        If the section has a setting that does not exist, or a list is empty
+
+    Returns
+    -------
+    Union[List[Combination], None]
+        The combinations ordered by browser, then scale factor, then viewport (so ones that share a page load are together), None if there's no matrix
+
+    Examples
+    --------
+    ### Test 2 browsers at 2 breakpoints
+    ```
+    from ez_visual_regression.matrix import parse_matrix
+
+    parse_matrix({"browsers": ["chrome", "firefox"], "viewports": ["1280x800", "375x667"]})
+    # [Combination("chrome", (1280, 800), 1.0), Combination("chrome", (375, 667), 1.0), Combination("firefox", (1280, 800), 1.0), Combination("firefox", (375, 667), 1.0)]
+    ```
+    """
+    if not settings:
+        return None
+    unknown = set(settings) - {"browsers", "viewports", "scale_factors"}
+    if unknown:
+        raise ValueError(f"Matrix settings not supported {sorted(unknown)}, must be one of ['browsers', 'viewports', 'scale_factors']")
+    browsers = [browser.lower() for browser in settings.get("browsers") or [driver]]
+    viewports = []
+    for viewport in settings.get("viewports") or [window_size]:
+        if isinstance(viewport, str): # i.e. 1280x800
+            viewport = viewport.lower().split("x")
+        viewports.append(tuple(int(dimension) for dimension in viewport))
+    scale_factors = [float(factor) for factor in settings.get("scale_factors") or [scale_factor or 1]]
+    if not (browsers and viewports and scale_factors):
+        raise ValueError("Matrix lists can't be empty")
+    return [Combination(browser, viewport, factor) for browser in browsers for factor in scale_factors for viewport in viewports]
+
+
+def combination_output(path: str, combination: Union[Combination, None], filename: bool = False) -> str:
+    """Gets where a test's baselines (or a screenshot) go for a combination, each combination has it's own folder inside the test's
+
+    Parameters
+    ----------
+    path : str
+        The test's folder (or the screenshot's filename)
+
+    combination : Union[Combination, None]
+        The combination, None for runs without a matrix (the path is unchanged)
+
+    filename : bool, optional
+        Whether path is a screenshot's filename instead of a folder, by default False
+
+    Returns
+    -------
+    str
+        The path for the combination (i.e. home/chrome-1280x800@1x, or chart/chrome-1280x800@1x/screenshot.png)
+    """
+    if combination is None:
+        return path
+    if filename:
+        return os.path.join(os.path.dirname(path), combination.name, os.path.basename(path))
+    return os.path.join(path, combination.name)
+
+
+def expand_entry(kind: str, arguments: list, combinations: Union[List[Combination], None]) -> List[Tuple[list, Union[Combination, None]]]:
+    """Repeats a test's or screenshot's arguments for each combination
+
+    Parameters
+    ----------
+    kind : str
+        "test" or "screenshot"
+
+    arguments : list
+        The test's or screenshot's arguments (i.e. a configuration.ConfigTest)
+
+    combinations : Union[List[Combination], None]
+        The combinations, None for runs without a matrix
+
+    Returns
+    -------
+    List[Tuple[list, Union[Combination, None]]]
+        The arguments with the combination's folder/filename (see combination_output()) and the combination, or just the
+        arguments and None without a matrix
+    """
+    if not combinations:
+        return [(arguments, None)]
+    expanded = []
+    for combination in combinations:
+        output = combination_output(arguments[1], combination, filename=kind == "screenshot")
+        if hasattr(arguments, "_replace"): # A record, only the folder/filename changes
+            expanded.append((arguments._replace(**{arguments._fields[1]: output}), combination))
+        else:
+            expanded.append(([arguments[0], output, *arguments[2:]], combination))
+    return expanded
+
+
+def expand_matrix(config: Dict) -> Dict:
+    """Repeats every test and screenshot in a parsed config for each combination in it's matrix
+
+    Parameters
+    ----------
+    config : Dict
+        The parsed config (see configuration.parse_config()), with it's combinations in config["matrix"]
+
+    Returns
+    -------
+    Dict
+        A copy of the config where tests and screenshots output to per-combination folders (see combination_output()), and
+        config["combinations"] is the combination of each test then screenshot (the config is returned as-is without a matrix)
+    """
+    combinations = config.get("matrix")
+    if not combinations or "combinations" in config:
+        return config
+    tests = [entry for arguments in config["tests"] for entry in expand_entry("test", arguments, combinations)]
+    screenshots = [entry for arguments in config["screenshots"] for entry in expand_entry("screenshot", arguments, combinations)]
+    return {**config, "tests": [arguments for arguments, _ in tests], "screenshots": [arguments for arguments, _ in screenshots],
+            "combinations": [combination for _, combination in tests + screenshots]}
+
+
+def resize_viewport(driver: WebDriver, viewport: Tuple[int, int], wait: Union[List[str], None] = None, wait_timeout: float = DEFAULT_WAIT_TIMEOUT, restabilize: bool = True) -> bool:
+    """Resizes the browser's window, then waits for the loaded page to be stable again (instead of reloading it)
+
+    Parameters
+    ----------
+    driver : WebDriver
+        The browser
+
+    viewport : Tuple[int, int]
+        The (width, height) of the window in CSS pixels
+
+    wait, wait_timeout : optional
+        The stability strategies to wait on and the maximum seconds to wait (see stability.wait_for_stability())
+
+    restabilize : bool, optional
+        Whether to wait for the page to be stable after resizing, by default True (set to False if the next page hasn't been loaded yet)
+
+    Returns
+    -------
+    bool
+        True if the window was resized, False if it was already that size
+    """
+    if getattr(driver, "_ezvr_viewport", None) == tuple(viewport):
+        return False
+    logging.debug(f"Resizing window to {viewport[0]}x{viewport[1]}")
+    with phase("navigate"):
+        driver.set_window_size(*viewport)
+    driver._ezvr_viewport = tuple(viewport)
+    if restabilize:
+        with phase("wait"):
+            wait_for_stability(driver, wait, wait_timeout)
+    return True
@@ -0,0 +1,242 @@
+# Standard lib dependencies
+import os                                                              # Path verification & modification
+import glob                                                            # Used to find baseline images
+import hashlib                                                         # Used to address images by content
+import logging                                                         # Enables logging
+import threading                                                       # Used to guard pack writes
+from typing import Dict, Tuple, Union
+
+# Third Party Dependencies
+import numpy as np                                                     # Used to hold images in memory
+
+# Internal Dependencies
+from ez_visual_regression.comparison import encode_image
+
+
+PACK_FILENAME = "baselines.ezvrpack"
+"""The name of the pack file stored in a test's folder"""
+
+PACK_MAGIC = b"EZVRPACK1\n"
+"""The bytes every pack file starts with"""
+
+_BLOB_RECORD = b"B" # Followed by the image's 32 byte SHA-256, an 8 byte length, and the PNG bytes
+_NAME_RECORD = b"N" # Followed by the image's 32 byte SHA-256, a 2 byte length, and the baseline's filename
+
+_pack_lock = threading.Lock()
+_index_cache: "Dict[str, Tuple[Tuple[int, int], Tuple[Dict[str, Tuple[int, int]], Dict[str, str], int]]]" = {}
+
+
+def _read_index(path: str) -> Tuple[Dict[str, Tuple[int, int]], Dict[str, str], int]:
+    """Scans a pack file, returning the (offset, length) of each image by it's SHA-256, the SHA-256 of each filename,
+    and where the last complete record ends. The result is kept in memory until the file's modification time or size changes"""
+    stat = os.stat(path)
+    signature = (stat.st_mtime_ns, stat.st_size)
+    cached = _index_cache.get(path)
+    if cached and cached[0] == signature:
+        return cached[1]
+    blobs, names = {}, {}
+    with open(path, "rb") as f:
+        if f.read(len(PACK_MAGIC)) != PACK_MAGIC:
+            raise ValueError(f"{path} is not a baseline pack")
+        end = f.tell()
+        while True:
+            header = f.read(33)
+            if not header:
+                break
+            kind, digest = header[:1], header[1:].hex()
+            size_bytes = f.read(8 if kind == _BLOB_RECORD else 2)
+            if len(header) < 33 or kind not in (_BLOB_RECORD, _NAME_RECORD) or len(size_bytes) < (8 if kind == _BLOB_RECORD else 2):
+                logging.warning(f"Baseline pack {path} has an incomplete record at {end}, ignoring the rest of it")
+                break
+            size = int.from_bytes(size_bytes, "big")
+            offset = f.tell()
+            if kind == _BLOB_RECORD:
+                f.seek(size, os.SEEK_CUR)
+                if f.tell() > stat.st_size:
+                    logging.warning(f"Baseline pack {path} has an incomplete record at {end}, ignoring the rest of it")
+                    break
+                blobs[digest] = (offset, size)
+            else:
+                name = f.read(size)
+                if len(name) < size:
+                    logging.warning(f"Baseline pack {path} has an incomplete record at {end}, ignoring the rest of it")
+                    break
+                names[name.decode()] = digest
+            end = f.tell()
+    _index_cache[path] = (signature, (blobs, names, end))
+    return blobs, names, end
+
+
+def packed_baselines(folder: str) -> Dict[str, str]:
+    """Lists the baselines in a folder's pack
+
+    Parameters
+    ----------
+    folder : str
+        The folder with the pack
+
+    Returns
+    -------
+    Dict[str, str]
+        The SHA-256 of each baseline's PNG bytes by it's filename (i.e. baseline.png), empty if there is no pack
+    """
+    path = os.path.join(folder, PACK_FILENAME)
+    if not os.path.exists(path):
+        return {}
+    return dict(_read_index(path)[1])
+
+
+def read_packed(folder: str, name: str) -> bytes:
+    """Reads a baseline's PNG bytes from a folder's pack
+
+    Parameters
+    ----------
+    folder : str
+        The folder with the pack
+
+    name : str
+        The filename of the baseline (i.e. baseline-3.png)
+
+    Raises
+    ------
+    FileNotFoundError
+        If the baseline is not in the pack
+
+    Returns
+    -------
+    bytes
+        The baseline's PNG bytes
+    """
+    path = os.path.join(folder, PACK_FILENAME)
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"Baseline {name} is not in {path}")
+    blobs, names, _ = _read_index(path)
+    if name not in names or names[name] not in blobs:
+        raise FileNotFoundError(f"Baseline {name} is not in {path}")
+    offset, size = blobs[names[name]]
+    with open(path, "rb") as f:
+        f.seek(offset)
+        return f.read(size)
+
+
+def add_to_pack(folder: str, name: str, capture: Union[bytes, np.ndarray]) -> str:
+    """Stores a baseline in a folder's pack (creating it if needed), replacing any baseline with the same filename
+
+    Images are stored once no matter how many baselines have them (i.e. identical elements in multielement mode),
+    later baselines with the same content only add their filename
+
+    Parameters
+    ----------
+    folder : str
+        The folder with the pack
+
+    name : str
+        The filename of the baseline (i.e. baseline-3.png)
+
+    capture : Union[bytes, np.ndarray]
+        PNG bytes (stored as-is) or an image (encoded with comparison.PNG_COMPRESSION)
+
+    Returns
+    -------
+    str
+        The SHA-256 of the stored PNG bytes
+
+    Examples
+    --------
+    ### Store two identical element captures
+    ```
+    from ez_visual_regression.pack import add_to_pack, packed_baselines
+
+    with open("button.png", "rb") as f:
+        png = f.read()
+    add_to_pack("buttons", "baseline-0.png", png)
+    add_to_pack("buttons", "baseline-1.png", png) # Only adds the filename
+    packed_baselines("buttons") # {"baseline-0.png": "9f86...", "baseline-1.png": "9f86..."}
+    ```
+    """
+    data = capture if isinstance(capture, bytes) else encode_image(capture)
+    digest = hashlib.sha256(data)
+    path = os.path.join(folder, PACK_FILENAME)
+    with _pack_lock:
+        if not os.path.exists(path):
+            with open(path, "wb") as f:
+                f.write(PACK_MAGIC)
+        blobs, names, end = _read_index(path)
+        with open(path, "r+b") as f:
+            f.truncate(end) # Drops anything left by an interrupted write
+            f.seek(end)
+            if digest.hexdigest() not in blobs:
+                f.write(_BLOB_RECORD + digest.digest() + len(data).to_bytes(8, "big") + data)
+            if names.get(name) != digest.hexdigest():
+                encoded_name = name.encode()
+                f.write(_NAME_RECORD + digest.digest() + len(encoded_name).to_bytes(2, "big") + encoded_name)
+    return digest.hexdigest()
+
+
+def compact_pack(folder: str) -> int:
+    """Rewrites a folder's pack without the images no baseline uses anymore (i.e. after baselines were replaced)
+
+    Parameters
+    ----------
+    folder : str
+        The folder with the pack
+
+    Returns
+    -------
+    int
+        How many bytes were freed
+    """
+    path = os.path.join(folder, PACK_FILENAME)
+    if not os.path.exists(path):
+        return 0
+    with _pack_lock:
+        before = os.path.getsize(path)
+        blobs, names, _ = _read_index(path)
+        with open(path, "rb") as source, open(path + ".tmp", "wb") as f:
+            f.write(PACK_MAGIC)
+            for digest in sorted(set(names.values()) & set(blobs)):
+                offset, size = blobs[digest]
+                source.seek(offset)
+                f.write(_BLOB_RECORD + bytes.fromhex(digest) + size.to_bytes(8, "big") + source.read(size))
+            for name, digest in sorted(names.items()):
+                if digest in blobs:
+                    encoded_name = name.encode()
+                    f.write(_NAME_RECORD + bytes.fromhex(digest) + len(encoded_name).to_bytes(2, "big") + encoded_name)
+        os.replace(path + ".tmp", path)
+    return before - os.path.getsize(path)
+
+
+def pack_baselines(folder: str, remove: bool = True) -> int:
+    """Moves the baseline images in a folder (baseline.png, baseline-<index>.png) into it's pack
+
+    Parameters
+    ----------
+    folder : str
+        The folder with the baselines
+
+    remove : bool, optional
+        Whether to delete the images once they're in the pack, by default True (baselines in the folder are used before packed ones)
+
+    Returns
+    -------
+    int
+        How many baselines were packed
+
+    Examples
+    --------
+    ### Pack the baselines of every test
+    ```
+    import glob
+    from ez_visual_regression.pack import pack_baselines
+
+    for folder in glob.glob("visual_tests/*/"):
+        pack_baselines(folder)
+    ```
+    """
+    paths = sorted(glob.glob(os.path.join(folder, "baseline.png")) + glob.glob(os.path.join(folder, "baseline-*.png")))
+    for path in paths:
+        with open(path, "rb") as f:
+            add_to_pack(folder, os.path.basename(path), f.read())
+        if remove:
+            os.remove(path)
+    return len(paths)
@@ -0,0 +1,327 @@
+# Standard lib dependencies
+import os                                                              # Path verification & modification
+import glob                                                            # Used to find baseline images
+import json                                                            # Used to read/write dependency maps
+import hashlib                                                         # Used to detect changed files
+import logging                                                         # Enables logging
+import subprocess                                                      # Used to ask git which files changed
+from typing import Dict, List, Set, Union
+
+# Third Party Dependencies
+from selenium.webdriver.remote.webdriver import WebDriver              # Used for type hinting
+from selenium.common.exceptions import WebDriverException              # Allows for error catching
+
+# Internal Dependencies
+from ez_visual_regression.api import _normalize_url
+from ez_visual_regression.cache import local_page_path, local_page_dependencies
+from ez_visual_regression.pack import PACK_FILENAME
+from ez_visual_regression.store import MANIFEST_FILENAME
+
+
+DEPENDENCIES_FILENAME = ".ezvr-dependencies.json"
+"""The name of the dependency map stored next to the baselines"""
+
+# Gets the URL of every resource the page loaded (stylesheets, scripts, images, fonts etc.), and the page itself
+LOADED_RESOURCES_SCRIPT = """var urls = [window.location.href];
+var entries = window.performance.getEntriesByType("resource");
+for (var i = 0; i < entries.length; i++) {
+    urls.push(entries[i].name);
+}
+return urls;"""
+
+
+def _file_path(url: str) -> Union[str, None]:
+    """Gets the real path of a local file URL, None if it isn't a local file"""
+    path = local_page_path(url)
+    return os.path.realpath(path) if path else None
+
+
+def loaded_dependencies(driver: Union[WebDriver, None], url: str) -> Union[List[str], None]:
+    """Finds every local file a page depends on; the page, and the stylesheets, scripts, images and fonts it loaded
+
+    Parameters
+    ----------
+    driver : Union[WebDriver, None]
+        The browser, if it has the page loaded the files it actually requested (from it's performance entries) are included
+
+    url : str
+        The page's URL (with protocol)
+
+    Returns
+    -------
+    Union[List[str], None]
+        The sorted real paths of the files, or None if the page isn't a local file (remote pages can't be tracked)
+    """
+    page = _file_path(url)
+    if not page:
+        return None
+    found: Set[str] = set()
+    if os.path.isfile(page): # Files referenced in the source that weren't loaded (i.e. lazy images) can still change the page
+        found.update(os.path.realpath(path) for path in local_page_dependencies(page))
+    if driver is not None and _file_path(getattr(driver, "_ezvr_loaded_url", None) or "") == page:
+        try:
+            for resource in driver.execute_script(LOADED_RESOURCES_SCRIPT) or []:
+                path = _file_path(resource.split("#")[0].split("?")[0])
+                if path and os.path.isfile(path):
+                    found.add(path)
+        except WebDriverException:
+            logging.debug(f"Unable to read loaded resources for {url}")
+    return sorted(found)
+
+
+def _file_digest(path: str) -> str:
+    """Hashes the contents of a file"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _stored_path(path: str, folder: str) -> str:
+    """Gets the path to store in a map, relative to the folder so maps still work when a checkout is moved"""
+    try:
+        return os.path.relpath(path, os.path.realpath(folder))
+    except ValueError: # Different drives on windows
+        return path
+
+
+def _baseline_files(folder: str) -> Set[str]:
+    """Gets the real paths of the baseline images, pack and manifest in a test's folder"""
+    paths = glob.glob(os.path.join(folder, "baseline*.png")) + glob.glob(os.path.join(folder, PACK_FILENAME)) + glob.glob(os.path.join(folder, MANIFEST_FILENAME))
+    return {os.path.realpath(path) for path in paths}
+
+
+def settings_digest(arguments: list, options: Union[Dict, None] = None) -> str:
+    """Hashes a test's config record and the run options that affect it's result (like cache.compute_cache_key()), so a map recorded with other settings is out of date
+
+    Parameters
+    ----------
+    arguments : list
+        The test's arguments (i.e. a configuration.ConfigTest)
+
+    options : Union[Dict, None], optional
+        Any other (JSON serializable) settings that affect the result (i.e. the comparison method and browser), by default None
+
+    Returns
+    -------
+    str
+        The hex digest of the test and options
+    """
+    inputs = {"test": list(arguments), "options": options or {}}
+    return hashlib.sha256(json.dumps(inputs, sort_keys=True, default=str).encode()).hexdigest()
+
+
+def record_dependencies(folder: str, url: str, paths: List[str], settings: Union[str, None] = None):
+    """Writes the dependency map for a test, with the state of every file so later runs can tell what changed
+
+    Parameters
+    ----------
+    folder : str
+        The folder with the test's baseline(s), the map is written to it
+
+    url : str
+        The URL of the page being tested, as it's written in the config
+
+    paths : List[str]
+        The files the page depends on (see loaded_dependencies()), the baselines (and baseline pack or manifest) in the folder are added to them
+
+    settings : Union[str, None], optional
+        The test's settings_digest(), by default None (not recorded)
+    """
+    files = {}
+    for path in sorted(set(paths) | _baseline_files(folder)):
+        if not os.path.isfile(path):
+            continue
+        stat = os.stat(path)
+        files[_stored_path(path, folder)] = {"mtime": stat.st_mtime_ns, "size": stat.st_size, "sha256": _file_digest(path)}
+    os.makedirs(folder, exist_ok=True)
+    with open(os.path.join(folder, DEPENDENCIES_FILENAME), "w") as f:
+        json.dump({"url": url, "settings": settings, "files": files}, f, indent=2)
+
+
+def read_dependencies(folder: str) -> Union[Dict, None]:
+    """Reads the dependency map for a test
+
+    Parameters
+    ----------
+    folder : str
+        The folder with the test's baseline(s)
+
+    Returns
+    -------
+    Union[Dict, None]
+        The map's url, settings (see settings_digest()) and files (the real path of each file, mapped to it's mtime, size and sha256), or None if there isn't one
+    """
+    path = os.path.join(folder, DEPENDENCIES_FILENAME)
+    if not os.path.exists(path):
+        return None
+    try:
+        with open(path, "r") as f:
+            dependencies = json.load(f)
+    except (OSError, ValueError):
+        logging.warning(f"Dependency map {path} could not be read, ignoring it")
+        return None
+    root = os.path.realpath(folder)
+    dependencies["files"] = {os.path.normpath(os.path.join(root, path)): state for path, state in dependencies.get("files", {}).items()}
+    return dependencies
+
+
+def git_changed_files(ref: str, directory: str = ".") -> Set[str]:
+    """Gets every file that differs from a git ref, including uncommitted and untracked files
+
+    Parameters
+    ----------
+    ref : str
+        The branch, tag or commit to compare against (i.e. main, HEAD~1)
+
+    directory : str, optional
+        A directory in the repository, by default "."
+
+    Raises
+    ------
+    ValueError
+        If git isn't installed, the directory isn't in a repository, or the ref does not exist
+
+    Returns
+    -------
+    Set[str]
+        The real paths of the changed files
+    """
+    def git(*arguments: str) -> List[str]:
+        try:
+            result = subprocess.run(["git", *arguments], cwd=directory, capture_output=True, text=True, check=True)
+        except (OSError, subprocess.CalledProcessError) as e:
+            raise ValueError(f"Unable to compare against git ref {ref}: {getattr(e, 'stderr', '') or e}")
+        return [line for line in result.stdout.splitlines() if line]
+    root = git("rev-parse", "--show-toplevel")[0]
+    changed = git("diff", "--name-only", ref, "--") + git("ls-files", "--others", "--exclude-standard", "--full-name", ":/")
+    return {os.path.realpath(os.path.join(root, path)) for path in changed}
+
+
+def changed_dependencies(folder: str, url: str, changed_files: Union[Set[str], None] = None, settings: Union[str, None] = None) -> Union[List[str], None]:
+    """Finds which of a test's dependencies changed since it last passed
+
+    Parameters
+    ----------
+    folder : str
+        The folder with the test's baseline(s) and dependency map
+
+    url : str
+        The URL of the page being tested, as it's written in the config (a test pointed at a different page has to run)
+
+    changed_files : Union[Set[str], None], optional
+        The files to treat as changed (see git_changed_files()), by default None (compare each file's mtime, then hash, to the map)
+
+    settings : Union[str, None], optional
+        The test's settings_digest(), by default None (settings aren't compared)
+
+    Returns
+    -------
+    Union[List[str], None]
+        The changed files (empty if nothing changed), or None if there's no map to compare to or it was recorded with other settings (the test has to run)
+    """
+    dependencies = read_dependencies(folder)
+    if not dependencies or dependencies.get("url") != url:
+        return None
+    if settings is not None and dependencies.get("settings") != settings:
+        logging.debug(f"Settings of {folder} changed since it's dependencies were recorded")
+        return None
+    changed = []
+    for path, state in dependencies["files"].items():
+        if changed_files is not None:
+            if path in changed_files:
+                changed.append(path)
+            continue
+        try:
+            stat = os.stat(path)
+        except OSError: # Deleted
+            changed.append(path)
+            continue
+        if stat.st_mtime_ns == state["mtime"] and stat.st_size == state["size"]:
+            continue
+        if stat.st_size != state["size"] or _file_digest(path) != state["sha256"]:
+            changed.append(path)
+    if changed_files is None: # New baselines (i.e. a deleted baseline being recreated) need the test to run
+        changed += sorted(_baseline_files(folder) - set(dependencies["files"]))
+    return changed
+
+
+def has_changed(arguments: list, changed_files: Union[Set[str], None] = None, options: Union[Dict, None] = None) -> bool:
+    """Checks whether a test has to run, because it's dependencies changed since it last passed (see select_changed_tests())
+
+    Parameters
+    ----------
+    arguments : list
+        The test's arguments (i.e. a configuration.ConfigTest)
+
+    changed_files : Union[Set[str], None], optional
+        The files to treat as changed (see git_changed_files()), by default None (compare each file to the test's map)
+
+    options : Union[Dict, None], optional
+        The run options that affect the result (see settings_digest()), by default None
+
+    Returns
+    -------
+    bool
+        False if the test's page is local, and neither it's settings nor any of it's dependencies changed, otherwise True
+    """
+    url, folder = arguments[0], arguments[1]
+    try:
+        local = local_page_path(_normalize_url(url))
+    except FileNotFoundError: # Left to be reported by the test itself
+        local = None
+    changed = changed_dependencies(folder, url, changed_files, settings_digest(arguments, options)) if local else None
+    if changed is None or changed:
+        return True
+    logging.debug(f"Dependencies of {folder} are unchanged, skipping it")
+    return False
+
+
+def select_changed_tests(config: Dict[str, Union[str, List[List[Union[bool,None,int,str]]]]], since: Union[str, None] = None, options: Union[Dict, None] = None) -> Dict[str, Union[str, List[List[Union[bool,None,int,str]]]]]:
+    """Narrows a parsed config down to the tests whose dependencies changed since they last passed
+
+    Parameters
+    ----------
+    config : Dict[str, Union[str, List[List[Union[bool,None,int,str]]]]]
+        The parsed config (see configuration.parse_config())
+
+    since : Union[str, None], optional
+        A git ref to compare the dependencies against, by default None (compare them to the state recorded in each test's map)
+
+    options : Union[Dict, None], optional
+        The run options that affect the result (see settings_digest()), they have to match the ones the maps were recorded with, by default None
+
+    Notes
+    -----
+    - Tests of remote pages, tests that haven't passed yet (so have no map), and tests whose settings changed are always selected
+    - Screenshots are always kept, they have nothing to compare to
+    - For an expanded matrix (see matrix.expand_matrix()) config["combinations"] is narrowed down with the tests
+
+    Returns
+    -------
+    Dict[str, Union[str, List[List[Union[bool,None,int,str]]]]]
+        A copy of the config with only the selected tests
+
+    Examples
+    --------
+    ### Only run tests whose pages changed since main
+    ```
+    from ez_visual_regression.configuration import parse_config, execute_config
+    from ez_visual_regression.selection import select_changed_tests
+
+    config = parse_config("config.yml")
+    execute_config(select_changed_tests(config, since="main"))
+    ```
+    """
+    changed_files = git_changed_files(since) if since else None
+    tests, selected = [], []
+    for position, arguments in enumerate(config["tests"]):
+        if has_changed(arguments, changed_files, options):
+            tests.append(arguments)
+            selected.append(position)
+    print(f"Selected {len(tests)} of {len(config['tests'])} tests with changed dependencies" + (f" since {since}" if since else ""))
+    if config.get("combinations"):
+        combinations = config["combinations"]
+        return {**config, "tests": tests, "combinations": [combinations[position] for position in selected] + combinations[len(config["tests"]):]}
+    return {**config, "tests": tests}
@@ -0,0 +1,311 @@
+# Standard lib dependencies
+import os                                                              # Path verification & modification
+import sys                                                             # Used to start the daemon with the same interpreter
+import json                                                            # Used to read/write session files
+import time                                                            # Used to wait for the daemon to start
+import signal                                                          # Used to stop the daemon cleanly
+import logging                                                         # Enables logging
+import subprocess                                                      # Used to start the daemon in the background
+from dataclasses import asdict                                         # Used to write launch profiles to session files
+from contextlib import contextmanager                                  # Used to create browser_session()
+from typing import Dict, Iterator, Union
+
+# Third Party Dependencies
+from selenium import webdriver                                         # Used for attaching options
+from selenium.webdriver.remote.webdriver import WebDriver              # Used for type hinting & attaching to sessions
+from selenium.common.exceptions import WebDriverException              # Allows for error catching
+
+# Internal Dependencies
+from ez_visual_regression.api import instantiate_driver
+from ez_visual_regression.drivers import LaunchProfile, parse_launch_profile
+from ez_visual_regression.timing import instrument_driver
+
+
+SESSION_DIRECTORY = os.path.join(os.path.expanduser("~"), ".ezvr")
+"""Where the daemon writes the information needed to attach to its browser"""
+
+DAEMON_START_TIMEOUT = 60
+"""The maximum amount of seconds to wait for the daemon's browser to start"""
+
+# Clears the storage of the current page's origin (fails silently on pages that don't allow storage i.e. about:blank)
+CLEAR_STORAGE_SCRIPT = """try { window.localStorage.clear(); } catch (e) {}
+try { window.sessionStorage.clear(); } catch (e) {}"""
+
+
+class _AttachedDriver(WebDriver):
+    """A WebDriver that uses an existing session (i.e. the daemon's browser) instead of starting a new one,
+    quitting it resets the browser and leaves it running for the next attach
+
+    Overrides WebDriver.start_session(), which is why selenium is pinned to 4.x in setup.py
+    """
+    def __init__(self, executor_url: str, session_id: str, browser_name: str):
+        self._attach_session_id = session_id
+        self._attach_browser_name = browser_name
+        options = webdriver.FirefoxOptions() if browser_name == "firefox" else webdriver.ChromeOptions()
+        super().__init__(command_executor=executor_url, options=options)
+
+    def start_session(self, capabilities: dict, *args, **kwargs):
+        self.session_id = self._attach_session_id
+        self.caps = {"browserName": self._attach_browser_name}
+
+    def quit(self):
+        try:
+            reset_browser(self)
+        except WebDriverException:
+            logging.debug("Unable to reset attached browser")
+
+    def end_session(self):
+        """Actually ends the attached session (closing the browser)"""
+        WebDriver.quit(self)
+
+
+def reset_browser(driver: WebDriver):
+    """Clears the state a page can leave behind so the next test starts from scratch
+
+    Clears the storage of the current origin and all cookies, then navigates to about:blank
+
+    Parameters
+    ----------
+    driver : WebDriver
+        The browser to reset
+
+    Examples
+    --------
+    ### Reuse one browser for two tests
+    ```
+    from ez_visual_regression.api import instantiate_driver, assert_image_similarity_to_baseline
+    from ez_visual_regression.session import reset_browser
+
+    driver = instantiate_driver("chrome")
+    assert_image_similarity_to_baseline(driver, "https://canadiancoding.ca", "home")
+    reset_browser(driver)
+    assert_image_similarity_to_baseline(driver, "https://kieranwood.ca", "blog")
+    driver.quit()
+    ```
+    """
+    driver.execute_script(CLEAR_STORAGE_SCRIPT)
+    driver.delete_all_cookies()
+    driver.get("about:blank")
+    driver._ezvr_loaded_url = None
+
+
+def _session_file(driver_name: str) -> str:
+    """Gets the path to the file the daemon for a browser writes it's session to"""
+    return os.path.join(SESSION_DIRECTORY, f"{driver_name}-session.json")
+
+
+def _read_session(driver_name: str) -> Union[Dict, None]:
+    """Reads the daemon session for a browser, None if there is no daemon running"""
+    path = _session_file(driver_name)
+    if not os.path.exists(path):
+        return None
+    try:
+        with open(path, "r") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        logging.warning(f"Session file {path} could not be read, ignoring it")
+        return None
+
+
+def attach_to_daemon(driver_name: str = "chrome", profile: Union[LaunchProfile, None] = None) -> Union[WebDriver, None]:
+    """Connects to the browser kept running by the daemon (see start_daemon())
+
+    Parameters
+    ----------
+    driver_name : str, optional
+        The name of the browser the daemon is running ("chrome", "edge" or "firefox"), by default "chrome"
+
+    profile : Union[LaunchProfile, None], optional
+        The launch profile the browser needs, by default None (any)
+
+    Returns
+    -------
+    Union[WebDriver, None]
+        The daemon's browser (quitting it only resets it), or None if no daemon is running for that browser or it was launched with another profile
+    """
+    session = _read_session(driver_name)
+    if not session:
+        return None
+    if profile is not None and parse_launch_profile(session.get("profile")) != profile:
+        logging.warning(f"Daemon for {driver_name} was started with a different launch profile ({session.get('profile')}), starting a new browser instead")
+        return None
+    try:
+        driver = _AttachedDriver(session["executor_url"], session["session_id"], session["browser_name"])
+        driver.current_url # Confirms the session is still alive
+        return instrument_driver(driver)
+    except Exception: # Connection errors come from urllib3 as well as selenium
+        logging.warning(f"Daemon for {driver_name} is not responding, starting a new browser instead")
+        return None
+
+
+@contextmanager
+def browser_session(driver_name: str = "chrome", attach: bool = True, profile: Union[LaunchProfile, None] = None) -> Iterator[WebDriver]:
+    """Provides a browser that is properly torn down afterwards, using the daemon's warm browser if one is running
+
+    Parameters
+    ----------
+    driver_name : str, optional
+        The name of the browser to use ("chrome", "edge" or "firefox"), by default "chrome"
+
+    attach : bool, optional
+        Whether to use the daemon's browser when it's running, by default True
+
+    profile : Union[LaunchProfile, None], optional
+        How to launch the browser, by default None (LaunchProfile()). The daemon's browser is only used if it was started with the same profile
+
+    Yields
+    ------
+    WebDriver
+        The browser, a daemon browser is reset afterwards and a new browser is quit
+
+    Examples
+    --------
+    ### Run a test without leaving a browser open
+    ```
+    from ez_visual_regression.api import assert_image_similarity_to_baseline
+    from ez_visual_regression.session import browser_session
+
+    with browser_session("chrome") as driver:
+        assert_image_similarity_to_baseline(driver, "https://canadiancoding.ca", "home")
+    ```
+    """
+    driver = attach_to_daemon(driver_name, profile or LaunchProfile()) if attach else None
+    if driver is None:
+        driver = instantiate_driver(driver_name, profile=profile)
+    try:
+        yield driver
+    finally:
+        try:
+            driver.quit()
+        except Exception:
+            logging.debug("Unable to quit driver")
+
+
+def serve(driver_name: str = "chrome", profile: Union[LaunchProfile, None] = None):
+    """Runs the daemon in the current process; starts a browser, writes it's session file, then keeps it alive until stopped
+
+    Parameters
+    ----------
+    driver_name : str, optional
+        The name of the browser to keep running ("chrome", "edge" or "firefox"), by default "chrome"
+
+    profile : Union[LaunchProfile, None], optional
+        How to launch the browser, by default None (LaunchProfile())
+    """
+    profile = profile or LaunchProfile()
+    driver = instantiate_driver(driver_name, profile=profile)
+    running = True
+
+    def stop(signum, frame):
+        nonlocal running
+        running = False
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+
+    os.makedirs(SESSION_DIRECTORY, exist_ok=True)
+    with open(_session_file(driver_name) + ".tmp", "w") as f:
+        json.dump({"executor_url": driver.service.service_url, "session_id": driver.session_id, "browser_name": driver.name, "profile": asdict(profile), "pid": os.getpid()}, f)
+    os.replace(_session_file(driver_name) + ".tmp", _session_file(driver_name)) # Attaching clients never see a partial file
+    try:
+        while running:
+            time.sleep(0.5)
+    finally:
+        if os.path.exists(_session_file(driver_name)):
+            os.remove(_session_file(driver_name))
+        try:
+            driver.quit()
+        except Exception:
+            logging.debug("Unable to quit daemon driver")
+
+
+def start_daemon(driver_name: str = "chrome", profile: Union[LaunchProfile, None] = None) -> Dict:
+    """Starts a background process that keeps a warm browser running for browser_session() (and the CLI) to attach to
+
+    Parameters
+    ----------
+    driver_name : str, optional
+        The name of the browser to keep running ("chrome", "edge" or "firefox"), by default "chrome"
+
+    profile : Union[LaunchProfile, None], optional
+        How to launch the browser, by default None (LaunchProfile()). Sessions asking for another profile start their own browser
+
+    Raises
+    ------
+    TimeoutError
+        If the browser did not start within DAEMON_START_TIMEOUT seconds
+
+    RuntimeError
+        If a daemon is already running the browser with another profile
+
+    Returns
+    -------
+    Dict
+        The daemon's session (executor_url, session_id, browser_name, profile and pid)
+
+    Notes
+    -----
+    - Only one test should use the daemon's browser at a time
+
+    Examples
+    --------
+    ### Keep chrome running between CLI invocations
+    ```
+    from ez_visual_regression.session import start_daemon, stop_daemon
+
+    start_daemon("chrome") # ezvr test ... now attaches instead of starting chrome
+    stop_daemon("chrome")
+    ```
+    """
+    profile = profile or LaunchProfile()
+    session = _read_session(driver_name)
+    if session:
+        if attach_to_daemon(driver_name):
+            if parse_launch_profile(session.get("profile")) != profile:
+                raise RuntimeError(f"Daemon for {driver_name} is already running with a different launch profile ({session.get('profile')}), stop it first")
+            return session
+        os.remove(_session_file(driver_name)) # Left behind by a daemon that didn't stop cleanly
+    os.makedirs(SESSION_DIRECTORY, exist_ok=True)
+    with open(os.path.join(SESSION_DIRECTORY, f"{driver_name}-daemon.log"), "w") as log:
+        subprocess.Popen([sys.executable, "-m", "ez_visual_regression.session", driver_name, json.dumps(asdict(profile))], stdin=subprocess.DEVNULL, stdout=log, stderr=log, start_new_session=True)
+    deadline = time.monotonic() + DAEMON_START_TIMEOUT
+    while time.monotonic() < deadline:
+        session = _read_session(driver_name)
+        if session and attach_to_daemon(driver_name):
+            return session
+        time.sleep(0.1)
+    raise TimeoutError(f"Daemon for {driver_name} did not start within {DAEMON_START_TIMEOUT} seconds")
+
+
+def stop_daemon(driver_name: str = "chrome") -> bool:
+    """Closes the daemon's browser and stops the daemon
+
+    Parameters
+    ----------
+    driver_name : str, optional
+        The name of the browser the daemon is running, by default "chrome"
+
+    Returns
+    -------
+    bool
+        True if a daemon was running, else False
+    """
+    session = _read_session(driver_name)
+    if not session:
+        return False
+    driver = attach_to_daemon(driver_name)
+    if driver: # Only signal the pid while the daemon is alive, a stale file's pid may belong to another process by now
+        try:
+            driver.end_session()
+        except WebDriverException:
+            logging.debug("Unable to end daemon session")
+        try:
+            os.kill(session["pid"], signal.SIGTERM)
+        except (OSError, KeyError):
+            logging.debug("Daemon process already stopped")
+    if os.path.exists(_session_file(driver_name)):
+        os.remove(_session_file(driver_name))
+    return True
+
+
+if __name__ == "__main__":
+    serve(sys.argv[1] if len(sys.argv) > 1 else "chrome", parse_launch_profile(json.loads(sys.argv[2])) if len(sys.argv) > 2 else None)
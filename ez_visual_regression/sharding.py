@@ -0,0 +1,200 @@
+# Standard lib dependencies
+import os                                                              # Path verification & modification
+import json                                                            # Used to read reports
+import logging                                                         # Enables logging
+import statistics                                                      # Used to estimate unknown durations
+from typing import Dict, List, Tuple, Union
+
+# Internal Dependencies
+from ez_visual_regression.configuration import group_by_page
+from ez_visual_regression.matrix import expand_matrix
+from ez_visual_regression.timing import PhaseTimings, build_report, write_report
+
+
+SHARD_REPORT_FILENAME = "ezvr-report-{index}-of-{count}.json"
+"""Where a shard's report is written if no report is set (formatted with the shard's index and count)"""
+
+DEFAULT_DURATION = 1.0
+"""The seconds a test is assumed to take if there are no recorded durations at all"""
+
+
+def parse_shard(shard: str) -> Tuple[int, int]:
+    """Parses a shard in the form INDEX/COUNT (i.e. 2/4 for the second of four shards)
+
+    Parameters
+    ----------
+    shard : str
+        The shard, indexes start at 1
+
+    Raises
+    ------
+    ValueError
+        If the shard is not in the form INDEX/COUNT, or the index is not between 1 and the count
+
+    Returns
+    -------
+    Tuple[int, int]
+        The index and count
+    """
+    try:
+        index, count = (int(part) for part in str(shard).split("/"))
+    except ValueError:
+        raise ValueError(f"Shard {shard} must be in the form INDEX/COUNT (i.e. 2/4)")
+    if not 1 <= index <= count:
+        raise ValueError(f"Shard index must be between 1 and {count}, got {index}")
+    return index, count
+
+
+def load_durations(path: Union[str, None]) -> Dict[str, float]:
+    """Reads how long each test and screenshot took from a timing report (see timing.write_report() and merge_reports())
+
+    Parameters
+    ----------
+    path : Union[str, None]
+        The report from a previous run, None (or a file that does not exist) for no durations
+
+    Returns
+    -------
+    Dict[str, float]
+        The seconds each test/screenshot took by it's folder (or filename)
+    """
+    if not path or not os.path.exists(path):
+        return {}
+    try:
+        with open(path, "r") as f:
+            report = json.load(f)
+    except (OSError, ValueError):
+        logging.warning(f"Timing report {path} could not be read, shards will be balanced by count")
+        return {}
+    return {test["name"]: float(test.get("total", 0)) for test in report.get("tests", [])}
+
+
+def shard_config(config: Dict[str, Union[str, List[List[Union[bool,None,int,str]]]]], index: int, count: int, durations: Union[Dict[str, float], None] = None) -> Dict[str, Union[str, List[List[Union[bool,None,int,str]]]]]:
+    """Narrows a parsed config down to the tests and screenshots for one shard, so a run can be split across machines
+
+    Every shard plans the same split; pages (see configuration.group_by_page()) are sorted from longest to shortest and each is given to the
+    shard with the least time so far, so a page is never loaded on more than one shard
+
+    Parameters
+    ----------
+    config : Dict[str, Union[str, List[List[Union[bool,None,int,str]]]]]
+        The parsed config (see configuration.parse_config())
+
+    index : int
+        Which shard to run, starting at 1
+
+    count : int
+        How many shards the run is split into
+
+    durations : Union[Dict[str, float], None], optional
+        The seconds each test/screenshot took in a previous run (see load_durations()), by default None (split by count). Ones
+        without a duration are assumed to take the median of the rest
+
+    Raises
+    ------
+    ValueError
+        If the shard does not exist, or the config is streamed (see configuration.stream_config(), every test is needed to plan the split)
+
+    Returns
+    -------
+    Dict[str, Union[str, List[List[Union[bool,None,int,str]]]]]
+        A copy of the config with only the shard's tests and screenshots, and the shard in config["shard"] (i.e. "2/4")
+
+    Examples
+    --------
+    ### Run the second of four shards, balanced by the last run's timings
+    ```
+    from ez_visual_regression.configuration import parse_config, execute_config
+    from ez_visual_regression.sharding import shard_config, load_durations
+
+    config = parse_config("config.yml")
+    config["report"] = "report-2.json"
+    execute_config(shard_config(config, 2, 4, load_durations("report.json")))
+    ```
+    """
+    parse_shard(f"{index}/{count}")
+    if config.get("stream") is not None:
+        raise ValueError("Streamed configs can't be sharded, parse them with parse_config() instead")
+    config = expand_matrix(config)
+    durations = durations or {}
+    known = list(durations.values())
+    default = statistics.median(known) if known else DEFAULT_DURATION
+    arguments = config["tests"] + config["screenshots"]
+    pages = [(sum(durations.get(entry[2][1], default) for entry in group), group) for group in group_by_page(config)]
+    loads = [0.0] * count
+    selected = []
+    for duration, group in sorted(pages, key=lambda page: (-page[0], page[1][0][0])): # Ties go by config order, so every shard agrees
+        shard = loads.index(min(loads))
+        loads[shard] += duration
+        if shard == index - 1:
+            selected += [entry[0] for entry in group]
+    selected.sort()
+    tests = [arguments[position] for position in selected if position < len(config["tests"])]
+    screenshots = [arguments[position] for position in selected if position >= len(config["tests"])]
+    logging.debug(f"Shard {index}/{count} has {len(selected)} of {len(arguments)} tests and screenshots, estimated at {loads[index - 1]:.2f}s")
+    sharded = {**config, "tests": tests, "screenshots": screenshots, "shard": f"{index}/{count}"}
+    if config.get("combinations"):
+        sharded["combinations"] = [config["combinations"][position] for position in selected]
+    return sharded
+
+
+def merge_reports(paths: List[str], output: Union[str, None] = None) -> Dict:
+    """Combines the reports of every shard of a run into one
+
+    Parameters
+    ----------
+    paths : List[str]
+        The report of each shard (see shard_config(), the shards have to be run with a report set)
+
+    output : Union[str, None], optional
+        Where to write the combined report, by default None (not written)
+
+    Raises
+    ------
+    ValueError
+        If a report isn't from a shard, the reports are from runs with different shard counts, or a shard is missing or repeated
+
+    Returns
+    -------
+    Dict
+        The combined report; the same keys as timing.write_report(), with elapsed as the slowest shard's, shards (the shard count),
+        results (every shard's results) and failures (the results with an error)
+
+    Examples
+    --------
+    ### Combine the reports of four shards
+    ```
+    import glob
+    from ez_visual_regression.sharding import merge_reports
+
+    report = merge_reports(glob.glob("ezvr-report-*-of-4.json"), "report.json") # Can be used to balance the next run
+    print(f"{len(report['failures'])} failed")
+    ```
+    """
+    reports = []
+    for path in paths:
+        with open(path, "r") as f:
+            report = json.load(f)
+        if not report.get("shard"):
+            raise ValueError(f"{path} is not the report of a shard")
+        reports.append((parse_shard(report["shard"]), report))
+    counts = {count for (_, count), _ in reports}
+    if not reports:
+        raise ValueError("No reports to merge")
+    if len(counts) != 1:
+        raise ValueError(f"Reports are from runs with different shard counts {sorted(counts)}")
+    count = counts.pop()
+    indexes = sorted(index for (index, _), _ in reports)
+    if indexes != list(range(1, count + 1)):
+        missing = sorted(set(range(1, count + 1)) - set(indexes))
+        raise ValueError(f"Shards {missing} are missing" if missing else f"Shards were repeated {indexes}")
+    timings, results = [], []
+    for _, report in sorted(reports, key=lambda item: item[0][0]):
+        for test in report.get("tests", []):
+            timings.append(PhaseTimings(test["name"], test.get("phases", {}), test.get("round_trips", 0), test.get("images", []), test.get("image_bytes", 0)))
+        results += report.get("results", [])
+    elapsed = max((report.get("elapsed") or 0 for _, report in reports), default=0)
+    failures = [result for result in results if result.get("error")]
+    if output:
+        write_report(output, timings, elapsed, shards=count, results=results, failures=failures)
+    return build_report(timings, elapsed, shards=count, results=results, failures=failures)
@@ -0,0 +1,278 @@
+# Standard lib dependencies
+import time                                                            # Used for deadlines and polling
+import logging                                                         # Enables logging
+from typing import Callable, Dict, List, Union
+
+# Third Party Dependencies
+from selenium.webdriver.remote.webdriver import WebDriver              # Used for type hinting
+from selenium.common.exceptions import WebDriverException              # Allows for error catching
+
+
+DEFAULT_WAIT_TIMEOUT = 10
+"""The default amount of seconds to wait for a page to become stable"""
+
+DEFAULT_WAIT_STRATEGIES = ["ready_state", "network_idle", "fonts", "animations", "dom_quiet"]
+"""The strategies used when none are specified (frames takes a screenshot per check, so it has to be asked for)"""
+
+POLL_INTERVAL = 0.05
+"""How long to wait (in seconds) between checks of a condition"""
+
+NETWORK_IDLE_PERIOD = 500
+"""How long (in milliseconds) there needs to be no fetch/XHR activity for the network to be considered idle"""
+
+DOM_QUIET_PERIOD = 300
+"""How long (in milliseconds) there needs to be no DOM mutations for the DOM to be considered quiet"""
+
+FRAME_INTERVAL = 0.1
+"""How long (in seconds) to wait between the frames that are compared in the frames strategy"""
+
+# Counts in-flight fetch/XHR requests, and records the time of the last DOM mutation
+MONITOR_SCRIPT = """(function(){
+    if (window.__ezvr) { return; }
+    var state = window.__ezvr = {pending: 0, lastRequest: Date.now(), lastMutation: Date.now()};
+    function started(){ state.pending++; state.lastRequest = Date.now(); }
+    function finished(){ state.pending = Math.max(0, state.pending - 1); state.lastRequest = Date.now(); }
+    if (window.fetch) {
+        var originalFetch = window.fetch;
+        window.fetch = function(){
+            started();
+            return originalFetch.apply(this, arguments).then(
+                function(response){ finished(); return response; },
+                function(error){ finished(); throw error; }
+            );
+        };
+    }
+    if (window.XMLHttpRequest) {
+        var originalSend = XMLHttpRequest.prototype.send;
+        XMLHttpRequest.prototype.send = function(){
+            started();
+            this.addEventListener("loadend", finished);
+            return originalSend.apply(this, arguments);
+        };
+    }
+    if (window.MutationObserver) {
+        new MutationObserver(function(){ state.lastMutation = Date.now(); }).observe(document, {subtree: true, childList: true, attributes: true, characterData: true});
+    }
+})();"""
+
+
+def poll(predicate: Callable[[], bool], deadline: float, interval: float = POLL_INTERVAL) -> bool:
+    """Repeatedly checks a predicate until it's True or the deadline passes
+
+    Parameters
+    ----------
+    predicate : Callable[[], bool]
+        The condition to check
+
+    deadline : float
+        The time.monotonic() value at which to give up
+
+    interval : float, optional
+        How long to sleep between checks, by default POLL_INTERVAL
+
+    Returns
+    -------
+    bool
+        True if the predicate was satisfied before the deadline, else False
+
+    Examples
+    --------
+    ### Wait up to 5 seconds for a spinner to disappear
+    ```
+    import time
+    from ez_visual_regression.stability import poll
+
+    poll(lambda: driver.execute_script("return !document.querySelector('.spinner')"), time.monotonic() + 5)
+    ```
+    """
+    while True:
+        if predicate():
+            return True
+        if time.monotonic() >= deadline:
+            return False
+        time.sleep(min(interval, max(0, deadline - time.monotonic())))
+
+
+def _ensure_monitor(driver: WebDriver):
+    """Injects the request/mutation monitor into the current page if it was not installed before navigation"""
+    driver.execute_script(MONITOR_SCRIPT)
+
+
+def wait_for_ready_state(driver: WebDriver, deadline: float) -> bool:
+    """Waits for document.readyState to be complete"""
+    return poll(lambda: driver.execute_script("return document.readyState") == "complete", deadline)
+
+
+def wait_for_network_idle(driver: WebDriver, deadline: float) -> bool:
+    """Waits for there to be no in-flight fetch/XHR requests for NETWORK_IDLE_PERIOD milliseconds"""
+    _ensure_monitor(driver)
+    script = f"var s = window.__ezvr; return s.pending === 0 && (Date.now() - s.lastRequest) >= {NETWORK_IDLE_PERIOD}"
+    return poll(lambda: driver.execute_script(script), deadline)
+
+
+def wait_for_fonts(driver: WebDriver, deadline: float) -> bool:
+    """Waits for all web fonts to finish loading (document.fonts.ready)"""
+    return poll(lambda: driver.execute_script("return !document.fonts || document.fonts.status === 'loaded'"), deadline)
+
+
+def wait_for_animations(driver: WebDriver, deadline: float) -> bool:
+    """Waits for all finite CSS animations and transitions to complete (infinite animations are ignored)"""
+    script = """if (!document.getAnimations) { return 0; }
+    return document.getAnimations().filter(function(animation){
+        return animation.playState === "running" && animation.effect && isFinite(animation.effect.getComputedTiming().endTime);
+    }).length"""
+    return poll(lambda: driver.execute_script(script) == 0, deadline)
+
+
+def wait_for_dom_quiet(driver: WebDriver, deadline: float) -> bool:
+    """Waits for there to be no DOM mutations for DOM_QUIET_PERIOD milliseconds"""
+    _ensure_monitor(driver)
+    script = f"return (Date.now() - window.__ezvr.lastMutation) >= {DOM_QUIET_PERIOD}"
+    return poll(lambda: driver.execute_script(script), deadline)
+
+
+def wait_for_identical_frames(driver: WebDriver, deadline: float) -> bool:
+    """Waits until two consecutive screenshots of the viewport are pixel-identical (catches canvas animations)"""
+    previous = driver.get_screenshot_as_png()
+    while time.monotonic() < deadline:
+        time.sleep(min(FRAME_INTERVAL, max(0, deadline - time.monotonic())))
+        current = driver.get_screenshot_as_png()
+        if current == previous:
+            return True
+        previous = current
+    return False
+
+
+def wait_fixed(driver: WebDriver, deadline: float) -> bool:
+    """Sleeps for 3 seconds (or until the deadline), the behaviour prior to the stability checks being added"""
+    time.sleep(max(0, min(3, deadline - time.monotonic())))
+    return True
+
+
+WAIT_STRATEGIES: Dict[str, Callable[[WebDriver, float], bool]] = {
+    "ready_state": wait_for_ready_state,
+    "network_idle": wait_for_network_idle,
+    "fonts": wait_for_fonts,
+    "animations": wait_for_animations,
+    "dom_quiet": wait_for_dom_quiet,
+    "frames": wait_for_identical_frames,
+    "sleep": wait_fixed,
+}
+"""The available strategies, each is called with a driver and a time.monotonic() deadline and returns if it succeeded"""
+
+
+def register_wait_strategy(name: str, strategy: Callable[[WebDriver, float], bool]):
+    """Adds a custom strategy that can then be referenced by name in wait lists
+
+    Parameters
+    ----------
+    name : str
+        The name to reference the strategy by (i.e. in a config file)
+
+    strategy : Callable[[WebDriver, float], bool]
+        A function that takes a driver and a time.monotonic() deadline, and returns True if the page became stable
+
+    Examples
+    --------
+    ### Wait for a spinner to disappear
+    ```
+    from ez_visual_regression.stability import register_wait_strategy, poll
+
+    def wait_for_spinner(driver, deadline):
+        return poll(lambda: driver.execute_script("return !document.querySelector('.spinner')"), deadline)
+
+    register_wait_strategy("spinner", wait_for_spinner)
+    ```
+    """
+    WAIT_STRATEGIES[name] = strategy
+
+
+def _resolve_strategies(strategies: Union[List[str], str, None]) -> List[str]:
+    """Normalizes a strategy list (None means the defaults, and a comma separated string is allowed)
+
+    Raises
+    ------
+    ValueError
+        If one of the strategies does not exist
+    """
+    if strategies is None:
+        return DEFAULT_WAIT_STRATEGIES
+    if isinstance(strategies, str):
+        strategies = [strategy.strip() for strategy in strategies.split(",") if strategy.strip()]
+    for strategy in strategies:
+        if strategy not in WAIT_STRATEGIES:
+            raise ValueError(f"Wait strategy not supported {strategy}, must be one of {list(WAIT_STRATEGIES)}")
+    return strategies
+
+
+def prepare_page_load(driver: WebDriver, strategies: Union[List[str], str, None] = None):
+    """Installs the request/mutation monitor before navigation so requests made while the page loads are counted
+
+    Parameters
+    ----------
+    driver : WebDriver
+        The browser that is about to navigate
+
+    strategies : Union[List[str], str, None], optional
+        The strategies that will be waited on, by default None (DEFAULT_WAIT_STRATEGIES)
+
+    Notes
+    -----
+    - Only chromium based browsers (chrome/edge) support this, other browsers have the monitor injected after load
+    """
+    strategies = _resolve_strategies(strategies)
+    if not ("network_idle" in strategies or "dom_quiet" in strategies):
+        return
+    if getattr(driver, "_ezvr_monitor_installed", False) or not hasattr(driver, "execute_cdp_cmd"):
+        return
+    try:
+        driver.execute_cdp_cmd("Page.addScriptToEvaluateOnNewDocument", {"source": MONITOR_SCRIPT})
+        driver._ezvr_monitor_installed = True
+    except WebDriverException:
+        logging.debug("Unable to install monitor before navigation, it will be injected after load")
+
+
+def wait_for_stability(driver: WebDriver, strategies: Union[List[str], str, None] = None, timeout: float = DEFAULT_WAIT_TIMEOUT) -> bool:
+    """Waits for the currently loaded page to be stable enough to screenshot
+
+    Parameters
+    ----------
+    driver : WebDriver
+        The browser with the page loaded
+
+    strategies : Union[List[str], str, None], optional
+        The names of the strategies to wait on in order (see WAIT_STRATEGIES), by default None (DEFAULT_WAIT_STRATEGIES)
+
+    timeout : float, optional
+        The maximum total time to wait in seconds, by default DEFAULT_WAIT_TIMEOUT
+
+    Raises
+    ------
+    ValueError
+        If one of the strategies does not exist
+
+    Returns
+    -------
+    bool
+        True if every strategy succeeded before the timeout, False if the timeout was hit (a warning is logged)
+
+    Examples
+    --------
+    ### Wait for the page to be loaded and fonts to be ready
+    ```
+    from ez_visual_regression.api import instantiate_driver
+    from ez_visual_regression.stability import wait_for_stability
+
+    driver = instantiate_driver("chrome")
+    driver.get("https://canadiancoding.ca")
+
+    wait_for_stability(driver, ["ready_state", "fonts"], timeout=5)
+    ```
+    """
+    strategies = _resolve_strategies(strategies)
+    deadline = time.monotonic() + timeout
+    for strategy in strategies:
+        if not WAIT_STRATEGIES[strategy](driver, deadline):
+            logging.warning(f"Page was not stable after {timeout} seconds (waiting on {strategy}), taking screenshot anyway")
+            return False
+    return True
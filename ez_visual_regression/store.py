@@ -0,0 +1,271 @@
+# Standard lib dependencies
+import os                                                              # Path verification & modification
+import glob                                                            # Used to find manifests and objects
+import json                                                            # Used to read/write manifests
+import hashlib                                                         # Used to address images by content
+import logging                                                         # Enables logging
+import threading                                                       # Used to guard manifest writes
+from typing import Dict, List, Union
+
+# Third Party Dependencies
+import numpy as np                                                     # Used to hold images in memory
+
+# Internal Dependencies
+from ez_visual_regression.comparison import encode_image
+
+
+STORE_PATH_VARIABLE = "EZVR_STORE"
+"""An environment variable that can be set to the folder of the shared baseline store"""
+
+DEFAULT_STORE_PATH = ".ezvr-store"
+"""The folder of the shared baseline store if no other is given (relative to the working directory)"""
+
+MANIFEST_FILENAME = ".ezvr-manifest.json"
+"""The name of the file in a test's folder that lists which stored images are it's baselines"""
+
+_manifest_lock = threading.Lock()
+
+
+def store_path(path: Union[str, None] = None) -> str:
+    """Gets the folder of the shared baseline store
+
+    Parameters
+    ----------
+    path : Union[str, None], optional
+        The folder to use, by default None (the EZVR_STORE environment variable, or DEFAULT_STORE_PATH)
+
+    Returns
+    -------
+    str
+        The absolute path to the store
+    """
+    return os.path.abspath(path or os.environ.get(STORE_PATH_VARIABLE) or DEFAULT_STORE_PATH)
+
+
+def object_path(store: str, digest: str) -> str:
+    """Gets where the image with a SHA-256 is kept in a store (objects/<first 2 characters>/<digest>.png)"""
+    return os.path.join(store, "objects", digest[:2], f"{digest}.png")
+
+
+def add_object(store: str, capture: Union[bytes, np.ndarray]) -> str:
+    """Adds an image to a store, images that are already stored aren't written again
+
+    Parameters
+    ----------
+    store : str
+        The folder of the store
+
+    capture : Union[bytes, np.ndarray]
+        PNG bytes (stored as-is) or an image (encoded with comparison.PNG_COMPRESSION)
+
+    Returns
+    -------
+    str
+        The SHA-256 of the stored PNG bytes
+    """
+    data = capture if isinstance(capture, bytes) else encode_image(capture)
+    digest = hashlib.sha256(data).hexdigest()
+    path = object_path(store, digest)
+    if not os.path.exists(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        temporary = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(temporary, "wb") as f:
+            f.write(data)
+        os.replace(temporary, path) # Other tests reading the store never see a partial image
+    return digest
+
+
+def read_object(store: str, digest: str) -> bytes:
+    """Reads an image from a store
+
+    Parameters
+    ----------
+    store : str
+        The folder of the store
+
+    digest : str
+        The SHA-256 of the image
+
+    Raises
+    ------
+    FileNotFoundError
+        If the image is not in the store
+
+    Returns
+    -------
+    bytes
+        The PNG bytes
+    """
+    path = object_path(store, digest)
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"Image {digest} is not in the baseline store {store}")
+    with open(path, "rb") as f:
+        return f.read()
+
+
+def read_manifest(folder: str) -> Dict:
+    """Reads a test's manifest
+
+    Parameters
+    ----------
+    folder : str
+        The test's folder
+
+    Returns
+    -------
+    Dict
+        The absolute path to the store (store, None if there's no manifest) and the SHA-256 of each baseline by it's filename (baselines)
+    """
+    path = os.path.join(folder, MANIFEST_FILENAME)
+    manifest = {"store": None, "baselines": {}}
+    if os.path.exists(path):
+        try:
+            with open(path, "r") as f:
+                manifest.update(json.load(f))
+        except (OSError, ValueError):
+            logging.warning(f"Baseline manifest {path} could not be read, ignoring it")
+        if manifest["store"]:
+            manifest["store"] = os.path.normpath(os.path.join(os.path.abspath(folder), manifest["store"]))
+    return manifest
+
+
+def link_baseline(folder: str, name: str, digest: str, store: Union[str, None] = None):
+    """Points a test's baseline at an image that's already in a store, only the test's manifest is written
+
+    Parameters
+    ----------
+    folder : str
+        The test's folder
+
+    name : str
+        The filename of the baseline (i.e. baseline.png)
+
+    digest : str
+        The SHA-256 of the image (see add_object())
+
+    store : Union[str, None], optional
+        The folder of the store, by default None (the one already in the manifest, or store_path())
+
+    Raises
+    ------
+    FileNotFoundError
+        If the image is not in the store
+
+    ValueError
+        If the test already has baselines in a different store
+    """
+    with _manifest_lock:
+        manifest = read_manifest(folder)
+        store = store_path(store or manifest["store"])
+        if not os.path.exists(object_path(store, digest)):
+            raise FileNotFoundError(f"Image {digest} is not in the baseline store {store}")
+        if manifest["store"] and os.path.normpath(manifest["store"]) != store and manifest["baselines"]:
+            raise ValueError(f"Baselines in {folder} are in the store {manifest['store']}, not {store}")
+        manifest["baselines"][name] = digest
+        try:
+            manifest["store"] = os.path.relpath(store, os.path.abspath(folder)) # The folders can be moved together
+        except ValueError: # Different drives on windows
+            manifest["store"] = store
+        os.makedirs(folder, exist_ok=True)
+        with open(os.path.join(folder, MANIFEST_FILENAME), "w") as f:
+            json.dump(manifest, f, indent=2, sort_keys=True)
+
+
+def store_baseline(folder: str, name: str, capture: Union[bytes, np.ndarray], store: Union[str, None] = None) -> str:
+    """Adds an image to a store and makes it a test's baseline
+
+    Parameters
+    ----------
+    folder : str
+        The test's folder
+
+    name : str
+        The filename of the baseline (i.e. baseline.png)
+
+    capture : Union[bytes, np.ndarray]
+        The PNG bytes or image to use as the baseline
+
+    store : Union[str, None], optional
+        The folder of the store, by default None (the one already in the manifest, or store_path())
+
+    Returns
+    -------
+    str
+        The SHA-256 of the stored image
+    """
+    digest = add_object(store_path(store or read_manifest(folder)["store"]), capture)
+    link_baseline(folder, name, digest, store)
+    return digest
+
+
+def approve_current(folders: List[str], store: Union[str, None] = None) -> Dict[str, int]:
+    """Makes the current images (current.png, current-<index>.png) in test folders their new baselines
+
+    Each distinct image is written to the store once, every other update is only a manifest rewrite. Baseline images in
+    the folders are deleted, since they're used before the manifest
+
+    Parameters
+    ----------
+    folders : List[str]
+        The test folders to update
+
+    store : Union[str, None], optional
+        The folder of the store, by default None (the one already in each manifest, or store_path())
+
+    Returns
+    -------
+    Dict[str, int]
+        How many baselines were updated (baselines) and how many of them needed a new image in the store (images)
+
+    Examples
+    --------
+    ### Accept a new header across every test
+    ```
+    import glob
+    from ez_visual_regression.store import approve_current
+
+    approve_current(glob.glob("visual_tests/*/")) # {"baselines": 400, "images": 1}
+    ```
+    """
+    counts = {"baselines": 0, "images": 0}
+    for folder in folders:
+        target = store_path(store or read_manifest(folder)["store"])
+        for path in sorted(glob.glob(os.path.join(folder, "current.png")) + glob.glob(os.path.join(folder, "current-*.png"))):
+            with open(path, "rb") as f:
+                data = f.read()
+            if not os.path.exists(object_path(target, hashlib.sha256(data).hexdigest())):
+                counts["images"] += 1
+            name = "baseline" + os.path.basename(path)[len("current"):]
+            link_baseline(folder, name, add_object(target, data), target)
+            if os.path.exists(os.path.join(folder, name)):
+                os.remove(os.path.join(folder, name))
+            counts["baselines"] += 1
+    return counts
+
+
+def collect_garbage(folders: List[str], store: Union[str, None] = None) -> int:
+    """Deletes the images in a store that none of the given tests use
+
+    Parameters
+    ----------
+    folders : List[str]
+        Every test folder that uses the store (images only they use are kept)
+
+    store : Union[str, None], optional
+        The folder of the store, by default None (store_path())
+
+    Returns
+    -------
+    int
+        How many images were deleted
+    """
+    store = store_path(store)
+    used = set()
+    for folder in folders:
+        used.update(read_manifest(folder)["baselines"].values())
+    removed = 0
+    for path in glob.glob(os.path.join(store, "objects", "*", "*.png")):
+        if os.path.basename(path)[:-len(".png")] not in used:
+            os.remove(path)
+            removed += 1
+    return removed
@@ -0,0 +1,287 @@
+# Standard lib dependencies
+import os                                                              # Path verification & modification
+import json                                                            # Used to write reports
+import time                                                            # Used to time phases
+import logging                                                         # Enables logging
+import threading                                                       # Used to track the current test per thread
+from contextlib import contextmanager                                  # Used to create phase() and track()
+from dataclasses import dataclass, field                               # Used for timing records
+from typing import Any, Callable, Dict, Iterator, List, Union
+
+# Third Party Dependencies
+from selenium.webdriver.remote.webdriver import WebDriver              # Used for type hinting
+
+
+PHASES = ["cache", "navigate", "wait", "screenshot", "ignored", "read", "compare", "write"]
+"""The phases that are timed; checking the cache, loading the page, waiting for it to be stable, taking screenshots,
+finding ignored elements, reading/decoding images, comparing them, and writing images to disk"""
+
+SLOWEST_COUNT = 5
+"""How many tests are listed in the summary at the end of a run"""
+
+_local = threading.local()
+_hooks: List[Callable[[str, str, Union["PhaseTimings", None], Union[float, None]], Any]] = []
+
+
+@dataclass
+class PhaseTimings:
+    """Where the time went for a test or screenshot
+
+    Attributes
+    ----------
+    name : str
+        What's being timed (i.e. the test's folder)
+
+    phases : Dict[str, float]
+        The seconds spent in each phase (see PHASES)
+
+    round_trips : int
+        How many commands were sent to the browser
+
+    images : List[List[int]]
+        The [width, height] of each capture
+
+    image_bytes : int
+        The size of the captured PNG's
+    """
+    name: str
+    phases: Dict[str, float] = field(default_factory=dict)
+    round_trips: int = 0
+    images: List[List[int]] = field(default_factory=list)
+    image_bytes: int = 0
+
+    @property
+    def total(self) -> float:
+        """The seconds spent in all phases"""
+        return sum(self.phases.values())
+
+    def as_dict(self) -> Dict:
+        """Converts the timings to a JSON serializable dictionary"""
+        return {"name": self.name, "total": round(self.total, 6), "phases": {name: round(seconds, 6) for name, seconds in self.phases.items()},
+                "round_trips": self.round_trips, "images": self.images, "image_bytes": self.image_bytes}
+
+
+def add_hook(hook: Callable[[str, str, Union[PhaseTimings, None], Union[float, None]], Any]):
+    """Registers a function to call at the start and end of every phase, used to plug in custom profilers
+
+    The hook is called as hook(event, phase, timings, seconds), event is "start" or "end", timings is the PhaseTimings
+    being tracked on the current thread (or None), and seconds is how long the phase took (None at the start).
+    Hooks run on the thread doing the work, so they need to be thread safe when tests run in parallel
+
+    Parameters
+    ----------
+    hook : Callable[[str, str, Union[PhaseTimings, None], Union[float, None]], Any]
+        The function to call
+
+    Examples
+    --------
+    ### Log every comparison that takes more than a second
+    ```
+    import logging
+    from ez_visual_regression.timing import add_hook
+
+    def slow_comparisons(event, phase, timings, seconds):
+        if event == "end" and phase == "compare" and seconds > 1:
+            logging.warning(f"Comparing {timings.name if timings else 'an image'} took {seconds:.2f}s")
+
+    add_hook(slow_comparisons)
+    ```
+    """
+    _hooks.append(hook)
+
+
+def remove_hook(hook: Callable[[str, str, Union[PhaseTimings, None], Union[float, None]], Any]):
+    """Unregisters a function registered with add_hook()"""
+    if hook in _hooks:
+        _hooks.remove(hook)
+
+
+def _call_hooks(event: str, name: str, timings: Union[PhaseTimings, None], seconds: Union[float, None]):
+    """Calls every hook, a broken profiler shouldn't fail the test"""
+    for hook in list(_hooks):
+        try:
+            hook(event, name, timings, seconds)
+        except Exception:
+            logging.exception(f"Timing hook {hook} failed")
+
+
+def current_timings() -> Union[PhaseTimings, None]:
+    """Gets the PhaseTimings being tracked on the current thread, None if nothing is being tracked"""
+    return getattr(_local, "timings", None)
+
+
+@contextmanager
+def track(timings: PhaseTimings) -> Iterator[PhaseTimings]:
+    """Records the phases run on the current thread into timings until the block exits
+
+    Parameters
+    ----------
+    timings : PhaseTimings
+        Where to record the phases, the same one can be tracked on multiple threads (i.e. capturing then comparing)
+
+    Yields
+    ------
+    PhaseTimings
+        The timings passed in
+
+    Examples
+    --------
+    ### Time a single test
+    ```
+    from ez_visual_regression.api import instantiate_driver, assert_image_similarity_to_baseline
+    from ez_visual_regression.timing import PhaseTimings, track
+
+    driver = instantiate_driver("chrome")
+    with track(PhaseTimings("home")) as timings:
+        assert_image_similarity_to_baseline(driver, "https://canadiancoding.ca", "home")
+    print(timings.phases) # i.e. {"navigate": 0.61, "wait": 0.12, "screenshot": 0.08, "read": 0.01, "compare": 0.19, "write": 0.05}
+    ```
+    """
+    previous = current_timings()
+    _local.timings = timings
+    try:
+        yield timings
+    finally:
+        _local.timings = previous
+
+
+@contextmanager
+def phase(name: str) -> Iterator[None]:
+    """Times the block as a phase of the test being tracked on the current thread (does nothing if there's no test or hooks)
+
+    Parameters
+    ----------
+    name : str
+        The name of the phase (see PHASES)
+    """
+    timings = current_timings()
+    if timings is None and not _hooks:
+        yield
+        return
+    _call_hooks("start", name, timings, None)
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        seconds = time.perf_counter() - start
+        if timings is not None:
+            timings.phases[name] = timings.phases.get(name, 0.0) + seconds
+        _call_hooks("end", name, timings, seconds)
+
+
+def record_image(capture: Any):
+    """Records the size of a capture (PNG bytes or an image) on the test being tracked on the current thread"""
+    timings = current_timings()
+    if timings is None:
+        return
+    if isinstance(capture, bytes):
+        timings.image_bytes += len(capture)
+        if capture[12:16] == b"IHDR": # The width and height are at the start of every PNG
+            timings.images.append([int.from_bytes(capture[16:20], "big"), int.from_bytes(capture[20:24], "big")])
+    else:
+        timings.images.append([int(capture.shape[1]), int(capture.shape[0])])
+
+
+def instrument_driver(driver: WebDriver) -> WebDriver:
+    """Counts every command a browser sends as a round trip of the test being tracked on the thread that sent it
+
+    Parameters
+    ----------
+    driver : WebDriver
+        The browser to count commands for (instantiate_driver() already does this)
+
+    Returns
+    -------
+    WebDriver
+        The same browser
+    """
+    if getattr(driver, "_ezvr_instrumented", False):
+        return driver
+    execute = driver.execute
+
+    def counted_execute(*args, **kwargs):
+        timings = current_timings()
+        if timings is not None:
+            timings.round_trips += 1
+        return execute(*args, **kwargs)
+    driver.execute = counted_execute
+    driver._ezvr_instrumented = True
+    return driver
+
+
+def summarize_timings(timings: List[PhaseTimings], count: int = SLOWEST_COUNT) -> str:
+    """Creates a summary of the slowest tests and the total time spent in each phase
+
+    Parameters
+    ----------
+    timings : List[PhaseTimings]
+        The timings of each test
+
+    count : int, optional
+        How many of the slowest tests to list, by default 5
+
+    Returns
+    -------
+    str
+        The summary to print
+    """
+    totals = {}
+    for test in timings:
+        for name, seconds in test.phases.items():
+            totals[name] = totals.get(name, 0.0) + seconds
+    lines = ["Time spent: " + (", ".join(f"{name} {totals[name]:.2f}s" for name in sorted(totals, key=totals.get, reverse=True)) or "nothing was timed")]
+    lines.append(f"Slowest {min(count, len(timings))}:")
+    for test in sorted(timings, key=lambda test: test.total, reverse=True)[:count]:
+        slowest_phase = max(test.phases, key=test.phases.get) if test.phases else "none"
+        lines.append(f"    {test.total:.2f}s {test.name} (mostly {slowest_phase}, {test.round_trips} browser round trips)")
+    return "\n".join(lines)
+
+
+def build_report(timings: List[PhaseTimings], elapsed: Union[float, None] = None, **details) -> Dict:
+    """Creates the JSON serializable report of a run (see write_report()), with the total time spent in each phase and every test's timings"""
+    totals = {}
+    for test in timings:
+        for name, seconds in test.phases.items():
+            totals[name] = round(totals.get(name, 0.0) + seconds, 6)
+    return {"elapsed": elapsed, **details, "phases": totals, "round_trips": sum(test.round_trips for test in timings),
+            "tests": [test.as_dict() for test in timings]}
+
+
+def write_report(path: str, timings: List[PhaseTimings], elapsed: Union[float, None] = None, **details):
+    """Writes the timings of a run as JSON
+
+    Parameters
+    ----------
+    path : str
+        The file to write the report to
+
+    timings : List[PhaseTimings]
+        The timings of each test
+
+    elapsed : Union[float, None], optional
+        How long the whole run took in seconds (phases overlap when running in parallel), by default None
+
+    **details
+        Any other (JSON serializable) information about the run, i.e. the number of workers
+
+    Examples
+    --------
+    ### Report on two tests
+    ```
+    from ez_visual_regression.api import instantiate_driver, assert_image_similarity_to_baseline
+    from ez_visual_regression.timing import PhaseTimings, track, write_report
+
+    driver = instantiate_driver("chrome")
+    timings = [PhaseTimings("home"), PhaseTimings("blog")]
+    with track(timings[0]):
+        assert_image_similarity_to_baseline(driver, "https://canadiancoding.ca", "home")
+    with track(timings[1]):
+        assert_image_similarity_to_baseline(driver, "https://kieranwood.ca", "blog")
+    write_report("timings.json", timings)
+    ```
+    """
+    report = build_report(timings, elapsed, **details)
+    if os.path.dirname(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w") as f:
+        json.dump(report, f, indent=2, default=float) # Differences can be numpy floats
@@ -45,6 +45,13 @@ def test(session):
     session.install('pytest')
     session.run('pytest')
 
+@nox.session
+def benchmark(session):
+    """Runs the benchmarks in tests/benchmark.py, results are stored in tests/benchmark_results and compared to the last run
+       (pass arguments after --, i.e. nox -s benchmark -- --no-browser --fail-on-regression)"""
+    session.install('.')
+    session.run('python', 'tests/benchmark.py', *session.posargs)
+
 @nox.session
 def docs(session):
     # Serve documentation to verify it's how you want
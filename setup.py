@@ -46,8 +46,10 @@ setuptools.setup(
        },
     install_requires = [
     "docopt",
-    "ez_img_diff",
-    "selenium",
+    "numpy",
+    "opencv-python",
+    "scikit-image",
+    "selenium>=4.10,<5", # session._AttachedDriver overrides WebDriver.start_session()
     "webdriver_manager",
     "pyyaml",
         ],
@@ -59,7 +61,6 @@ setuptools.setup(
                 ], 
         "CI": [
             "pytest",  # Used to run the test code in the tests directory
-            "pyvirtualdisplay"
         ]
 
     },
@@ -0,0 +1,258 @@
+"""Benchmarks for the capture and comparison hot paths
+
+Runs each benchmark on the pages in tests/example_sites and on generated large pages/images, then reports latency
+percentiles and throughput. Results are stored as JSON so every run is compared to the last run on the same machine.
+If ez_img_diff is installed the comparisons are also timed against it's compare_images() (the file based path used
+before 0.2.0) on 1080p and 4K captures, and the speedup of each is reported
+
+Usage:
+benchmark.py [-h] [--iterations N] [--warmup N] [--only names] [--no-browser] [--results folder] [--threshold percent] [--fail-on-regression]
+
+Options:
+    -h, --help            show this help message and exit
+    --iterations N        How many timed runs of each benchmark [default: 10]
+    --warmup N            How many untimed runs of each benchmark first (creates baselines, warms caches) [default: 2]
+    --only names          Comma separated benchmarks to run (i.e. compare_ssim,get_screenshot)
+    --no-browser          Only run the benchmarks that don't need a browser
+    --results folder      The folder to store results in [default: tests/benchmark_results]
+    --threshold percent   How much slower (in percent) the median can be than the last run before it's a regression [default: 20]
+    --fail-on-regression  Exit with code 1 if any benchmark regressed
+"""
+# Standard lib dependencies
+import io                                                              # Used to silence output while timing
+import os                                                              # Path verification & modification
+import sys                                                             # Used to exit with a status code
+import json                                                            # Used to read/write results
+import glob                                                            # Used to find earlier results
+import time                                                            # Used to time benchmarks
+import shutil                                                          # Used to copy example sites
+import platform                                                        # Used to identify the machine
+import tempfile                                                        # Used to hold baselines and generated pages
+import contextlib                                                      # Used to silence output while timing
+from datetime import datetime                                          # Used to name result files
+from typing import Callable, Dict, List, Tuple, Union
+
+# Third Party Dependencies
+import numpy as np                                                     # Used to calculate percentiles & generate images
+from docopt import docopt                                              # Handles CLI parsing
+
+# Internal Dependencies
+from ez_visual_regression import __version__
+from ez_visual_regression.api import instantiate_driver, get_screenshot, compare_multiple_elements, assert_image_similarity_to_baseline
+from ez_visual_regression.comparison import load_image, write_image, structural_difference, pixel_difference, bounded_difference, compare_image_arrays
+
+try: # Optional, only used to time the comparison path used before 0.2.0
+    from ez_img_diff.api import compare_images
+except ImportError:
+    compare_images = None
+from ez_visual_regression.timing import PhaseTimings, track
+
+
+EXAMPLES_FOLDER = os.path.join(os.path.dirname(__file__), "example_sites")
+
+LARGE_PAGE_CARDS = 400
+"""How many cards the generated large page has"""
+
+LARGE_IMAGE_SIZE = (4000, 1920)
+"""The (height, width) of the generated images for the comparison benchmarks"""
+
+CAPTURE_SIZES = {"1080p": (1080, 1920), "4k": (2160, 3840)}
+"""The (height, width) of the generated captures the in-memory comparisons are timed against ez_img_diff on"""
+
+
+def _large_page(folder: str) -> str:
+    """Generates a tall page with many elements to screenshot, returning the path to it"""
+    cards = "\n".join(f"""<div class="card" style="background: hsl({index * 37 % 360}, 60%, 80%)">
+    <h2>Card {index}</h2><p>{"Lorem ipsum dolor sit amet, consectetur adipiscing elit. " * 4}</p>
+</div>""" for index in range(LARGE_PAGE_CARDS))
+    path = os.path.join(folder, "index.html")
+    with open(path, "w") as f:
+        f.write(f"""<!DOCTYPE html>
+<html><head><style>
+body {{ font-family: sans-serif; margin: 0; display: grid; grid-template-columns: repeat(4, 1fr); gap: 8px; }}
+.card {{ padding: 12px; border-radius: 6px; }}
+</style></head><body>
+{cards}
+</body></html>""")
+    return path
+
+
+def _large_images(size: Tuple[int, int] = LARGE_IMAGE_SIZE) -> Tuple[np.ndarray, np.ndarray]:
+    """Generates a large gradient image (of (height, width) size) and a copy with a few changed blocks"""
+    height, width = size
+    y, x = np.mgrid[0:height, 0:width]
+    image = np.stack([(x * 255 // width), (y * 255 // height), ((x + y) % 256)], axis=-1).astype(np.uint8)
+    changed = image.copy()
+    for top in range(0, height, height // 8):
+        changed[top:top + 40, 100:400] = 255
+    return image, changed
+
+
+def _browser_benchmarks(driver, folder: str) -> Dict[str, Callable[[], object]]:
+    """Creates the benchmarks that need a browser, each one works in it's own copy of the example site"""
+    def site(name: str) -> str:
+        destination = os.path.join(folder, name)
+        shutil.copytree(os.path.join(EXAMPLES_FOLDER, name), destination)
+        return destination
+
+    element_site = site("no_difference")
+    page_site = site("full_page_new_no_diff")
+    large_site = os.path.join(folder, "large_page")
+    os.makedirs(large_site)
+    large_page = _large_page(large_site)
+    return {
+        "get_screenshot": lambda: get_screenshot(driver, os.path.join(page_site, "index.html"), os.path.join(folder, "screenshot.png")),
+        "get_screenshot_large_page": lambda: get_screenshot(driver, large_page, os.path.join(folder, "large.png")),
+        "assert_element": lambda: assert_image_similarity_to_baseline(driver, os.path.join(element_site, "index.html"), element_site, "#myChart"),
+        "assert_full_page": lambda: assert_image_similarity_to_baseline(driver, os.path.join(page_site, "index.html"), page_site),
+        "compare_multiple_elements_large_page": lambda: compare_multiple_elements(driver, large_page, large_site, ".card"),
+        "compare_multiple_elements_large_page_single_capture": lambda: compare_multiple_elements(driver, large_page, os.path.join(large_site, "single"), ".card", single_capture=True),
+    }
+
+
+def _comparison_benchmarks() -> Dict[str, Callable[[], object]]:
+    """Creates the benchmarks for the raw comparison step (no browser needed)"""
+    baseline = load_image(os.path.join(EXAMPLES_FOLDER, "full_page_small_difference", "baseline.png"))
+    current = load_image(os.path.join(EXAMPLES_FOLDER, "full_page_large_difference", "baseline.png"))
+    height, width = min(baseline.shape[0], current.shape[0]), min(baseline.shape[1], current.shape[1])
+    baseline, current = baseline[:height, :width], current[:height, :width]
+    large, large_changed = _large_images()
+    return {
+        "compare_ssim": lambda: structural_difference(baseline, current),
+        "compare_pixel": lambda: pixel_difference(baseline, current),
+        "compare_ssim_large": lambda: structural_difference(large, large_changed),
+        "compare_pixel_large": lambda: pixel_difference(large, large_changed),
+        "compare_fast_large": lambda: bounded_difference(large, large_changed, [10, 30], "pixel"),
+    }
+
+
+def _legacy_benchmarks(folder: str) -> Dict[str, Callable[[], object]]:
+    """Creates the benchmarks comparing the file based ez_img_diff path (write current.png, then compare_images() with diff and
+    thresh images) to the in-memory comparisons on CAPTURE_SIZES captures, empty if ez_img_diff isn't installed"""
+    if compare_images is None:
+        print("ez_img_diff is not installed, skipping the comparisons against it")
+        return {}
+    benchmarks = {}
+    for name, size in CAPTURE_SIZES.items():
+        baseline, current = _large_images(size)
+        paths = {image: os.path.join(folder, f"{name}-{image}.png") for image in ("baseline", "current", "diff", "thresh")}
+        write_image(paths["baseline"], baseline)
+        def legacy(current=current, paths=paths):
+            write_image(paths["current"], current)
+            return compare_images(paths["baseline"], paths["current"], paths["diff"], paths["thresh"])
+        benchmarks[f"legacy_ez_img_diff_{name}"] = legacy
+        benchmarks[f"compare_arrays_{name}"] = lambda baseline=baseline, current=current, paths=paths: compare_image_arrays(baseline, current, paths["diff"], paths["thresh"])
+        benchmarks[f"compare_pixel_{name}"] = lambda baseline=baseline, current=current: pixel_difference(baseline, current)
+    return benchmarks
+
+
+def speedups(benchmarks: Dict[str, Dict]) -> Dict[str, float]:
+    """Gets how many times faster (by median) each in-memory comparison is than the ez_img_diff path on the same captures"""
+    ratios = {}
+    for size in CAPTURE_SIZES:
+        legacy = benchmarks.get(f"legacy_ez_img_diff_{size}")
+        for name in (f"compare_arrays_{size}", f"compare_pixel_{size}"):
+            if legacy and name in benchmarks:
+                ratios[name] = round(legacy["p50"] / benchmarks[name]["p50"], 2)
+    return ratios
+
+
+def run_benchmark(benchmark: Callable[[], object], iterations: int, warmup: int) -> Dict[str, Union[int, float, Dict[str, float]]]:
+    """Times a benchmark, returning it's latency percentiles (in seconds), throughput (runs per second), and the mean time spent in each phase"""
+    with contextlib.redirect_stdout(io.StringIO()): # The API prints every file it creates
+        for _ in range(warmup):
+            benchmark()
+        latencies = []
+        phases = {}
+        for _ in range(iterations):
+            with track(PhaseTimings("benchmark")) as timings:
+                start = time.perf_counter()
+                benchmark()
+                latencies.append(time.perf_counter() - start)
+            for name, seconds in timings.phases.items():
+                phases[name] = phases.get(name, 0.0) + seconds / iterations
+    latencies = np.array(latencies)
+    return {
+        "iterations": iterations,
+        "mean": float(latencies.mean()),
+        "min": float(latencies.min()),
+        "p50": float(np.percentile(latencies, 50)),
+        "p90": float(np.percentile(latencies, 90)),
+        "p99": float(np.percentile(latencies, 99)),
+        "max": float(latencies.max()),
+        "throughput": float(iterations / latencies.sum()),
+        "phases": {name: round(seconds, 6) for name, seconds in phases.items()},
+    }
+
+
+def machine() -> Dict[str, Union[str, int, None]]:
+    """Identifies the machine, results are only compared to earlier results from the same one"""
+    return {"node": platform.node(), "system": platform.system(), "processor": platform.machine(), "cpus": os.cpu_count(), "python": platform.python_version()}
+
+
+def previous_results(results_folder: str) -> Union[Dict, None]:
+    """Gets the most recent stored results from this machine, None if there are none"""
+    for path in sorted(glob.glob(os.path.join(results_folder, "*.json")), reverse=True):
+        with open(path, "r") as f:
+            results = json.load(f)
+        if results.get("machine") == machine():
+            return results
+    return None
+
+
+def find_regressions(results: Dict, previous: Union[Dict, None], threshold: float) -> List[str]:
+    """Lists the benchmarks whose median is more than threshold percent slower than in previous"""
+    if not previous:
+        return []
+    regressions = []
+    for name, result in results["benchmarks"].items():
+        before = previous["benchmarks"].get(name)
+        if before and result["p50"] > before["p50"] * (1 + threshold / 100):
+            regressions.append(f"{name} p50 {before['p50'] * 1000:.1f}ms -> {result['p50'] * 1000:.1f}ms ({(result['p50'] / before['p50'] - 1) * 100:+.0f}%)")
+    return regressions
+
+
+def main():
+    args = docopt(__doc__)
+    iterations, warmup = int(args["--iterations"]), int(args["--warmup"])
+    only = args["--only"].split(",") if args["--only"] else None
+    results = {"created": datetime.now().isoformat(timespec="seconds"), "version": __version__, "machine": machine(), "benchmarks": {}}
+
+    def run(benchmarks: Dict[str, Callable[[], object]]):
+        for name, benchmark in benchmarks.items():
+            if only and name not in only:
+                continue
+            result = run_benchmark(benchmark, iterations, warmup)
+            results["benchmarks"][name] = result
+            print(f"{name:<52} p50 {result['p50'] * 1000:8.1f}ms  p90 {result['p90'] * 1000:8.1f}ms  p99 {result['p99'] * 1000:8.1f}ms  {result['throughput']:7.2f}/s")
+
+    run(_comparison_benchmarks())
+    with tempfile.TemporaryDirectory() as folder:
+        run(_legacy_benchmarks(folder))
+    results["speedups"] = speedups(results["benchmarks"])
+    for name, ratio in results["speedups"].items():
+        print(f"{name} is {ratio:.1f}x the speed of ez_img_diff.compare_images()")
+    if not args["--no-browser"]:
+        with tempfile.TemporaryDirectory() as folder:
+            driver = instantiate_driver("chrome")
+            try:
+                run(_browser_benchmarks(driver, folder))
+            finally:
+                driver.quit()
+
+    previous = previous_results(args["--results"])
+    os.makedirs(args["--results"], exist_ok=True)
+    path = os.path.join(args["--results"], f"{datetime.now().strftime('%Y%m%d-%H%M%S')}.json")
+    with open(path, "w") as f:
+        json.dump(results, f, indent=2)
+    print(f"Results saved to {path}")
+
+    regressions = find_regressions(results, previous, float(args["--threshold"]))
+    for regression in regressions:
+        print(f"Regression: {regression}")
+    if regressions and args["--fail-on-regression"]:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,32 +1,45 @@
 import os
+import json
+import hashlib
 
+import cv2
 import pytest
+import numpy as np
 from selenium.webdriver.remote.webdriver import WebDriver
 
 ## Regression testing
 from ez_visual_regression.api import *
+from ez_visual_regression.api import _compare_to_baseline, _compare_elements
 from ez_visual_regression.configuration import *
+from ez_visual_regression.stability import wait_for_stability
+from ez_visual_regression.cache import local_page_dependencies, compute_cache_key, CACHE_FILENAME
+from ez_visual_regression.comparison import decode_image, encode_image, write_image, load_image, compare_image_arrays, pixel_difference, bounded_difference, mask_regions, structural_difference, tiled_difference, _image_strips
+from ez_visual_regression.baselines import read_baseline_metadata, write_baseline_metadata, baseline_index_entry, classify_capture
+from ez_visual_regression import session
+from ez_visual_regression.session import reset_browser
+from ez_visual_regression import drivers
+from ez_visual_regression import configuration
+from ez_visual_regression import timing
+from ez_visual_regression import comparison
+from ez_visual_regression.fullpage import capture_full_page, PAGE_SIZE_SCRIPT
+from ez_visual_regression.pack import PACK_FILENAME, packed_baselines, read_packed, add_to_pack, pack_baselines, compact_pack
+from ez_visual_regression.store import read_manifest, object_path, approve_current, collect_garbage
+from ez_visual_regression.matrix import parse_matrix, expand_matrix, resize_viewport
+from ez_visual_regression.sharding import shard_config, load_durations, merge_reports
+from ez_visual_regression.selection import loaded_dependencies, record_dependencies, changed_dependencies, select_changed_tests, settings_digest
+from ez_visual_regression.async_api import BrowserPool, async_assert_image_similarity_to_baseline
+from ez_visual_regression.baselines import METADATA_FILENAME
+from ez_visual_regression.selection import DEPENDENCIES_FILENAME
 
 def setup_driver() -> WebDriver:
-    if os.getenv("GITHUB_ACTIONS") == "true": # Give headless chrome head ;)
-        from selenium import webdriver
-        from webdriver_manager.chrome import ChromeDriverManager               # Manages webdriver install
-        from selenium.webdriver.chrome.service import Service as ChromeService # Helps instantiate browser
-        from pyvirtualdisplay import Display
-        display = Display(visible=0, size=(800, 800))  
-        display.start()
-
-        chrome_options = webdriver.ChromeOptions()    
-        # Add your options as needed    
-        options = [
-        # Define window size here
-        "--window-size=1200,1200",
-            "--ignore-certificate-errors"]
-        for option in options:
-            chrome_options.add_argument(option)
-        return webdriver.Chrome(options = chrome_options, service=ChromeService(ChromeDriverManager().install()))
-    else:
-        return instantiate_driver("chrome")   
+    return instantiate_driver("chrome") # Headless by default, so no display is needed in CI
+
+def remove_generated(*folders: str):
+    """Removes the baseline index, dependency map and cache written next to baselines"""
+    for folder in folders:
+        for filename in [METADATA_FILENAME, DEPENDENCIES_FILENAME, CACHE_FILENAME]:
+            if os.path.exists(os.path.join(folder, filename)):
+                os.remove(os.path.join(folder, filename))
 
 
 def test_element_diff():
@@ -86,6 +99,7 @@ def test_element_diff():
         os.remove(os.path.join(large_difference_folder, "thresh.png"))
     finally:
         driver.close()
+        remove_generated(*[os.path.join(examples_folder, name) for name in ["new_setup", "no_difference", "small_difference", "large_difference"]])
 
 def test_full_page_diff():
     driver = setup_driver()
@@ -144,13 +158,580 @@ def test_full_page_diff():
         os.remove(os.path.join(large_difference_folder, "thresh.png"))
     finally:
         driver.close()
+        remove_generated(*[os.path.join(examples_folder, name) for name in ["full_page_new", "full_page_new_no_diff", "full_page_small_difference", "full_page_large_difference"]])
     
+def test_wait_for_stability():
+    driver = setup_driver()
+
+    examples_folder = os.path.join(os.path.dirname(__file__), "example_sites")
+    try:
+        driver.get("file:///" + os.path.abspath(os.path.join(examples_folder, "no_difference", "index.html")).replace("\\","/"))
+        assert wait_for_stability(driver, ["ready_state", "network_idle", "fonts", "animations", "dom_quiet", "frames"], 10)
+        with pytest.raises(ValueError):
+            wait_for_stability(driver, ["not_a_strategy"])
+    finally:
+        driver.close()
+
+def test_cache():
+    driver = setup_driver()
+
+    no_difference_folder = os.path.join(os.path.dirname(__file__), "example_sites", "no_difference")
+    page = os.path.join(no_difference_folder, "index.html")
+    assert local_page_dependencies(page) == sorted(os.path.normpath(os.path.join(no_difference_folder, name)) for name in ["index.html", "dashboard.css", "dashboard.js"])
+    try:
+        diff = assert_image_similarity_to_baseline(driver, page, locator="#myChart", folder=no_difference_folder, cache=True)
+        assert os.path.exists(os.path.join(no_difference_folder, CACHE_FILENAME))
+        os.remove(os.path.join(no_difference_folder, "current.png"))
+
+        # Unchanged inputs should skip the capture entirely
+        assert assert_image_similarity_to_baseline(driver, page, locator="#myChart", folder=no_difference_folder, cache=True) == diff
+        assert not os.path.exists(os.path.join(no_difference_folder, "current.png"))
+
+        # Changing the locator invalidates the cache
+        identity = {"browser": "chrome", "viewport": [1200, 1200]}
+        assert compute_cache_key(identity, "page", no_difference_folder, "main", None, False) != compute_cache_key(identity, "page", no_difference_folder, "#myChart", None, False)
+    finally:
+        driver.close()
+        for filename in ["current.png", "diff.png", "thresh.png"]:
+            if os.path.exists(os.path.join(no_difference_folder, filename)):
+                os.remove(os.path.join(no_difference_folder, filename))
+        remove_generated(no_difference_folder)
+
+def test_artifacts_on_failure():
+    driver = setup_driver()
+
+    examples_folder = os.path.join(os.path.dirname(__file__), "example_sites")
+    try:
+        # Passing tests don't write anything
+        no_difference_folder = os.path.join(examples_folder, "no_difference")
+        diff = assert_image_similarity_to_baseline(driver, os.path.join(no_difference_folder, "index.html"), locator="#myChart", folder=no_difference_folder, artifacts="failure")
+        assert .01> diff
+        assert not os.path.exists(os.path.join(no_difference_folder, "current.png"))
+        assert not os.path.exists(os.path.join(no_difference_folder, "diff.png"))
+        assert not os.path.exists(os.path.join(no_difference_folder, "thresh.png"))
+
+        # Failing tests write everything
+        large_difference_folder = os.path.join(examples_folder, "large_difference")
+        with pytest.raises(AssertionError):
+            assert_image_similarity_to_baseline(driver, os.path.join(large_difference_folder, "index.html"), locator="#myChart", folder=large_difference_folder, artifacts="failure")
+        for filename in ["current.png", "diff.png", "thresh.png"]:
+            assert os.path.exists(os.path.join(large_difference_folder, filename))
+            os.remove(os.path.join(large_difference_folder, filename))
+
+        with pytest.raises(ValueError):
+            assert_image_similarity_to_baseline(driver, os.path.join(no_difference_folder, "index.html"), folder=no_difference_folder, artifacts="sometimes")
+    finally:
+        driver.close()
+        remove_generated(os.path.join(examples_folder, "no_difference"), os.path.join(examples_folder, "large_difference"))
+
+def test_compare_image_arrays():
+    examples_folder = os.path.join(os.path.dirname(__file__), "example_sites")
+    baseline = load_image(os.path.join(examples_folder, "no_difference", "baseline.png"))
+    with open(os.path.join(examples_folder, "large_difference", "baseline.png"), "rb") as f:
+        current = decode_image(f.read())
+
+    assert compare_image_arrays(baseline, baseline) == 0
+    assert compare_image_arrays(baseline, current) == 1.287 # Same as ez_img_diff.api.compare_images()
+    assert load_image(os.path.join(examples_folder, "no_difference", "baseline.png")) is baseline # Decoded baselines are kept in memory
+
+def test_multielement_single_capture():
+    driver = setup_driver()
+
+    new_setup_folder = os.path.join(os.path.dirname(__file__), "example_sites", "new_setup")
+    try:
+        # Creates baselines, then compares against them from a single page screenshot
+        diffs = assert_image_similarity_to_baseline(driver, os.path.join(new_setup_folder, "index.html"), new_setup_folder, ".nav-link", multielements=True, single_capture=True)
+        assert len(diffs) == len(driver.find_elements(By.CSS_SELECTOR, ".nav-link"))
+        diffs = assert_image_similarity_to_baseline(driver, os.path.join(new_setup_folder, "index.html"), new_setup_folder, ".nav-link", multielements=True, single_capture=True)
+        assert all(.01 > diff for diff in diffs)
+        for index in range(len(diffs)):
+            for name in ["baseline", "current", "diff", "thresh"]:
+                assert os.path.exists(os.path.join(new_setup_folder, f"{name}-{index}.png"))
+    finally:
+        driver.close()
+        for filename in os.listdir(new_setup_folder):
+            if filename.endswith(".png"):
+                os.remove(os.path.join(new_setup_folder, filename))
+        remove_generated(new_setup_folder)
+
+def test_pixel_difference():
+    examples_folder = os.path.join(os.path.dirname(__file__), "example_sites")
+    baseline = load_image(os.path.join(examples_folder, "no_difference", "baseline.png"))
+    current = load_image(os.path.join(examples_folder, "large_difference", "baseline.png"))
+
+    result = pixel_difference(baseline, baseline)
+    assert result.difference == 0 and result.changed_pixels == 0 and result.boxes == []
+
+    result = pixel_difference(baseline, current)
+    assert result.total_pixels == baseline.shape[0] * baseline.shape[1]
+    assert 0 < result.difference < 100
+    assert result.changed_pixels == result.mask.sum()
+    for x, y, w, h in result.boxes: # Every changed pixel is in a box
+        result.mask[y:y+h, x:x+w] = False
+    assert not result.mask.any()
+
+    # A higher tolerance can only ignore more pixels
+    assert pixel_difference(baseline, current, tolerance=128).changed_pixels <= pixel_difference(baseline, current).changed_pixels
+
+    # Dark anti-aliased pixels aren't counted with a tolerance (the filtered neighbourhood can't wrap around below 0)
+    board = (np.indices((64, 64)).sum(axis=0) % 2 * 10).astype(np.uint8)
+    assert pixel_difference(np.dstack([board] * 3), np.dstack([10 - board] * 3), tolerance=2).changed_pixels == 0
+
+    # Area that is only in one image counts as changed
+    height = baseline.shape[0]
+    assert pixel_difference(baseline, baseline[:height // 2]).difference == round((height - height // 2) / height * 100, 3)
+
+def test_bounded_difference():
+    examples_folder = os.path.join(os.path.dirname(__file__), "example_sites")
+    baseline = load_image(os.path.join(examples_folder, "no_difference", "baseline.png"))
+    current = load_image(os.path.join(examples_folder, "large_difference", "baseline.png"))
+
+    assert bounded_difference(baseline, baseline.copy(), [10, 30]) == (0, True)
+
+    # With no thresholds to decide on the whole image is compared
+    assert bounded_difference(baseline, current, [], band_height=32) == (compare_image_arrays(baseline, current), True)
+    assert bounded_difference(baseline, current, [], "pixel", band_height=32) == (pixel_difference(baseline, current).difference, True)
+
+    # Stops once the difference is known to be over the threshold
+    difference, exact = bounded_difference(baseline, current, [0.5], "pixel", band_height=32)
+    assert not exact and 0.5 < difference <= pixel_difference(baseline, current).difference
+
+def test_reset_browser():
+    driver = setup_driver()
+
+    try:
+        load_page(driver, os.path.join(os.path.dirname(__file__), "example_sites", "no_difference", "index.html"))
+        assert driver._ezvr_loaded_url.startswith("file:///")
+        reset_browser(driver)
+        assert driver.current_url == "about:blank"
+        assert driver._ezvr_loaded_url is None
+    finally:
+        driver.close()
+
+def test_async_api():
+    import asyncio
+    examples_folder = os.path.join(os.path.dirname(__file__), "example_sites")
+
+    async def run():
+        async with BrowserPool("chrome", size=2) as pool:
+            return await asyncio.gather(*[
+                async_assert_image_similarity_to_baseline(pool, os.path.join(examples_folder, name, "index.html"), os.path.join(examples_folder, name), "#myChart", artifacts="none")
+                for name in ["no_difference", "small_difference"]
+            ])
+
+    try:
+        no_difference, small_difference = asyncio.run(run())
+    finally:
+        remove_generated(*[os.path.join(examples_folder, name) for name in ["no_difference", "small_difference"]])
+    assert .01 > no_difference
+    assert 30 > small_difference > 10 # The same as test_element_diff(), artifacts don't change the difference
+
+def test_mask_regions(tmp_path):
+    examples_folder = os.path.join(os.path.dirname(__file__), "example_sites")
+    baseline = load_image(os.path.join(examples_folder, "no_difference", "baseline.png"))
+    current = load_image(os.path.join(examples_folder, "large_difference", "baseline.png"))
+
+    # Blanking out everything that changed in both images makes them identical
+    boxes = pixel_difference(baseline, current).boxes
+    assert pixel_difference(mask_regions(baseline, boxes), mask_regions(current, boxes)).difference == 0
+    assert mask_regions(baseline, []) is baseline
+    assert pixel_difference(baseline, load_image(os.path.join(examples_folder, "no_difference", "baseline.png"))).difference == 0 # Original is untouched
+
+    # Regions recorded with the baseline are used when comparing
+    write_image(str(tmp_path / "baseline.png"), baseline)
+    write_baseline_metadata(str(tmp_path), "baseline.png", ignored=[list(box) for box in boxes])
+    assert read_baseline_metadata(str(tmp_path), "baseline.png") == {"ignored": [list(box) for box in boxes]}
+    assert _compare_to_baseline(current, str(tmp_path), artifacts="none", method="pixel") == 0
+
+def test_tiled_difference(tmp_path, monkeypatch):
+    examples_folder = os.path.join(os.path.dirname(__file__), "example_sites")
+    baseline = load_image(os.path.join(examples_folder, "no_difference", "baseline.png"))
+    current = load_image(os.path.join(examples_folder, "large_difference", "baseline.png"))
+
+    # Tiling gives the same difference as comparing the whole image
+    for tile_size in [64, 100, 1024]:
+        assert tiled_difference(baseline, current, "ssim", tile_size=tile_size).difference == structural_difference(baseline, current)[0]
+        assert tiled_difference(baseline, current, "pixel", tile_size=tile_size).difference == pixel_difference(baseline, current).difference
+    assert tiled_difference(baseline, baseline).changed_tiles == []
+
+    # Only the tiles with changes are reported
+    changed = baseline.copy()
+    changed[300:310, 700:720] = 0
+    result = tiled_difference(baseline, changed, "pixel", tile_size=128)
+    assert [tile[:4] for tile in result.changed_tiles] == [(640, 256, 128, 128)]
+    assert result.tiles == 4 * 8
+
+    # PNG's are decoded a strip at a time, and masked the same as whole images
+    png = encode_image(changed)
+    assert np.array_equal(np.concatenate(list(_image_strips(png, 100))), changed)
+    regions = [(0, 250, 200, 100)]
+    result = tiled_difference(encode_image(baseline), png, "pixel", tile_size=128, regions=regions)
+    assert result.difference == pixel_difference(mask_regions(baseline, regions), mask_regions(changed, regions)).difference
+    assert [tile[:4] for tile in result.changed_tiles] == [(640, 256, 128, 128)]
+
+    _compare_to_baseline(baseline, str(tmp_path), tiled=True)
+    assert _compare_to_baseline(changed, str(tmp_path), method="pixel", tiled=True) == pixel_difference(baseline, changed).difference
+    with open(tmp_path / "tiles.json") as f:
+        assert len(json.load(f)["changed_tiles"]) == 1
+
+    # Long pages get scaled down diff and thresh images
+    monkeypatch.setattr(comparison, "TILE_OVERVIEW_PIXELS", baseline.shape[0] * baseline.shape[1] // 4)
+    _compare_to_baseline(png, str(tmp_path), tiled=True)
+    assert load_image(str(tmp_path / "thresh.png")).shape[:2] == (baseline.shape[0] // 2, baseline.shape[1] // 2)
+
+def test_full_page_stitching():
+    examples_folder = os.path.join(os.path.dirname(__file__), "example_sites")
+    page = load_image(os.path.join(examples_folder, "full_page_new_no_diff", "baseline.png"))
+    viewport_height = page.shape[0] // 3 + 7 # The last strip has to be clamped
+
+    class ScrollingDriver: # Only has viewport screenshots, so the page gets stitched
+        scrolled = 0
+        def execute_script(self, script, *args):
+            if script == PAGE_SIZE_SCRIPT:
+                return {"width": page.shape[1], "height": page.shape[0], "viewport_height": viewport_height, "scale": 1}
+            self.scrolled = max(0, min(args[0], page.shape[0] - viewport_height))
+            return self.scrolled
+        def get_screenshot_as_png(self):
+            return cv2.imencode(".png", page[self.scrolled:self.scrolled + viewport_height])[1].tobytes()
+
+    driver = ScrollingDriver()
+    stitched = capture_full_page(driver)
+    assert isinstance(stitched, np.ndarray)
+    assert np.array_equal(stitched, page)
+    assert driver.scrolled == 0
+
+def test_changed_only(tmp_path):
+    site = tmp_path / "site"
+    site.mkdir()
+    (site / "index.html").write_text('<link rel="stylesheet" href="style.css"><img src="logo.png">')
+    (site / "style.css").write_text("body { color: red; }")
+    (site / "logo.png").write_bytes(b"logo")
+    (site / "font.woff2").write_bytes(b"font")
+    page, folder = str(site / "index.html"), str(tmp_path / "home")
+    url = "file:///" + page
+
+    class LoadedDriver: # The font is only found through the performance entries
+        _ezvr_loaded_url = url
+        def execute_script(self, script):
+            return [url, "file:///" + str(site / "font.woff2")]
+
+    files = loaded_dependencies(LoadedDriver(), url)
+    assert [os.path.basename(path) for path in files] == ["font.woff2", "index.html", "logo.png", "style.css"]
+    assert loaded_dependencies(None, "https://canadiancoding.ca") is None
+
+    test = ConfigTest(page, folder)
+    config = {"tests": [test, ["https://canadiancoding.ca", str(tmp_path / "remote")]], "screenshots": []}
+    assert changed_dependencies(folder, page) is None # Never passed
+    record_dependencies(folder, page, files, settings_digest(test, {"method": "ssim"}))
+    assert changed_dependencies(folder, page) == []
+    assert select_changed_tests(config, options={"method": "ssim"})["tests"] == [["https://canadiancoding.ca", str(tmp_path / "remote")]]
+
+    # Changing the test's settings or the run's options runs it again
+    assert len(select_changed_tests(config, options={"method": "pixel"})["tests"]) == 2
+    assert len(select_changed_tests({**config, "tests": [test._replace(error_threshold=5)]}, options={"method": "ssim"})["tests"]) == 1
+
+    os.utime(site / "style.css", ns=(1, 1)) # Touched but not changed
+    assert changed_dependencies(folder, page) == []
+    (site / "font.woff2").write_bytes(b"new font")
+    assert changed_dependencies(folder, page) == [os.path.realpath(site / "font.woff2")]
+    assert len(select_changed_tests(config, options={"method": "ssim"})["tests"]) == 2
+    assert changed_dependencies(folder, page, {os.path.realpath(site / "logo.png")}) == [os.path.realpath(site / "logo.png")]
+
+def test_matrix(tmp_path):
+    config_path = tmp_path / "config.yml"
+    config_path.write_text("matrix:\n  browsers: [chrome, firefox]\n  viewports: [1280x800, 375x667]\n"
+                           "tests:\n  home:\n    url: index.html\n  nav:\n    url: index.html\n    locator: nav\n"
+                           "screenshots:\n  hero:\n    url: index.html\n")
+    config = parse_config(str(config_path))
+    assert [combination.name for combination in config["matrix"]] == ["chrome-1280x800@1x", "chrome-375x667@1x", "firefox-1280x800@1x", "firefox-375x667@1x"]
+    with pytest.raises(ValueError):
+        parse_matrix({"devices": ["iphone"]})
+
+    # Every test and screenshot gets a folder per combination
+    expanded = expand_matrix(config)
+    assert len(expanded["tests"]) == 8 and len(expanded["screenshots"]) == 4 and len(expanded["combinations"]) == 12
+    assert expanded["tests"][1][1] == os.path.join("home", "chrome-375x667@1x")
+    assert expanded["screenshots"][0][1] == os.path.join("hero", "chrome-1280x800@1x", "screenshot.png")
+
+    # One load per page and browser, with each viewport captured together
+    groups = group_by_page(expanded)
+    assert len(groups) == 2
+    assert [expanded["combinations"][index].viewport for index, _, _ in groups[0]] == [(1280, 800)] * 3 + [(375, 667)] * 3
+    assert {expanded["combinations"][index].browser for index, _, _ in groups[1]} == {"firefox"}
+
+    class ResizingDriver:
+        sizes = []
+        def set_window_size(self, width, height):
+            self.sizes.append((width, height))
+    driver = ResizingDriver()
+    assert resize_viewport(driver, (375, 667), restabilize=False)
+    assert not resize_viewport(driver, (375, 667), restabilize=False)
+    assert driver.sizes == [(375, 667)]
+
+def test_stream_config(tmp_path, monkeypatch):
+    lines = [{"workers": 2}] + [{"url": f"https://example.com/{index // 2}", "name": str(tmp_path / f"test-{index}")} for index in range(6)]
+    lines.append({"url": "https://example.com/0", "name": str(tmp_path / "hero"), "type": "screenshot"})
+    config_path = tmp_path / "urls.jsonl"
+    config_path.write_text("\n".join(json.dumps(line) for line in lines))
+    config = stream_config(str(config_path))
+    assert config["workers"] == 2 and config["tests"] == [] and config["screenshots"] == []
+    kind, test = next(config["stream"])
+    assert kind == "test" and test == ConfigTest("https://example.com/0", str(tmp_path / "test-0"))
+    url, folder, locator, warning_threshold, error_threshold, ignored_elements, multielements, wait, wait_timeout = test
+    assert (locator, warning_threshold, wait_timeout) == (False, 10, 10)
+
+    yaml_path = tmp_path / "config.yml"
+    yaml_path.write_text("driver: firefox\n---\nurl: https://example.com\nname: home\n---\nscreenshots:\n  hero:\n    url: https://example.com\n")
+    config = stream_config(str(yaml_path))
+    assert config["driver"] == "firefox"
+    assert list(config["stream"]) == [("test", ConfigTest("https://example.com", "home")), ("screenshot", ConfigScreenshot("https://example.com", os.path.join("hero", "screenshot.png")))]
+
+    # Pages in a chunk are still only loaded once, and results come back in file order
+    class FakeDriver:
+        _ezvr_loaded_url = None
+        def execute_script(self, *args): pass
+        def delete_all_cookies(self): pass
+        def get(self, url): pass
+        def quit(self): pass
+    loads = []
+    def capture(driver, url, *args):
+        if args[-2]: # navigate
+            loads.append(url)
+        driver._ezvr_loaded_url = url
+        return url
+    monkeypatch.setattr(configuration, "instantiate_driver", lambda *args: FakeDriver())
+    monkeypatch.setattr(configuration, "capture_test", capture)
+    monkeypatch.setattr(configuration, "capture_screenshot", lambda *args: (capture(*args),))
+    monkeypatch.setattr(configuration, "compare_capture", lambda *args: 0)
+    monkeypatch.setattr(configuration, "write_screenshot", lambda *args: None)
+    results = execute_config(stream_config(str(config_path)))
+    assert [result["output"] for result in results] == [line["name"] for line in lines[1:-1]] + [str(tmp_path / "hero" / "screenshot.png")]
+    assert sorted(loads) == [f"https://example.com/{page}" for page in range(3)]
+
+def test_sharding(tmp_path):
+    config = {"tests": [[f"https://example.com/{page}", f"page-{page}", locator, 10, 30, None, False, None, 10] for page in range(6) for locator in (False, "nav")],
+              "screenshots": [["https://example.com/0", os.path.join("hero", "screenshot.png"), False, None, None, 10]]}
+    durations = {f"page-{page}": seconds for page, seconds in enumerate([8, 1, 1, 1, 1, 1])}
+
+    # Every test is in exactly one shard, pages aren't split up, and the slow page gets a shard to itself
+    shards = [shard_config(config, index, 2, durations) for index in (1, 2)]
+    assert sorted(test[1] for shard in shards for test in shard["tests"]) == sorted(test[1] for test in config["tests"])
+    assert [test[1] for test in shards[0]["tests"]] == ["page-0", "page-0"] and shards[0]["screenshots"] == config["screenshots"]
+    assert shards[1]["shard"] == "2/2" and shard_config(config, 2, 2, durations) == shards[1]
+
+    # Shard reports are merged into one report with every result
+    paths = []
+    for index, shard in enumerate(shards, 1):
+        results = [{"type": "test", "output": test[1], "error": "Too different" if test[1] == "page-3" else None} for test in shard["tests"]]
+        paths.append(str(tmp_path / f"report-{index}.json"))
+        timing.write_report(paths[-1], [timing.PhaseTimings(test[1], {"compare": 0.5}) for test in shard["tests"]], index, shard=shard["shard"], results=results)
+    with pytest.raises(ValueError):
+        merge_reports(paths[:1])
+    report = merge_reports(paths, str(tmp_path / "report.json"))
+    assert report["elapsed"] == 2 and len(report["results"]) == 12 and [failure["output"] for failure in report["failures"]] == ["page-3", "page-3"]
+    assert load_durations(str(tmp_path / "report.json"))["page-1"] == 0.5
+
+def test_baseline_pack(tmp_path):
+    examples_folder = os.path.join(os.path.dirname(__file__), "example_sites")
+    with open(os.path.join(examples_folder, "no_difference", "baseline.png"), "rb") as f:
+        png = f.read()
+    folder = str(tmp_path)
+
+    # Identical elements are stored once, and nothing but the pack is written
+    assert _compare_elements([png, png, decode_image(png)], [[], [], []], folder, artifacts="none", store="pack") == [0, 0, 0]
+    assert sorted(os.listdir(folder)) == sorted([PACK_FILENAME, ".ezvr-baselines.json"])
+    packed = packed_baselines(folder)
+    assert packed["baseline-0.png"] == packed["baseline-1.png"] == hashlib.sha256(png).hexdigest()
+    assert len(set(packed.values())) == 2 # The image is encoded, so it has different bytes
+    assert os.path.getsize(os.path.join(folder, PACK_FILENAME)) < len(png) * 2 + len(encode_image(decode_image(png)))
+    assert read_packed(folder, "baseline-0.png") == png
+
+    # Packed baselines are compared like files
+    changed = decode_image(png).copy()
+    changed[0:40, 0:40] = 0
+    assert _compare_to_baseline(changed, folder, "-0", artifacts="none", method="pixel", store="pack") == pixel_difference(decode_image(png), changed).difference
+
+    # Existing baselines can be moved into the pack, and replaced images are dropped when compacting
+    old_folder = tmp_path / "old"
+    old_folder.mkdir()
+    (old_folder / "baseline.png").write_bytes(png)
+    assert pack_baselines(str(old_folder)) == 1
+    assert not (old_folder / "baseline.png").exists()
+    assert _compare_to_baseline(png, str(old_folder), artifacts="none") == 0
+    add_to_pack(str(old_folder), "baseline.png", changed)
+    assert compact_pack(str(old_folder)) > 0
+    assert np.array_equal(decode_image(read_packed(str(old_folder), "baseline.png")), changed)
+
+def test_shared_store(tmp_path):
+    examples_folder = os.path.join(os.path.dirname(__file__), "example_sites")
+    with open(os.path.join(examples_folder, "no_difference", "baseline.png"), "rb") as f:
+        png = f.read()
+    store, folders = str(tmp_path / "store"), [str(tmp_path / name) for name in ("home", "blog", "about")]
+
+    # Identical baselines across tests are one image in the store, referenced from each manifest
+    for folder in folders:
+        os.makedirs(folder)
+        assert _compare_to_baseline(png, folder, artifacts="none", store="shared", store_folder=store) == 0
+        assert not os.path.exists(os.path.join(folder, "baseline.png"))
+    digest = hashlib.sha256(png).hexdigest()
+    assert all(read_manifest(folder)["baselines"] == {"baseline.png": digest} for folder in folders)
+    assert os.listdir(os.path.join(store, "objects", digest[:2])) == [f"{digest}.png"]
+
+    # The same change is only compared once
+    changed = decode_image(png).copy()
+    changed[0:40, 0:40] = 0
+    expected = pixel_difference(decode_image(png), changed).difference
+    assert [_compare_to_baseline(changed, folder, artifacts="none", method="pixel") for folder in folders] == [expected] * 3
+
+    # Approving the change rewrites manifests, with one new image
+    for folder in folders:
+        write_image(os.path.join(folder, "current.png"), changed)
+    assert approve_current(folders) == {"baselines": 3, "images": 1}
+    assert all(_compare_to_baseline(changed, folder, artifacts="none") == 0 for folder in folders)
+    assert collect_garbage(folders, store) == 1
+    assert not os.path.exists(object_path(store, digest))
+
+def test_baseline_index(tmp_path):
+    examples_folder = os.path.join(os.path.dirname(__file__), "example_sites")
+    captures = {}
+    for name in ["no_difference", "large_difference", "full_page_new_no_diff"]:
+        with open(os.path.join(examples_folder, name, "baseline.png"), "rb") as f:
+            captures[name] = f.read()
+    folder = str(tmp_path)
+
+    # Creating a baseline indexes it
+    _compare_to_baseline(captures["no_difference"], folder, artifacts="none")
+    entry = read_baseline_metadata(folder, "baseline.png")
+    assert entry["sha256"] == hashlib.sha256(captures["no_difference"]).hexdigest()
+    assert entry["size"] == list(decode_image(captures["no_difference"]).shape[1::-1])
+
+    assert classify_capture(folder, "baseline.png", captures["no_difference"]) == ("identical", 0)
+    assert classify_capture(folder, "baseline.png", decode_image(captures["no_difference"])) == ("identical", 0) # Same pixels
+    changed = decode_image(captures["no_difference"]).copy()
+    changed[10:30, 10:30] = 255
+    assert classify_capture(folder, "baseline.png", changed)[0] == "near"
+    assert classify_capture(folder, "baseline.png", captures["full_page_new_no_diff"])[0] == "different"
+
+    # Identical captures skip the comparison unless every artifact is needed
+    assert _compare_to_baseline(decode_image(captures["no_difference"]), folder, fast=True, artifacts="failure") == 0
+    assert not os.path.exists(os.path.join(folder, "current.png"))
+    assert _compare_to_baseline(changed, folder, artifacts="none") > 0
+
+    # Replaced baselines are re-indexed
+    with open(os.path.join(folder, "baseline.png"), "wb") as f:
+        f.write(captures["large_difference"])
+    assert baseline_index_entry(folder, "baseline.png")["sha256"] == hashlib.sha256(captures["large_difference"]).hexdigest()
+    assert classify_capture(folder, "baseline.png", captures["large_difference"]) == ("identical", 0)
+
+def test_timing(tmp_path):
+    examples_folder = os.path.join(os.path.dirname(__file__), "example_sites")
+    with open(os.path.join(examples_folder, "large_difference", "baseline.png"), "rb") as f:
+        png = f.read()
+    events = []
+    hook = lambda event, phase, timings, seconds: events.append((event, phase))
+    timing.add_hook(hook)
+    try:
+        with timing.track(timing.PhaseTimings("large")) as timings:
+            timing.record_image(png)
+            _compare_to_baseline(png, str(tmp_path)) # Creates the baseline
+            _compare_to_baseline(png, str(tmp_path))
+    finally:
+        timing.remove_hook(hook)
+    assert {"read", "compare", "write"} <= set(timings.phases)
+    assert timings.images == [list(decode_image(png).shape[1::-1])] and timings.image_bytes == len(png)
+    assert ("start", "compare") in events and ("end", "compare") in events
+    phases = dict(timings.phases)
+    _compare_to_baseline(png, str(tmp_path)) # Nothing is recorded outside of track()
+    assert timings.phases == phases
+
+    timing.write_report(str(tmp_path / "timings.json"), [timings, timing.PhaseTimings("empty")], 1.5, workers=2)
+    with open(tmp_path / "timings.json") as f:
+        report = json.load(f)
+    assert report["elapsed"] == 1.5 and report["workers"] == 2
+    assert [test["name"] for test in report["tests"]] == ["large", "empty"]
+    assert "large" in timing.summarize_timings([timings, timing.PhaseTimings("empty")]).split("\n")[2]
+
+def test_resolve_driver(tmp_path, monkeypatch):
+    monkeypatch.setattr(drivers, "MANIFEST_PATH", str(tmp_path / "drivers.json"))
+    monkeypatch.setenv("PATH", str(tmp_path))
+    monkeypatch.delenv("EZVR_CHROME_DRIVER_PATH", raising=False)
+    versions, version_checks = {"chrome": "120.0.6099"}, []
+    monkeypatch.setattr(drivers, "_browser_version", lambda driver: version_checks.append(driver) or versions.get(driver))
+    browser = tmp_path / "google-chrome"
+    browser.write_text("120")
+    browser.chmod(0o755)
+    installs = []
+    class FakeManager:
+        def install(self):
+            installs.append(1)
+            return str(downloaded)
+    monkeypatch.setitem(drivers.DRIVER_MANAGERS, "chrome", FakeManager)
+    downloaded = tmp_path / "downloaded" / "chromedriver"
+    downloaded.parent.mkdir()
+    downloaded.write_text("")
+
+    # The manager is only used once, after that the manifest is used with only a stat of the browser
+    assert drivers.resolve_driver("chrome") == str(downloaded)
+    assert drivers.resolve_driver("chrome") == str(downloaded)
+    assert len(installs) == 1 and len(version_checks) == 1
+
+    # A touched browser has it's version checked, and only an updated one resolves the driver again
+    os.utime(browser, ns=(1, 1))
+    drivers.resolve_driver("chrome")
+    assert len(installs) == 1 and len(version_checks) == 2
+    versions["chrome"] = "121.0.6167"
+    browser.write_text("121")
+    drivers.resolve_driver("chrome")
+    assert len(installs) == 2
+
+    # The environment variable only applies to it's own browser
+    monkeypatch.setenv("EZVR_FIREFOX_DRIVER_PATH", str(tmp_path / "missing"))
+    assert drivers.resolve_driver("chrome") == str(downloaded)
+
+    # Drivers on PATH and configured paths come first
+    on_path = tmp_path / "chromedriver"
+    on_path.write_text("")
+    on_path.chmod(0o755)
+    assert drivers.resolve_driver("chrome") == str(on_path)
+    assert drivers.resolve_driver("chrome", str(downloaded)) == str(downloaded)
+
+    with pytest.raises(FileNotFoundError):
+        drivers.resolve_driver("chrome", str(tmp_path / "missing"))
+    with pytest.raises(ValueError):
+        drivers.resolve_driver("safari")
+
+def test_launch_profile(tmp_path, monkeypatch):
+    profile = drivers.parse_launch_profile({"headless": False, "window_size": "800x600", "scale_factor": 2})
+    assert profile == drivers.LaunchProfile(headless=False, window_size=(800, 600), scale_factor=2.0)
+    arguments = drivers.browser_options("chrome", profile).arguments
+    assert "--window-size=800,600" in arguments and "--force-device-scale-factor=2.0" in arguments
+    assert not any(argument.startswith("--headless") for argument in arguments)
+    assert "--headless=new" in drivers.browser_options("chrome").arguments # Headless by default
+
+    with pytest.raises(ValueError):
+        drivers.parse_launch_profile({"colour": "blue"})
+
+    # The driver section of a config file can be a name, or launch settings
+    config_path = tmp_path / "config.yml"
+    config_path.write_text("driver:\n  name: Firefox\n  path: /opt/geckodriver\n  headless: false\n  window_size: [1024, 768]\n")
+    config = parse_config(str(config_path))
+    assert config["driver"] == "firefox" and config["driver_path"] == "/opt/geckodriver"
+    assert config["profile"] == drivers.LaunchProfile(headless=False, window_size=(1024, 768))
+
+    # The daemon's browser is only attached to when it was launched with the same profile
+    monkeypatch.setattr(session, "SESSION_DIRECTORY", str(tmp_path))
+    monkeypatch.setattr(session, "_AttachedDriver", lambda *args: type("Attached", (), {"current_url": "about:blank"})())
+    monkeypatch.setattr(session, "instrument_driver", lambda driver: driver)
+    (tmp_path / "chrome-session.json").write_text(json.dumps({"executor_url": "http://localhost:1", "session_id": "1", "browser_name": "chrome", "profile": {"window_size": [1200, 1200]}, "pid": 1}))
+    assert session.attach_to_daemon("chrome", drivers.LaunchProfile()) is not None
+    assert session.attach_to_daemon("chrome", drivers.LaunchProfile(window_size=(1280, 800), scale_factor=2)) is None
+
 def test_config():
     examples_folder = os.path.join(os.path.dirname(__file__), "example_sites")
     config = parse_config(os.path.join(examples_folder,"config.yml"))
 
     test = config["tests"][0]
-    url,folder,locator,warning_threshold,error_threshold,ignored_elements,multielements = test
+    url,folder,locator,warning_threshold,error_threshold,ignored_elements,multielements,wait,wait_timeout = test
 
     assert url == "tests/example_sites/no_difference/index.html"
     assert folder == "nav"
@@ -159,16 +740,41 @@ def test_config():
     assert error_threshold == 30
     assert ignored_elements == [".hero"]
     assert multielements == False
+    assert wait == None
+    assert wait_timeout == 10
 
     screenshots = config["screenshots"][0]
-    url,filename,locator, ignored_elements = screenshots
+    url,filename,locator, ignored_elements, wait, wait_timeout = screenshots
     
     assert url == "tests/example_sites/no_difference/index.html"
     assert filename == os.path.join("chart","screenshot.png")
     assert locator == "#myChart"
     assert ignored_elements == [".hero"]
+    assert config["workers"] == 1
+    assert config["compare_workers"] == None
+    assert config["report"] == None
+    assert config["tiled"] == False
+    assert config["full_page"] == False
+    assert config["changed_only"] == False
+    assert config["since"] == None
+    assert config["matrix"] == None
+    assert config["store"] == "files"
+    assert config["store_folder"] == None
+    assert config["driver_path"] == None
+    assert config["profile"] == drivers.LaunchProfile()
+    assert config["cache"] == False
+    assert config["artifacts"] == "all"
+    assert config["method"] == "ssim"
+    assert config["tolerance"] == 0
+    assert config["fast"] == False
+    assert config["single_capture"] == False
+
+    # Both use the same page, so it's only loaded once
+    assert [[(index, kind) for index, kind, _ in group] for group in group_by_page(config)] == [[(0, "test"), (1, "screenshot")]]
     try:
-        execute_config(config)
+        results = execute_config(config, workers=2)
+        assert [result["type"] for result in results] == ["test", "screenshot"]
+        assert all(result["error"] is None for result in results)
     finally:
         os.remove(filename)
         os.rmdir("chart")
@@ -176,6 +782,7 @@ def test_config():
         os.remove(os.path.join("nav", "diff.png"))
         os.remove(os.path.join("nav", "thresh.png"))
         os.remove(os.path.join("nav", "current.png"))
+        remove_generated("nav")
         os.rmdir("nav")
 
     